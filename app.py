@@ -1,66 +1,114 @@
 # app.py
 
 import os
-import locale
 from datetime import datetime, date # <--- GARANTA QUE 'date' ESTEJA IMPORTADO
+
+import click
 from flask import Flask, redirect, url_for
-from flask_sqlalchemy import SQLAlchemy
-from flask_migrate import Migrate
+from flask.cli import with_appcontext
 from dotenv import load_dotenv
 
+from extensions import db, migrate
+
 load_dotenv()
 
-app = Flask(__name__)
-app.config['SECRET_KEY'] = os.getenv('SECRET_KEY')
-app.config['SQLALCHEMY_DATABASE_URI'] = os.getenv('DATABASE_URI')
-app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-UPLOAD_FOLDER = os.path.join('static', 'uploads')
-app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
-os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
-db = SQLAlchemy(app)
-migrate = Migrate(app, db)
-
-# Importa os modelos aqui
-from models import Categoria, Subcategoria, Conta, Lancamento, Recorrencia, CartaoCredito, TransferenciaGrupo
-
-# --- REGISTRO DOS BLUEPRINTS ---
-from app_routes.contas_routes import contas_bp
-from app_routes.categorias_routes import categorias_bp
-from app_routes.lancamentos_routes import lancamentos_bp
-from app_routes.dashboard_routes import dashboard_bp
-from app_routes.cartoes_routes import cartoes_bp
-
-app.register_blueprint(contas_bp)
-app.register_blueprint(categorias_bp)
-app.register_blueprint(lancamentos_bp)
-app.register_blueprint(dashboard_bp)
-app.register_blueprint(cartoes_bp)
-
-# --- FUNÇÃO PARA DISPONIBILIZAR 'now' NOS TEMPLATES ---
-@app.context_processor
-def inject_now():
-    return {'now': datetime.now}
-
-# --- FILTRO PERSONALIZADO E ROTA PRINCIPAL ---
-@app.template_filter('currency')
-def format_currency(value):
-    if value is None: return "R$ 0,00"
-    try:
-        locale.setlocale(locale.LC_ALL, 'pt_BR.UTF-8')
-        return locale.currency(float(value), grouping=True)
-    except (ValueError, TypeError): return value
 
-@app.route('/')
-def index():
-    return redirect(url_for('dashboard_bp.dashboard'))
+def create_app(config=None):
+    """
+    Cria e configura a aplicação. 'config' (dicionário) sobrescreve as
+    configurações lidas do ambiente, por exemplo
+    create_app({'SQLALCHEMY_DATABASE_URI': 'sqlite://'}) para testes e benchmarks.
+    """
+    app = Flask(__name__)
+    app.config['SECRET_KEY'] = os.getenv('SECRET_KEY')
+    app.config['SQLALCHEMY_DATABASE_URI'] = os.getenv('DATABASE_URI')
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    app.config['UPLOAD_FOLDER'] = os.path.join('static', 'uploads')
+    app.config.update(config or {})
+
+    # Pool de conexões configurado pelo ambiente (DB_POOL_SIZE, DB_MAX_OVERFLOW, ...)
+    from app_services.pool import opcoes_engine, registrar_metricas_pool
+    app.config.setdefault('SQLALCHEMY_ENGINE_OPTIONS', opcoes_engine(app.config['SQLALCHEMY_DATABASE_URI']))
+
+    os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
+    db.init_app(app)
+    migrate.init_app(app, db)
+
+    # Importa os modelos aqui
+    import models  # noqa: F401
+
+    # Registra os listeners que mantêm a tabela saldos_conta atualizada
+    from app_services import saldos  # noqa: F401
+
+    # ... e os totais de faturas_cartao (valor_total e qtd_lancamentos)
+    from app_services import totais_faturas  # noqa: F401
+
+    # ... e a tabela de fatos resumo_mensal (mês x conta/cartão x subcategoria)
+    from app_services import resumo_mensal  # noqa: F401
+
+    # Invalida os resumos mensais em cache dos meses alterados em cada commit
+    from app_services import cache  # noqa: F401
+
+    # Recompila o autômato das regras de categorização quando elas mudam
+    from app_services import categorizacao  # noqa: F401
+
+    # Contagem e tempo das consultas SQL de cada requisição (Server-Timing e log)
+    from app_services.instrumentacao import registrar_instrumentacao
+    registrar_instrumentacao(app, db)
+    registrar_metricas_pool(app, db)
+
+    # --- REGISTRO DOS BLUEPRINTS ---
+    from app_routes.contas_routes import contas_bp
+    from app_routes.categorias_routes import categorias_bp
+    from app_routes.lancamentos_routes import lancamentos_bp
+    from app_routes.dashboard_routes import dashboard_bp
+    from app_routes.cartoes_routes import cartoes_bp
+    from app_routes.exportacao_routes import exportacao_bp
+    from app_routes.relatorios_routes import relatorios_bp
+
+    app.register_blueprint(contas_bp)
+    app.register_blueprint(categorias_bp)
+    app.register_blueprint(lancamentos_bp)
+    app.register_blueprint(dashboard_bp)
+    app.register_blueprint(cartoes_bp)
+    app.register_blueprint(exportacao_bp)
+    app.register_blueprint(relatorios_bp)
+
+    # --- FUNÇÃO PARA DISPONIBILIZAR 'now' NOS TEMPLATES ---
+    @app.context_processor
+    def inject_now():
+        return {'now': datetime.now}
+
+    # --- FILTROS PERSONALIZADOS E ROTA PRINCIPAL ---
+    # Formatação em reais sem setlocale por valor (thread-safe)
+    from app_services.formatacao import formatar_brl, formatar_brl_lista
+    app.add_template_filter(formatar_brl, 'currency')
+    app.add_template_filter(formatar_brl_lista, 'currency_list')
+
+    @app.route('/')
+    def index():
+        return redirect(url_for('dashboard_bp.dashboard'))
+
+    # --- COMANDOS DE MANUTENÇÃO ---
+    app.cli.add_command(corrigir_datas_criacao)
+    app.cli.add_command(recompute_saldos)
+    app.cli.add_command(recompute_faturas)
+    app.cli.add_command(recompute_resumo_mensal)
+    app.cli.add_command(importar_extrato)
+    app.cli.add_command(categorizar_lancamentos)
+
+    return app
 
 # --- NOVO COMANDO PARA CORRIGIR DATAS (VERSÃO 2, COM HORA) ---
-@app.cli.command("corrigir-datas")
+@click.command("corrigir-datas")
+@with_appcontext
 def corrigir_datas_criacao():
     """
     Atualiza a data_criacao de todos os lançamentos, recorrências e 
     transferências para a data e hora atuais. Útil para corrigir dados antigos.
     """
+    from models import Lancamento, Recorrencia, TransferenciaGrupo
+
     agora = datetime.now()
     print(f"Iniciando a atualização das datas de criação para: {agora.strftime('%d/%m/%Y %H:%M:%S')}...")
 
@@ -92,4 +140,175 @@ def corrigir_datas_criacao():
     except Exception as e:
         db.session.rollback()
         print(f"\n[ERRO] Ocorreu um erro durante a atualização: {e}")
-        print("Nenhuma alteração foi salva no banco de dados.")
\ No newline at end of file
+        print("Nenhuma alteração foi salva no banco de dados.")
+
+# --- COMANDO PARA RECONSTRUIR E VERIFICAR OS SALDOS MATERIALIZADOS ---
+@click.command("recompute-saldos")
+@with_appcontext
+def recompute_saldos():
+    """
+    Reconstrói a tabela saldos_conta a partir de uma varredura completa dos
+    lançamentos pagos e informa as contas cujo saldo materializado divergia.
+    """
+    from app_services import saldos
+
+    print("Recalculando saldos a partir de todos os lançamentos pagos...")
+
+    try:
+        divergencias = saldos.reconstruir_saldos()
+        for conta_id, (rec_antes, desp_antes), (rec_depois, desp_depois) in divergencias:
+            print(f"-> Conta {conta_id}: receitas {rec_antes:.2f} -> {rec_depois:.2f}, "
+                  f"despesas {desp_antes:.2f} -> {desp_depois:.2f}")
+
+        db.session.commit()
+        if divergencias:
+            print(f"\n[CORRIGIDO] {len(divergencias)} conta(s) estavam divergentes e foram reconstruídas.")
+        else:
+            print("\n[SUCESSO] Tabela saldos_conta confere com a varredura completa.")
+
+    except Exception as e:
+        db.session.rollback()
+        print(f"\n[ERRO] Ocorreu um erro durante a reconstrução: {e}")
+        print("Nenhuma alteração foi salva no banco de dados.")
+
+# --- COMANDO PARA RECONCILIAR OS TOTAIS DAS FATURAS ---
+@click.command("recompute-faturas")
+@click.option("--apenas-verificar", is_flag=True, help="Só informa as divergências, sem gravar.")
+@with_appcontext
+def recompute_faturas(apenas_verificar):
+    """
+    Confere valor_total e qtd_lancamentos de faturas_cartao com uma varredura
+    completa dos lançamentos de cartão e corrige as faturas divergentes.
+    """
+    from app_services import totais_faturas
+
+    print("Conferindo os totais das faturas com todos os lançamentos de cartão...")
+
+    try:
+        divergencias = totais_faturas.reconstruir_faturas()
+        for (cartao_id, ano, mes), (valor_antes, qtd_antes), (valor_depois, qtd_depois) in divergencias:
+            print(f"-> Cartão {cartao_id} {mes:02d}/{ano}: valor {valor_antes:.2f} -> {valor_depois:.2f}, "
+                  f"lançamentos {qtd_antes} -> {qtd_depois}")
+
+        if apenas_verificar:
+            db.session.rollback()
+            if divergencias:
+                print(f"\n[DIVERGENTE] {len(divergencias)} fatura(s) divergentes. Nada foi alterado.")
+            else:
+                print("\n[SUCESSO] Os totais das faturas conferem com a varredura completa.")
+            return
+
+        db.session.commit()
+        if divergencias:
+            print(f"\n[CORRIGIDO] {len(divergencias)} fatura(s) estavam divergentes e foram reconstruídas.")
+        else:
+            print("\n[SUCESSO] Os totais das faturas conferem com a varredura completa.")
+
+    except Exception as e:
+        db.session.rollback()
+        print(f"\n[ERRO] Ocorreu um erro durante a reconciliação: {e}")
+        print("Nenhuma alteração foi salva no banco de dados.")
+
+# --- COMANDO PARA RECONSTRUIR A TABELA DE FATOS RESUMO_MENSAL ---
+@click.command("recompute-resumo-mensal")
+@click.option("--apenas-verificar", is_flag=True, help="Só informa as divergências, sem gravar.")
+@with_appcontext
+def recompute_resumo_mensal(apenas_verificar):
+    """
+    Confere resumo_mensal com uma varredura completa dos lançamentos e, se
+    houver divergências, reconstrói a tabela.
+    """
+    from app_services import resumo_mensal
+
+    print("Conferindo resumo_mensal com todos os lançamentos...")
+
+    try:
+        divergencias = resumo_mensal.reconstruir_resumo()
+        for chave, (valor_antes, qtd_antes), (valor_depois, qtd_depois) in divergencias:
+            ano, mes, conta_id, cartao_id, subcategoria_id, tipo, status, origem = chave
+            destino = f"Conta {conta_id}" if conta_id else f"Cartão {cartao_id}"
+            print(f"-> {mes:02d}/{ano} {destino}, subcategoria {subcategoria_id}, {tipo} {status} ({origem}): "
+                  f"valor {valor_antes:.2f} -> {valor_depois:.2f}, lançamentos {qtd_antes} -> {qtd_depois}")
+
+        if apenas_verificar:
+            db.session.rollback()
+            if divergencias:
+                print(f"\n[DIVERGENTE] {len(divergencias)} linha(s) divergentes. Nada foi alterado.")
+            else:
+                print("\n[SUCESSO] resumo_mensal confere com a varredura completa.")
+            return
+
+        db.session.commit()
+        if divergencias:
+            print(f"\n[CORRIGIDO] {len(divergencias)} linha(s) estavam divergentes; resumo_mensal foi reconstruída.")
+        else:
+            print("\n[SUCESSO] resumo_mensal confere com a varredura completa.")
+
+    except Exception as e:
+        db.session.rollback()
+        print(f"\n[ERRO] Ocorreu um erro durante a reconciliação: {e}")
+        print("Nenhuma alteração foi salva no banco de dados.")
+
+# --- COMANDO PARA IMPORTAR EXTRATOS (CSV OU OFX) ---
+@click.command("importar-extrato")
+@click.argument("arquivo", type=click.File("rb"))
+@click.option("--conta", "conta_id", type=int, help="ID da conta do extrato bancário.")
+@click.option("--cartao", "cartao_id", type=int, help="ID do cartão do extrato de cartão.")
+@click.option("--subcategoria", "subcategoria_id", type=int, required=True,
+              help="ID da subcategoria das transações que não casam com nenhuma regra de categorização.")
+@click.option("--formato", type=click.Choice(["csv", "ofx"]), help="Padrão: a extensão do arquivo.")
+@with_appcontext
+def importar_extrato(arquivo, conta_id, cartao_id, subcategoria_id, formato):
+    """
+    Importa um extrato bancário ou de cartão, ignorando as transações que já
+    existem, e grava todas as novas numa única transação.
+    """
+    from app_services import importacao
+
+    print(f"Importando {arquivo.name}...")
+
+    try:
+        resultado = importacao.importar_extrato(
+            arquivo, formato or importacao.formato_do_arquivo(arquivo.name), subcategoria_id,
+            conta_id=conta_id, cartao_id=cartao_id
+        )
+        print(f"-> {resultado['lidas']} transações lidas em {resultado['segundos']:.2f}s "
+              f"({resultado['linhas_s']} linhas/s).")
+        print(f"-> {resultado['duplicadas']} já existiam e {resultado['ignoradas']} créditos do cartão foram ignorados.")
+        print(f"-> {resultado['categorizadas']} categorizadas pelas regras.")
+
+        db.session.commit()
+        print(f"\n[SUCESSO] {resultado['inseridas']} lançamentos importados.")
+
+    except Exception as e:
+        db.session.rollback()
+        print(f"\n[ERRO] Ocorreu um erro durante a importação: {e}")
+        print("Nenhuma alteração foi salva no banco de dados.")
+
+# --- COMANDO PARA CATEGORIZAR OS LANÇAMENTOS SEM SUBCATEGORIA ---
+@click.command("categorizar-lancamentos")
+@click.option("--tamanho-lote", default=1000, show_default=True, help="Lançamentos por lote (um commit por lote).")
+@with_appcontext
+def categorizar_lancamentos(tamanho_lote):
+    """
+    Aplica as regras de categorização aos lançamentos que ainda não têm
+    subcategoria, em lotes commitados um a um.
+    """
+    from app_services.categorizacao import categorizar_sem_subcategoria
+
+    print("Categorizando os lançamentos sem subcategoria...")
+
+    lidos = categorizados = 0
+    try:
+        for numero, (lidos_lote, categorizados_lote) in enumerate(categorizar_sem_subcategoria(tamanho_lote), start=1):
+            db.session.commit()
+            lidos += lidos_lote
+            categorizados += categorizados_lote
+            print(f"-> Lote {numero}: {categorizados_lote} de {lidos_lote} lançamentos categorizados.")
+
+        print(f"\n[SUCESSO] {categorizados} de {lidos} lançamentos sem subcategoria foram categorizados.")
+
+    except Exception as e:
+        db.session.rollback()
+        print(f"\n[ERRO] Ocorreu um erro durante a categorização: {e}")
+        print(f"Os {categorizados} lançamentos dos lotes anteriores já foram salvos.")
@@ -1,15 +1,21 @@
 # app_routes/cartoes_routes.py
 
 import os
-from flask import Blueprint, render_template, request, redirect, url_for, flash
+from flask import Blueprint, current_app, render_template, request, redirect, url_for, flash
 from sqlalchemy.exc import IntegrityError
-from sqlalchemy import extract
 from werkzeug.utils import secure_filename
 from datetime import datetime
 
-# Importa o 'db' e os modelos do arquivo principal da aplicação
-from app import db, app
+from extensions import db
 from models import CartaoCredito, Conta, Categoria, Lancamento, Recorrencia, FaturaCartao
+from app_services.dinheiro import ZERO, para_dinheiro
+from app_services.faturas import resumo_faturas
+from app_services.carregamento import PERFIL_EXTRATO_CARTAO
+from app_services.periodos import filtro_mes, intervalo_mes
+from app_services.recorrencias import (
+    atualizar_futuros, atualizar_regra, encerrar_recorrencia, excluir_futuros, excluir_ocorrencia,
+    obter_lancamento, ocorrencias_virtuais
+)
 
 # Cria o Blueprint
 cartoes_bp = Blueprint(
@@ -45,7 +51,7 @@ def gerenciar_cartoes():
             logo_file = request.files['logo_imagem']
             if logo_file.filename != '':
                 logo_filename = secure_filename(logo_file.filename)
-                logo_file.save(os.path.join(app.config['UPLOAD_FOLDER'], logo_filename))
+                logo_file.save(os.path.join(current_app.config['UPLOAD_FOLDER'], logo_filename))
         
         # Criar novo cartão
         novo_cartao = CartaoCredito(
@@ -99,12 +105,12 @@ def editar_cartao(id):
                 if logo_file.filename != '':
                     # Remove logo antigo se existir
                     if cartao.logo_imagem:
-                        old_logo_path = os.path.join(app.config['UPLOAD_FOLDER'], cartao.logo_imagem)
+                        old_logo_path = os.path.join(current_app.config['UPLOAD_FOLDER'], cartao.logo_imagem)
                         if os.path.exists(old_logo_path):
                             os.remove(old_logo_path)
                     
                     logo_filename = secure_filename(logo_file.filename)
-                    logo_file.save(os.path.join(app.config['UPLOAD_FOLDER'], logo_filename))
+                    logo_file.save(os.path.join(current_app.config['UPLOAD_FOLDER'], logo_filename))
                     cartao.logo_imagem = logo_filename
             
             db.session.commit()
@@ -146,7 +152,8 @@ def extrato_cartao():
     # Inicializar variáveis
     lancamentos = []
     cartao_selecionado = None
-    total_mes = 0.0
+    fatura = None
+    total_mes = ZERO
     
     # Se há cartão selecionado, buscar os lançamentos
     if cartao_id:
@@ -155,13 +162,23 @@ def extrato_cartao():
         # Buscar lançamentos do cartão no mês/ano selecionado (excluir faturas)
         lancamentos = Lancamento.query.filter(
             Lancamento.cartao_credito_id == cartao_id,
-            extract('year', Lancamento.data_vencimento) == ano,
-            extract('month', Lancamento.data_vencimento) == mes,
+            filtro_mes(Lancamento.data_vencimento, ano, mes),
             ~Lancamento.descricao.like('Fatura %')  # Excluir faturas
-        ).order_by(Lancamento.data_vencimento, Lancamento.id).all()
+        ).options(*PERFIL_EXTRATO_CARTAO).order_by(Lancamento.data_vencimento, Lancamento.id).all()
+        
+        # Incluir as ocorrências das recorrências virtuais do cartão no mês
+        inicio_mes, fim_mes = intervalo_mes(ano, mes)
+        lancamentos += [
+            ocorrencia for ocorrencia in ocorrencias_virtuais(
+                inicio_mes, fim_mes, Recorrencia.cartao_credito_id == cartao_id
+            )
+            if not ocorrencia.descricao.startswith('Fatura ')
+        ]
+        lancamentos.sort(key=lambda l: l.data_vencimento)
         
-        # Calcular total do mês
-        total_mes = sum(l.valor for l in lancamentos)
+        # Total e status da fatura do mês
+        fatura = resumo_faturas(ano, mes, [cartao_selecionado])[0]
+        total_mes = fatura['valor']
     
     # Opções para os seletores
     anos_disponiveis = range(datetime.now().year - 2, datetime.now().year + 2)
@@ -177,6 +194,7 @@ def extrato_cartao():
         cartoes=cartoes,
         cartao_selecionado=cartao_selecionado,
         lancamentos=lancamentos,
+        fatura=fatura,
         total_mes=total_mes,
         cartao_id=cartao_id,
         ano=ano,
@@ -200,11 +218,11 @@ def editar_lancamento_cartao():
         # =============================================================
         # EDITAR LANÇAMENTO ÚNICO
         # =============================================================
-        lancamento = Lancamento.query.get_or_404(lancamento_id)
+        lancamento = obter_lancamento(lancamento_id)
         
         # Atualizar dados do lançamento
         lancamento.descricao = request.form['descricao']
-        lancamento.valor = float(request.form['valor'])
+        lancamento.valor = para_dinheiro(request.form['valor'])
         lancamento.data_vencimento = datetime.strptime(request.form['data_vencimento'], '%Y-%m-%d').date()
         lancamento.subcategoria_id = request.form['subcategoria_id']
         lancamento.cartao_credito_id = request.form['cartao_id']
@@ -221,12 +239,12 @@ def editar_lancamento_cartao():
         # =============================================================
         # EDITAR RECORRÊNCIA
         # =============================================================
-        lancamento_base = Lancamento.query.get_or_404(lancamento_id)
+        lancamento_base = obter_lancamento(lancamento_id)
         recorrencia_id = request.form.get('recorrencia_id')
         
         # Dados da edição
         nova_descricao = request.form['descricao']
-        novo_valor = float(request.form['valor'])
+        novo_valor = para_dinheiro(request.form['valor'])
         nova_subcategoria_id = request.form['subcategoria_id']
         novo_cartao_id = request.form['cartao_id']
         data_inicio = datetime.strptime(request.form['data_inicio'], '%Y-%m-%d').date()
@@ -242,30 +260,15 @@ def editar_lancamento_cartao():
         elif tipo_edicao == 'futuros':
             # Editar este e futuros lançamentos
             recorrencia = Recorrencia.query.get_or_404(recorrencia_id)
-            recorrencia.descricao_base = nova_descricao
             
-            # Buscar lançamentos a partir da data
-            lancamentos_para_alterar = Lancamento.query.filter(
-                Lancamento.recorrencia_id == recorrencia_id,
-                Lancamento.data_vencimento >= data_inicio
-            ).all()
+            # Recorrências virtuais: as ocorrências ainda não gravadas seguem a
+            # regra do grupo, dividida na data se houver ocorrências anteriores
+            atualizar_regra(recorrencia, data_inicio, descricao_base=nova_descricao, valor=novo_valor,
+                            subcategoria_id=nova_subcategoria_id, cartao_credito_id=novo_cartao_id)
             
-            # Atualizar cada lançamento
-            for lancamento in lancamentos_para_alterar:
-                lancamento.valor = novo_valor
-                lancamento.subcategoria_id = nova_subcategoria_id
-                lancamento.cartao_credito_id = novo_cartao_id
-                
-                # Atualizar descrição considerando se é parcelada
-                if recorrencia.tipo == 'Parcelada':
-                    # Limpar descrição atual e recriar corretamente
-                    descricao_base = nova_descricao
-                    # Encontrar o número da parcela atual na sequência
-                    parcelas_ordenadas = sorted([l for l in recorrencia.lancamentos], key=lambda x: x.data_vencimento)
-                    indice_parcela = parcelas_ordenadas.index(lancamento) + 1
-                    lancamento.descricao = f"{descricao_base} ({indice_parcela}/{recorrencia.total_parcelas})"
-                else:
-                    lancamento.descricao = nova_descricao
+            # Atualizar com um único UPDATE os lançamentos gravados a partir da data
+            atualizar_futuros(recorrencia, data_inicio, descricao=nova_descricao, valor=novo_valor,
+                              subcategoria_id=nova_subcategoria_id, cartao_credito_id=novo_cartao_id)
             
             flash('Recorrência atualizada a partir desta data!', 'success')
         
@@ -285,7 +288,7 @@ def excluir_lancamento_cartao():
     """Excluir lançamentos do cartão a partir do extrato"""
     tipo_exclusao = request.form.get('tipo_exclusao')
     lancamento_id = request.form.get('lancamento_id')
-    lancamento = Lancamento.query.get_or_404(lancamento_id)
+    lancamento = obter_lancamento(lancamento_id)
     
     # Capturar dados para redirecionamento
     cartao_id = lancamento.cartao_credito_id
@@ -296,14 +299,14 @@ def excluir_lancamento_cartao():
         # =============================================================
         # EXCLUIR LANÇAMENTO ÚNICO
         # =============================================================
-        db.session.delete(lancamento)
+        excluir_ocorrencia(lancamento)
         flash('Lançamento excluído com sucesso!', 'info')
     
     elif tipo_exclusao == 'apenas_mes':
         # =============================================================
         # EXCLUIR APENAS ESTE MÊS DA RECORRÊNCIA
         # =============================================================
-        db.session.delete(lancamento)
+        excluir_ocorrencia(lancamento)
         flash('Lançamento do mês excluído com sucesso!', 'info')
     
     elif tipo_exclusao == 'futuros':
@@ -311,24 +314,15 @@ def excluir_lancamento_cartao():
         # EXCLUIR ESTE E FUTUROS LANÇAMENTOS DA RECORRÊNCIA
         # =============================================================
         recorrencia_id = request.form.get('recorrencia_id')
+        recorrencia = lancamento.recorrencia
         data_base = lancamento.data_vencimento
         
-        # Buscar lançamentos a partir desta data
-        lancamentos_a_deletar = Lancamento.query.filter(
-            Lancamento.recorrencia_id == recorrencia_id,
-            Lancamento.data_vencimento >= data_base
-        ).all()
-        
-        # Deletar os lançamentos
-        for lanc in lancamentos_a_deletar:
-            db.session.delete(lanc)
+        # Recorrências virtuais: encerrar a regra antes desta data
+        encerrar_recorrencia(recorrencia, data_base)
         
-        # Se não sobraram lançamentos, deletar a recorrência também
-        recorrencia_restante = Lancamento.query.filter_by(recorrencia_id=recorrencia_id).first()
-        if not recorrencia_restante:
-            recorrencia_pai = Recorrencia.query.get(recorrencia_id)
-            if recorrencia_pai:
-                db.session.delete(recorrencia_pai)
+        # Deletar os lançamentos com um único DELETE e, se não sobraram
+        # lançamentos, a recorrência também
+        excluir_futuros(recorrencia_id, data_base)
         
         flash('Lançamentos futuros da recorrência foram excluídos!', 'info')
     
@@ -5,8 +5,9 @@ from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import joinedload
 
 # Importa o 'db' e os modelos do arquivo principal da aplicação
-from app import db
-from models import Categoria, Subcategoria
+from extensions import db
+from models import Categoria, RegraCategorizacao, Subcategoria
+from app_services.categorizacao import normalizar_descricao
 
 # Cria o Blueprint
 categorias_bp = Blueprint(
@@ -26,6 +27,19 @@ def gerenciar_categorias():
             nova_subcategoria = Subcategoria(nome=request.form.get('nome'), categoria_id=request.form.get('categoria_id'))
             db.session.add(nova_subcategoria)
             flash('Subcategoria adicionada com sucesso!', 'success')
+        elif form_type == 'regra':
+            padrao = request.form.get('padrao', '').strip()
+            # O autômato ignora padrões vazios depois de normalizados
+            if not normalizar_descricao(padrao):
+                flash('O padrão da regra fica vazio sem espaços e acentos; informe um texto.', 'danger')
+                return redirect(url_for('categorias_bp.gerenciar_categorias'))
+            nova_regra = RegraCategorizacao(
+                padrao=padrao,
+                subcategoria_id=request.form.get('subcategoria_id', type=int),
+                prioridade=request.form.get('prioridade', 0, type=int)
+            )
+            db.session.add(nova_regra)
+            flash('Regra de categorização adicionada com sucesso!', 'success')
         try:
             db.session.commit()
         except IntegrityError:
@@ -33,7 +47,10 @@ def gerenciar_categorias():
             flash('Ocorreu um erro: o nome já pode existir.', 'danger')
         return redirect(url_for('categorias_bp.gerenciar_categorias'))
     categorias = Categoria.query.options(joinedload(Categoria.subcategorias)).order_by(Categoria.nome).all()
-    return render_template('categorias.html', categorias=categorias)
+    regras = RegraCategorizacao.query.options(
+        joinedload(RegraCategorizacao.subcategoria).joinedload(Subcategoria.categoria)
+    ).order_by(RegraCategorizacao.prioridade.desc(), RegraCategorizacao.padrao).all()
+    return render_template('categorias.html', categorias=categorias, regras=regras)
 
 @categorias_bp.route('/categorias/editar/<int:id>', methods=['GET', 'POST'])
 def editar_categoria(id):
@@ -75,4 +92,12 @@ def deletar_subcategoria(id):
     db.session.delete(subcategoria)
     db.session.commit()
     flash('Subcategoria deletada com sucesso.', 'info')
-    return redirect(url_for('categorias_bp.gerenciar_categorias'))
\ No newline at end of file
+    return redirect(url_for('categorias_bp.gerenciar_categorias'))
+
+@categorias_bp.route('/categorias/regras/deletar/<int:id>', methods=['POST'])
+def deletar_regra(id):
+    regra = RegraCategorizacao.query.get_or_404(id)
+    db.session.delete(regra)
+    db.session.commit()
+    flash('Regra de categorização deletada com sucesso.', 'info')
+    return redirect(url_for('categorias_bp.gerenciar_categorias'))
@@ -1,13 +1,13 @@
 # app_routes/contas_routes.py
 
 import os
-from flask import Blueprint, render_template, request, redirect, url_for, flash
+from flask import Blueprint, current_app, render_template, request, redirect, url_for, flash
 from sqlalchemy.exc import IntegrityError
 from werkzeug.utils import secure_filename
 
-# Importa o 'db' e os modelos do arquivo principal da aplicação
-from app import db, app
+from extensions import db
 from models import Conta
+from app_services.dinheiro import para_dinheiro
 
 # Cria o Blueprint
 contas_bp = Blueprint(
@@ -28,8 +28,8 @@ def gerenciar_contas():
             logo_file = request.files['logo_imagem']
             if logo_file.filename != '':
                 logo_filename = secure_filename(logo_file.filename)
-                logo_file.save(os.path.join(app.config['UPLOAD_FOLDER'], logo_filename))
-        nova_conta = Conta(nome=nome, saldo_inicial=float(saldo_inicial), tipo_conta=tipo_conta, tipo_investimento=tipo_investimento, logo_imagem=logo_filename)
+                logo_file.save(os.path.join(current_app.config['UPLOAD_FOLDER'], logo_filename))
+        nova_conta = Conta(nome=nome, saldo_inicial=para_dinheiro(saldo_inicial), tipo_conta=tipo_conta, tipo_investimento=tipo_investimento, logo_imagem=logo_filename)
         try:
             db.session.add(nova_conta)
             db.session.commit()
@@ -54,18 +54,18 @@ def editar_conta(id):
     if request.method == 'POST':
         try:
             conta.nome = request.form['nome']
-            conta.saldo_inicial = float(request.form['saldo_inicial'])
+            conta.saldo_inicial = para_dinheiro(request.form['saldo_inicial'])
             conta.tipo_conta = request.form['tipo_conta']
             conta.tipo_investimento = request.form.get('tipo_investimento') if conta.tipo_conta == 'Investimento' else None
             if 'logo_imagem' in request.files:
                 logo_file = request.files['logo_imagem']
                 if logo_file.filename != '':
                     if conta.logo_imagem:
-                        old_logo_path = os.path.join(app.config['UPLOAD_FOLDER'], conta.logo_imagem)
+                        old_logo_path = os.path.join(current_app.config['UPLOAD_FOLDER'], conta.logo_imagem)
                         if os.path.exists(old_logo_path):
                             os.remove(old_logo_path)
                     logo_filename = secure_filename(logo_file.filename)
-                    logo_file.save(os.path.join(app.config['UPLOAD_FOLDER'], logo_filename))
+                    logo_file.save(os.path.join(current_app.config['UPLOAD_FOLDER'], logo_filename))
                     conta.logo_imagem = logo_filename
             db.session.commit()
             flash('Conta atualizada com sucesso!', 'success')
@@ -1,94 +1,80 @@
 # app_routes/dashboard_routes.py
 
-from flask import Blueprint, render_template, redirect, url_for, flash, request
+import json
+from flask import Blueprint, Response, render_template, redirect, url_for, flash, request, jsonify
 from datetime import datetime
-from sqlalchemy import extract
 
-from app import db
-from models import Lancamento, Conta, CartaoCredito, Categoria, FaturaCartao
+from extensions import db
+from models import Lancamento, Conta, CartaoCredito, Categoria, Recorrencia
+from app_services.cache import versao_mes
+from app_services.carregamento import PERFIL_CARTOES_DASHBOARD, PERFIL_DASHBOARD
+from app_services.dinheiro import para_dinheiro, para_json
+from app_services.faturas import data_vencimento_fatura, resumo_faturas
+from app_services.periodos import filtro_mes, intervalo_mes
+from app_services.recorrencias import (
+    atualizar_futuros, atualizar_regra, encerrar_recorrencia, excluir_futuros, excluir_ocorrencia,
+    obter_lancamento, ocorrencias_virtuais
+)
+from app_services.projecao import calcular_projecao
+from app_services.resumo import resumo_mes
+from app_services.saldos import saldos_contas
 
 dashboard_bp = Blueprint(
     'dashboard_bp', __name__,
     template_folder='../templates'
 )
 
-@dashboard_bp.route('/dashboard', methods=['GET'])
-def dashboard():
-    ano_selecionado = request.args.get('ano', datetime.now().year, type=int)
-    mes_selecionado = request.args.get('mes', datetime.now().month, type=int)
+# Totais do resumo do mês enviados pela API do dashboard
+CAMPOS_TOTAIS = (
+    'total_receitas_mes', 'total_despesas_mes', 'total_faturas_mes',
+    'total_despesas_completo', 'receitas_pendentes', 'total_despesas_pendentes'
+)
 
+
+def _dados_do_mes(ano, mes, versao=None):
+    """
+    Receitas, despesas, cartões ativos e resumo (com as faturas) do mês. O
+    resumo é o da versão dada, já lida pela requisição, ou o da atual.
+    """
     # Filtrar lançamentos de conta (não cartão) para o mês/ano selecionado
-    lancamentos_conta_query = Lancamento.query.filter(
-        extract('year', Lancamento.data_vencimento) == ano_selecionado,
-        extract('month', Lancamento.data_vencimento) == mes_selecionado,
+    # Receitas e despesas numa única consulta, separadas aqui
+    lancamentos_conta = Lancamento.query.filter(
+        filtro_mes(Lancamento.data_vencimento, ano, mes),
         Lancamento.conta_id.isnot(None),  # Apenas lançamentos com conta
-        Lancamento.cartao_credito_id.is_(None)  # Excluir lançamentos de cartão
-    )
+        Lancamento.cartao_credito_id.is_(None),  # Excluir lançamentos de cartão
+        Lancamento.tipo.in_(('Receita', 'Despesa'))
+    ).options(*PERFIL_DASHBOARD).order_by(Lancamento.data_vencimento, Lancamento.id).all()
 
-    receitas = lancamentos_conta_query.filter_by(tipo='Receita').order_by(Lancamento.data_vencimento).all()
-    despesas = lancamentos_conta_query.filter_by(tipo='Despesa').order_by(Lancamento.data_vencimento).all()
+    receitas = [l for l in lancamentos_conta if l.tipo == 'Receita']
+    despesas = [l for l in lancamentos_conta if l.tipo == 'Despesa']
+
+    # Incluir as ocorrências das recorrências virtuais de conta no mês
+    inicio_mes, fim_mes = intervalo_mes(ano, mes)
+    for ocorrencia in ocorrencias_virtuais(inicio_mes, fim_mes, Recorrencia.conta_id.isnot(None)):
+        (receitas if ocorrencia.tipo == 'Receita' else despesas).append(ocorrencia)
+    receitas.sort(key=lambda x: x.data_vencimento)
+    despesas.sort(key=lambda x: x.data_vencimento)
+
+    # Faturas de cartões (apenas com gastos) e totais do mês, guardados em cache
+    cartoes_ativos = CartaoCredito.query.options(*PERFIL_CARTOES_DASHBOARD).filter_by(ativo=True).order_by(CartaoCredito.nome).all()
+    resumo = resumo_mes(ano, mes, receitas, despesas, cartoes_ativos, versao)
+    return receitas, despesas, cartoes_ativos, resumo
 
-    # Buscar faturas de cartões para o mês/ano selecionado
-    faturas_cartoes = []
-    cartoes_ativos = CartaoCredito.query.filter_by(ativo=True).all()
-    
-    for cartao in cartoes_ativos:
-        # Calcular valor dos gastos do cartão no mês
-        valor_gastos = db.session.query(db.func.sum(Lancamento.valor)).filter(
-            extract('year', Lancamento.data_vencimento) == ano_selecionado,
-            extract('month', Lancamento.data_vencimento) == mes_selecionado,
-            Lancamento.cartao_credito_id == cartao.id,
-            Lancamento.tipo == 'Despesa'
-        ).scalar() or 0.0
-        
-        # Apenas mostrar se houver gastos no cartão
-        if valor_gastos > 0:
-            # Verificar status da fatura
-            fatura_status = FaturaCartao.query.filter_by(
-                cartao_id=cartao.id,
-                ano=ano_selecionado,
-                mes=mes_selecionado
-            ).first()
-            
-            status_fatura = 'Pago' if (fatura_status and fatura_status.paga) else 'Pendente'
-            
-            # Criar data de vencimento da fatura
-            try:
-                data_vencimento = datetime(ano_selecionado, mes_selecionado, cartao.dia_vencimento).date()
-            except ValueError:
-                import calendar
-                ultimo_dia = calendar.monthrange(ano_selecionado, mes_selecionado)[1]
-                data_vencimento = datetime(ano_selecionado, mes_selecionado, min(cartao.dia_vencimento, ultimo_dia)).date()
-            
-            fatura = {
-                'id': f'cartao_{cartao.id}_{ano_selecionado}_{mes_selecionado}',
-                'descricao': f'Fatura {cartao.nome}',
-                'valor': valor_gastos,
-                'data_vencimento': data_vencimento,
-                'cartao': cartao,
-                'status': status_fatura,
-                'tipo': 'CartaoCredito'
-            }
-            faturas_cartoes.append(fatura)
-
-    # Ordenar faturas de cartões por data de vencimento
-    faturas_cartoes.sort(key=lambda x: x['data_vencimento'])
+
+@dashboard_bp.route('/dashboard', methods=['GET'])
+def dashboard():
+    ano_selecionado = request.args.get('ano', datetime.now().year, type=int)
+    mes_selecionado = request.args.get('mes', datetime.now().month, type=int)
+
+    receitas, despesas, cartoes_ativos, resumo = _dados_do_mes(ano_selecionado, mes_selecionado)
+    faturas_cartoes = resumo['faturas']
 
     # MUDANÇA AQUI: Filtra para buscar apenas contas do tipo 'Corrente'
     contas = Conta.query.filter_by(tipo_conta='Corrente').order_by(Conta.nome).all()
 
-    # Calcular totais para o dashboard
-    total_contas_corrente = sum(conta.saldo_atual for conta in contas)
-    total_receitas_mes = sum(r.valor for r in receitas)
-    total_despesas_mes = sum(d.valor for d in despesas)
-    total_faturas_mes = sum(f['valor'] for f in faturas_cartoes)
-    total_despesas_completo = total_despesas_mes + total_faturas_mes
-    
-    # Calcular pendentes para projeção
-    receitas_pendentes = sum(r.valor for r in receitas if r.status == 'Pendente')
-    despesas_pendentes = sum(d.valor for d in despesas if d.status == 'Pendente')
-    faturas_pendentes = sum(f['valor'] for f in faturas_cartoes if f['status'] == 'Pendente')
-    total_despesas_pendentes = despesas_pendentes + faturas_pendentes
+    # Saldos de todas as contas em uma única consulta
+    saldos = saldos_contas()
+    total_contas_corrente = sum(saldos[conta.id] for conta in contas)
 
     anos_disponiveis = range(datetime.now().year - 5, datetime.now().year + 2)
     meses_disponiveis = [
@@ -104,25 +90,116 @@ def dashboard():
         despesas=despesas,
         faturas_cartoes=faturas_cartoes,
         contas=contas,
+        saldos=saldos,
         total_contas_corrente=total_contas_corrente,
-        total_receitas_mes=total_receitas_mes,
-        total_despesas_mes=total_despesas_mes,
-        total_faturas_mes=total_faturas_mes,
-        total_despesas_completo=total_despesas_completo,
-        receitas_pendentes=receitas_pendentes,
-        total_despesas_pendentes=total_despesas_pendentes,
+        total_receitas_mes=resumo['total_receitas_mes'],
+        total_despesas_mes=resumo['total_despesas_mes'],
+        total_faturas_mes=resumo['total_faturas_mes'],
+        total_despesas_completo=resumo['total_despesas_completo'],
+        receitas_pendentes=resumo['receitas_pendentes'],
+        total_despesas_pendentes=resumo['total_despesas_pendentes'],
         anos_disponiveis=anos_disponiveis,
         meses_disponiveis=meses_disponiveis,
         ano_selecionado=ano_selecionado,
         mes_selecionado=mes_selecionado,
         categorias=Categoria.query.order_by(Categoria.nome).all(),
-        cartoes=CartaoCredito.query.filter_by(ativo=True).order_by(CartaoCredito.nome).all()
+        cartoes=cartoes_ativos
     )
 
 
-@dashboard_bp.route('/lancamentos/marcar_pago/<int:id>', methods=['POST'])
+@dashboard_bp.route('/api/projecao', methods=['GET'])
+def api_projecao():
+    """Projeção mensal de receitas, despesas, faturas e saldo: ?inicio=YYYY-MM&meses=N"""
+    hoje = datetime.now()
+    inicio = request.args.get('inicio', f'{hoje.year}-{hoje.month:02d}')
+    meses = request.args.get('meses', 12, type=int)
+
+    try:
+        inicio_data = datetime.strptime(inicio, '%Y-%m')
+    except ValueError:
+        return jsonify({'erro': 'Parâmetro inicio deve estar no formato YYYY-MM.'}), 400
+    if meses is None or not 1 <= meses <= 60:
+        return jsonify({'erro': 'Parâmetro meses deve estar entre 1 e 60.'}), 400
+
+    projecao = calcular_projecao(inicio_data.year, inicio_data.month, meses)
+    return jsonify({'inicio': inicio_data.strftime('%Y-%m'), **projecao})
+
+
+def _lancamento_json(lancamento):
+    subcategoria = lancamento.subcategoria
+    recorrencia = lancamento.recorrencia
+    parcela = None
+    if recorrencia and recorrencia.tipo == 'Parcelada':
+        parcela = [lancamento.numero_parcela, recorrencia.total_parcelas]
+    return {
+        'id': lancamento.id,
+        'descricao': lancamento.descricao,
+        'valor': para_json(lancamento.valor),
+        'status': lancamento.status,
+        'data': lancamento.data_vencimento.isoformat(),
+        'conta_id': lancamento.conta_id,
+        'conta': lancamento.conta.nome if lancamento.conta else None,
+        'cartao_id': lancamento.cartao_credito_id,
+        'subcategoria_id': lancamento.subcategoria_id,
+        'categoria_id': subcategoria.categoria_id if subcategoria else None,
+        'icone': subcategoria.categoria.icone if subcategoria else None,
+        'cor': subcategoria.categoria.cor if subcategoria else None,
+        'recorrencia_id': lancamento.recorrencia_id,
+        'descricao_base': recorrencia.descricao_base if recorrencia else None,
+        'parcela': parcela,
+    }
+
+
+def _fatura_json(fatura):
+    cartao = fatura['cartao']
+    return {
+        'cartao_id': cartao.id,
+        'descricao': fatura['descricao'],
+        'valor': para_json(fatura['valor']),
+        'paga': fatura['paga'],
+        'data': fatura['data_vencimento'].isoformat(),
+        'conta': cartao.conta_pagamento.nome if cartao.conta_pagamento else None,
+    }
+
+
+@dashboard_bp.route('/api/dashboard/<int:ano>/<int:mes>', methods=['GET'])
+def api_dashboard(ano, mes):
+    """
+    Dados do mês usados pelo dashboard (lançamentos, faturas e totais) em JSON
+    compacto. O ETag vem da versão dos dados do mês, então um If-None-Match
+    com a versão atual é respondido com 304 sem consultar os lançamentos.
+    """
+    if not 1 <= mes <= 12:
+        return jsonify({'erro': 'Mês deve estar entre 1 e 12.'}), 400
+
+    versao = versao_mes(ano, mes)
+    etag = f'{ano:04d}-{mes:02d}-{versao}'
+    if request.if_none_match.contains_weak(etag):
+        resposta = Response(status=304)
+    else:
+        receitas, despesas, _, resumo = _dados_do_mes(ano, mes, versao)
+        dados = {
+            'ano': ano,
+            'mes': mes,
+            'receitas': [_lancamento_json(r) for r in receitas],
+            'despesas': [_lancamento_json(d) for d in despesas],
+            'faturas': [_fatura_json(f) for f in resumo['faturas']],
+            'totais': {campo: para_json(resumo[campo]) for campo in CAMPOS_TOTAIS},
+        }
+        resposta = Response(
+            json.dumps(dados, ensure_ascii=False, separators=(',', ':')),
+            mimetype='application/json'
+        )
+
+    resposta.set_etag(etag)
+    # O navegador guarda a resposta, mas sempre revalida com If-None-Match
+    resposta.headers['Cache-Control'] = 'private, no-cache'
+    return resposta
+
+
+@dashboard_bp.route('/lancamentos/marcar_pago/<id>', methods=['POST'])
 def marcar_pago(id):
-    lancamento = Lancamento.query.get_or_404(id)
+    lancamento = obter_lancamento(id)
     
     if lancamento.status == 'Pendente':
         lancamento.status = 'Pago'
@@ -164,8 +241,7 @@ def marcar_fatura_paga(cartao_id, ano, mes):
     
     # Buscar se já existe um lançamento de fatura para este cartão neste mês
     fatura_existente = Lancamento.query.filter(
-        extract('year', Lancamento.data_vencimento) == ano,
-        extract('month', Lancamento.data_vencimento) == mes,
+        filtro_mes(Lancamento.data_vencimento, ano, mes),
         Lancamento.conta_id == cartao.conta_pagamento_id,
         Lancamento.descricao == f'Fatura {cartao.nome}'
     ).first()
@@ -184,21 +260,10 @@ def marcar_fatura_paga(cartao_id, ano, mes):
         db.session.commit()
     else:
         # Se não existe lançamento de fatura, criar um novo
-        try:
-            data_vencimento = datetime(ano, mes, cartao.dia_vencimento).date()
-        except ValueError:
-            import calendar
-            ultimo_dia = calendar.monthrange(ano, mes)[1]
-            data_vencimento = datetime(ano, mes, min(cartao.dia_vencimento, ultimo_dia)).date()
+        data_vencimento = data_vencimento_fatura(cartao, ano, mes)
         
         # Calcular valor da fatura baseado nos gastos do cartão no mês
-        valor_fatura = db.session.query(db.func.sum(Lancamento.valor)).filter(
-            extract('year', Lancamento.data_vencimento) == ano,
-            extract('month', Lancamento.data_vencimento) == mes,
-            Lancamento.cartao_credito_id == cartao_id,
-            Lancamento.tipo == 'Despesa',
-            ~Lancamento.descricao.like('Fatura %')  # Excluir faturas já criadas
-        ).scalar() or 0.0
+        valor_fatura = resumo_faturas(ano, mes, [cartao])[0]['valor']
         
         # Criar novo lançamento de fatura como PAGO
         nova_fatura = Lancamento(
@@ -218,18 +283,15 @@ def marcar_fatura_paga(cartao_id, ano, mes):
 
 @dashboard_bp.route('/dashboard/editar_lancamento', methods=['POST'])
 def editar_lancamento_dashboard():
-    from datetime import datetime
-    from models import Lancamento, Recorrencia
-    
     tipo_edicao = request.form.get('tipo_edicao')
     lancamento_id = request.form.get('lancamento_id')
     
     if tipo_edicao == 'unico':
         # Editar lançamento único
-        lancamento = Lancamento.query.get_or_404(lancamento_id)
+        lancamento = obter_lancamento(lancamento_id)
         
         lancamento.descricao = request.form['descricao']
-        lancamento.valor = float(request.form['valor'])
+        lancamento.valor = para_dinheiro(request.form['valor'])
         lancamento.data_vencimento = datetime.strptime(request.form['data_vencimento'], '%Y-%m-%d').date()
         lancamento.subcategoria_id = request.form['subcategoria_id']
         
@@ -249,11 +311,11 @@ def editar_lancamento_dashboard():
     
     elif tipo_edicao in ['apenas_mes', 'futuros']:
         # Editar recorrência
-        lancamento_base = Lancamento.query.get_or_404(lancamento_id)
+        lancamento_base = obter_lancamento(lancamento_id)
         recorrencia_id = request.form.get('recorrencia_id')
         
         nova_descricao = request.form['descricao']
-        novo_valor = float(request.form['valor'])
+        novo_valor = para_dinheiro(request.form['valor'])
         nova_subcategoria_id = request.form['subcategoria_id']
         data_inicio = datetime.strptime(request.form['data_inicio'], '%Y-%m-%d').date()
         
@@ -279,30 +341,23 @@ def editar_lancamento_dashboard():
         elif tipo_edicao == 'futuros':
             # Editar este e futuros lançamentos
             recorrencia = Recorrencia.query.get_or_404(recorrencia_id)
-            recorrencia.descricao_base = nova_descricao
             
-            lancamentos_para_alterar = Lancamento.query.filter(
-                Lancamento.recorrencia_id == recorrencia_id,
-                Lancamento.data_vencimento >= data_inicio
-            ).all()
+            # Recorrências virtuais: as ocorrências ainda não gravadas seguem a
+            # regra do grupo, dividida na data se houver ocorrências anteriores
+            if lancamento_base.cartao_credito_id:
+                atualizar_regra(recorrencia, data_inicio, descricao_base=nova_descricao, valor=novo_valor,
+                                subcategoria_id=nova_subcategoria_id, cartao_credito_id=novo_cartao_id)
+            else:
+                atualizar_regra(recorrencia, data_inicio, descricao_base=nova_descricao, valor=novo_valor,
+                                subcategoria_id=nova_subcategoria_id, conta_id=nova_conta_id)
             
-            for lancamento in lancamentos_para_alterar:
-                lancamento.valor = novo_valor
-                lancamento.subcategoria_id = nova_subcategoria_id
-                
-                if lancamento.cartao_credito_id:
-                    lancamento.cartao_credito_id = novo_cartao_id
-                else:
-                    lancamento.conta_id = nova_conta_id
-                
-                # Atualizar descrição para parceladas
-                if recorrencia.tipo == 'Parcelada':
-                    descricao_base = nova_descricao
-                    parcelas_ordenadas = sorted([l for l in recorrencia.lancamentos], key=lambda x: x.data_vencimento)
-                    indice_parcela = parcelas_ordenadas.index(lancamento) + 1
-                    lancamento.descricao = f"{descricao_base} ({indice_parcela}/{recorrencia.total_parcelas})"
-                else:
-                    lancamento.descricao = nova_descricao
+            # Um único UPDATE nos lançamentos já gravados a partir da data
+            if lancamento_base.cartao_credito_id:
+                atualizar_futuros(recorrencia, data_inicio, descricao=nova_descricao, valor=novo_valor,
+                                  subcategoria_id=nova_subcategoria_id, cartao_credito_id=novo_cartao_id)
+            else:
+                atualizar_futuros(recorrencia, data_inicio, descricao=nova_descricao, valor=novo_valor,
+                                  subcategoria_id=nova_subcategoria_id, conta_id=nova_conta_id)
             
             flash('Recorrência atualizada a partir desta data!', 'success')
         
@@ -315,11 +370,9 @@ def editar_lancamento_dashboard():
 
 @dashboard_bp.route('/dashboard/excluir_lancamento', methods=['POST'])
 def excluir_lancamento_dashboard():
-    from models import Lancamento, Recorrencia
-    
     tipo_exclusao = request.form.get('tipo_exclusao')
     lancamento_id = request.form.get('lancamento_id')
-    lancamento = Lancamento.query.get_or_404(lancamento_id)
+    lancamento = obter_lancamento(lancamento_id)
     
     # Capturar dados para redirecionamento
     ano = lancamento.data_vencimento.year
@@ -327,33 +380,25 @@ def excluir_lancamento_dashboard():
     
     if tipo_exclusao == 'unico':
         # Excluir apenas este lançamento
-        db.session.delete(lancamento)
+        excluir_ocorrencia(lancamento)
         flash('Lançamento excluído com sucesso!', 'info')
     
     elif tipo_exclusao == 'apenas_mes':
         # Excluir apenas este lançamento da recorrência
-        db.session.delete(lancamento)
+        excluir_ocorrencia(lancamento)
         flash('Lançamento do mês excluído com sucesso!', 'info')
     
     elif tipo_exclusao == 'futuros':
         # Excluir este e futuros lançamentos da recorrência
         recorrencia_id = request.form.get('recorrencia_id')
+        recorrencia = lancamento.recorrencia
         data_base = lancamento.data_vencimento
         
-        lancamentos_a_deletar = Lancamento.query.filter(
-            Lancamento.recorrencia_id == recorrencia_id,
-            Lancamento.data_vencimento >= data_base
-        ).all()
-        
-        for lanc in lancamentos_a_deletar:
-            db.session.delete(lanc)
+        # Recorrências virtuais: encerrar a regra antes desta data
+        encerrar_recorrencia(recorrencia, data_base)
         
-        # Se não sobraram lançamentos, deletar a recorrência
-        recorrencia_restante = Lancamento.query.filter_by(recorrencia_id=recorrencia_id).first()
-        if not recorrencia_restante:
-            recorrencia_pai = Recorrencia.query.get(recorrencia_id)
-            if recorrencia_pai:
-                db.session.delete(recorrencia_pai)
+        # Um único DELETE; se não sobraram lançamentos, deleta a recorrência
+        excluir_futuros(recorrencia_id, data_base)
         
         flash('Lançamentos futuros da recorrência foram excluídos!', 'info')
     
@@ -0,0 +1,67 @@
+# app_routes/exportacao_routes.py
+
+from datetime import datetime
+
+from flask import Blueprint, Response, abort, request, stream_with_context
+
+from extensions import db
+from models import CartaoCredito, Conta
+from app_services.exportacao import gerar_csv, gerar_ofx, linhas_exportacao
+from app_services.saldos import saldo_conta
+
+exportacao_bp = Blueprint(
+    'exportacao_bp', __name__,
+    template_folder='../templates'
+)
+
+
+def _data_do_filtro(nome):
+    valor = request.args.get(nome)
+    if not valor:
+        return None
+    try:
+        return datetime.strptime(valor, '%Y-%m-%d').date()
+    except ValueError:
+        abort(400, f"Data inválida em '{nome}': use AAAA-MM-DD.")
+
+
+def _filtros():
+    """Filtros da exportação na query string: conta_id, cartao_id, categoria_id, subcategoria_id, inicio e fim"""
+    return {
+        'conta_id': request.args.get('conta_id', type=int),
+        'cartao_id': request.args.get('cartao_id', type=int),
+        'categoria_id': request.args.get('categoria_id', type=int),
+        'subcategoria_id': request.args.get('subcategoria_id', type=int),
+        'inicio': _data_do_filtro('inicio'),
+        'fim': _data_do_filtro('fim'),
+    }
+
+
+def _resposta(gerador, mimetype, arquivo):
+    # stream_with_context mantém a sessão aberta enquanto o arquivo é enviado
+    return Response(
+        stream_with_context(gerador),
+        mimetype=mimetype,
+        headers={'Content-Disposition': f'attachment; filename={arquivo}'}
+    )
+
+
+@exportacao_bp.route('/export/lancamentos.csv')
+def exportar_csv():
+    filtros = _filtros()
+    return _resposta(gerar_csv(linhas_exportacao(**filtros)), 'text/csv; charset=utf-8', 'lancamentos.csv')
+
+
+@exportacao_bp.route('/export/lancamentos.ofx')
+def exportar_ofx():
+    filtros = _filtros()
+    conta = db.get_or_404(Conta, filtros['conta_id']) if filtros['conta_id'] else None
+    cartao = db.get_or_404(CartaoCredito, filtros['cartao_id']) if filtros['cartao_id'] else None
+    # O saldo da conta só faz sentido quando o extrato é dela
+    saldo = saldo_conta(conta.id) if conta is not None and cartao is None else None
+
+    gerador = gerar_ofx(
+        linhas_exportacao(**filtros), inicio=filtros['inicio'], fim=filtros['fim'],
+        conta=conta, cartao=cartao, saldo=saldo
+    )
+    return _resposta(gerador, 'application/x-ofx', 'lancamentos.ofx')
@@ -2,17 +2,32 @@
 
 from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify
 from datetime import datetime
-from dateutil.relativedelta import relativedelta
-from decimal import Decimal
+from sqlalchemy.orm import joinedload
 
-from app import db
+from extensions import db
 from models import Conta, Categoria, Subcategoria, Lancamento, Recorrencia, TransferenciaGrupo, CartaoCredito
+from app_services.categorizacao import classificar
+from app_services.dinheiro import para_dinheiro
+from app_services.importacao import formato_do_arquivo, importar_extrato
+from app_services.listagem import decodificar_cursor, pagina_lancamentos
+from app_services.recorrencias import (
+    REGRAS_RECORRENCIA, atualizar_futuros, atualizar_regra, criar_recorrencia, encerrar_recorrencia,
+    excluir_futuros, excluir_ocorrencia, obter_lancamento, partes_da_recorrencia
+)
 
 lancamentos_bp = Blueprint(
     'lancamentos_bp', __name__,
     template_folder='../templates'
 )
 
+# Mensagens de sucesso das recorrências de duração fixa
+MENSAGENS_RECORRENCIA = {
+    'fixa': 'Lançamento fixo{onde} criado para os próximos {quantidade} meses!',
+    'anual': 'Lançamento anual{onde} criado para os próximos {quantidade} anos!',
+    'semanal': 'Lançamento semanal{onde} criado para as próximas {quantidade} semanas!',
+    'quinzenal': 'Lançamento quinzenal{onde} criado para as próximas {quantidade} quinzenas!',
+}
+
 @lancamentos_bp.route('/lancamentos', methods=['GET', 'POST'])
 def gerenciar_lancamentos():
     if request.method == 'POST':
@@ -21,7 +36,7 @@ def gerenciar_lancamentos():
         if tipo_lancamento in ['Receita', 'Despesa']:
             # Lógica de Receita/Despesa
             descricao = request.form.get('descricao')
-            valor_total = Decimal(request.form.get('valor'))
+            valor_total = para_dinheiro(request.form.get('valor'))
             data_vencimento_str = request.form.get('data_vencimento')
             data_vencimento = datetime.strptime(data_vencimento_str, '%Y-%m-%d').date()
             subcategoria_id = request.form.get('subcategoria_id')
@@ -31,7 +46,7 @@ def gerenciar_lancamentos():
             if recorrencia_tipo == 'unica':
                 novo_lancamento = Lancamento(
                     descricao=descricao, 
-                    valor=float(valor_total), 
+                    valor=valor_total, 
                     tipo=tipo_lancamento, 
                     data_vencimento=data_vencimento, 
                     subcategoria_id=subcategoria_id, 
@@ -41,160 +56,28 @@ def gerenciar_lancamentos():
                 flash('Lançamento único adicionado com sucesso!', 'success')
 
             elif recorrencia_tipo == 'parcelada':
-                total_parcelas = int(request.form.get('num_parcelas', 2))
                 frequencia = request.form.get('frequencia', 'Mensal')
-                tipo_recorrencia = 'Parcelada'
-                valor_total_centavos = int(valor_total * 100)
-                valor_parcela_centavos = valor_total_centavos // total_parcelas
-                resto_centavos = valor_total_centavos % total_parcelas
-
-                nova_recorrencia = Recorrencia(
-                    descricao_base=descricao, 
-                    tipo=tipo_recorrencia, 
-                    total_parcelas=total_parcelas, 
-                    frequencia=frequencia
-                )
-                db.session.add(nova_recorrencia)
-                db.session.flush()
-
-                for i in range(total_parcelas):
-                    valor_parcela_atual_centavos = valor_parcela_centavos
-                    if i == total_parcelas - 1:
-                        valor_parcela_atual_centavos += resto_centavos
-                    valor_parcela_atual = float(Decimal(valor_parcela_atual_centavos) / 100)
-
-                    if frequencia == 'Semanal': 
-                        vencimento_parcela = data_vencimento + relativedelta(weeks=i)
-                    elif frequencia == 'Quinzenal': 
-                        vencimento_parcela = data_vencimento + relativedelta(days=i*15)
-                    elif frequencia == 'Anual': 
-                        vencimento_parcela = data_vencimento + relativedelta(years=i)
-                    else: 
-                        vencimento_parcela = data_vencimento + relativedelta(months=i)
-                    
-                    descricao_parcela = f"{descricao} ({i+1}/{total_parcelas})"
-                    
-                    lancamento_rec = Lancamento(
-                        descricao=descricao_parcela, 
-                        valor=valor_parcela_atual, 
-                        tipo=tipo_lancamento, 
-                        data_vencimento=vencimento_parcela, 
-                        subcategoria_id=subcategoria_id, 
-                        conta_id=conta_id, 
-                        recorrencia_id=nova_recorrencia.id
-                    )
-                    db.session.add(lancamento_rec)
-
-                flash(f'{tipo_recorrencia} ({frequencia}) adicionada com sucesso!', 'success')
-                
-            elif recorrencia_tipo == 'fixa':
-                frequencia = 'Mensal'
-                total_meses = 60
-                nova_recorrencia = Recorrencia(
-                    descricao_base=descricao, 
-                    tipo='Fixa', 
-                    total_parcelas=total_meses, 
+                criar_recorrencia(
+                    'parcelada', descricao, valor_total, tipo_lancamento, data_vencimento, subcategoria_id,
+                    conta_id=conta_id,
+                    total_parcelas=int(request.form.get('num_parcelas', 2)),
                     frequencia=frequencia
                 )
-                db.session.add(nova_recorrencia)
-                db.session.flush()
-
-                for i in range(total_meses):
-                    vencimento_mes = data_vencimento + relativedelta(months=i)
-                    lancamento_fixo = Lancamento(
-                        descricao=descricao, 
-                        valor=float(valor_total), 
-                        tipo=tipo_lancamento, 
-                        data_vencimento=vencimento_mes, 
-                        subcategoria_id=subcategoria_id, 
-                        conta_id=conta_id, 
-                        recorrencia_id=nova_recorrencia.id
-                    )
-                    db.session.add(lancamento_fixo)
-                flash(f'Lançamento fixo criado para os próximos {total_meses} meses!', 'success')
-
-            elif recorrencia_tipo == 'anual':
-                frequencia = 'Anual'
-                total_anos = 5
-                nova_recorrencia = Recorrencia(
-                    descricao_base=descricao, 
-                    tipo='Anual', 
-                    total_parcelas=total_anos, 
-                    frequencia=frequencia
-                )
-                db.session.add(nova_recorrencia)
-                db.session.flush()
-
-                for i in range(total_anos):
-                    vencimento_anual = data_vencimento + relativedelta(years=i)
-                    lancamento_anual = Lancamento(
-                        descricao=descricao, 
-                        valor=float(valor_total), 
-                        tipo=tipo_lancamento, 
-                        data_vencimento=vencimento_anual, 
-                        subcategoria_id=subcategoria_id, 
-                        conta_id=conta_id, 
-                        recorrencia_id=nova_recorrencia.id
-                    )
-                    db.session.add(lancamento_anual)
-                flash(f'Lançamento anual criado para os próximos {total_anos} anos!', 'success')
-
-            elif recorrencia_tipo == 'semanal':
-                frequencia = 'Semanal'
-                total_semanas = 52
-                nova_recorrencia = Recorrencia(
-                    descricao_base=descricao, 
-                    tipo='Semanal', 
-                    total_parcelas=total_semanas, 
-                    frequencia=frequencia
-                )
-                db.session.add(nova_recorrencia)
-                db.session.flush()
-
-                for i in range(total_semanas):
-                    vencimento_semanal = data_vencimento + relativedelta(weeks=i)
-                    lancamento_semanal = Lancamento(
-                        descricao=descricao, 
-                        valor=float(valor_total), 
-                        tipo=tipo_lancamento, 
-                        data_vencimento=vencimento_semanal, 
-                        subcategoria_id=subcategoria_id, 
-                        conta_id=conta_id, 
-                        recorrencia_id=nova_recorrencia.id
-                    )
-                    db.session.add(lancamento_semanal)
-                flash(f'Lançamento semanal criado para as próximas {total_semanas} semanas!', 'success')
-
-            elif recorrencia_tipo == 'quinzenal':
-                frequencia = 'Quinzenal'
-                total_quinzenas = 26
-                nova_recorrencia = Recorrencia(
-                    descricao_base=descricao, 
-                    tipo='Quinzenal', 
-                    total_parcelas=total_quinzenas, 
-                    frequencia=frequencia
+                flash(f'Parcelada ({frequencia}) adicionada com sucesso!', 'success')
+
+            elif recorrencia_tipo in REGRAS_RECORRENCIA:
+                nova_recorrencia = criar_recorrencia(
+                    recorrencia_tipo, descricao, valor_total, tipo_lancamento, data_vencimento, subcategoria_id,
+                    conta_id=conta_id
                 )
-                db.session.add(nova_recorrencia)
-                db.session.flush()
-
-                for i in range(total_quinzenas):
-                    vencimento_quinzenal = data_vencimento + relativedelta(days=i*15)
-                    lancamento_quinzenal = Lancamento(
-                        descricao=descricao, 
-                        valor=float(valor_total), 
-                        tipo=tipo_lancamento, 
-                        data_vencimento=vencimento_quinzenal, 
-                        subcategoria_id=subcategoria_id, 
-                        conta_id=conta_id, 
-                        recorrencia_id=nova_recorrencia.id
-                    )
-                    db.session.add(lancamento_quinzenal)
-                flash(f'Lançamento quinzenal criado para as próximas {total_quinzenas} quinzenas!', 'success')
+                flash(MENSAGENS_RECORRENCIA[recorrencia_tipo].format(
+                    onde='', quantidade=nova_recorrencia.total_parcelas
+                ), 'success')
 
         elif tipo_lancamento == 'CartaoCredito':
             # Lógica para Cartão de Crédito
             descricao = request.form.get('descricao')
-            valor_total = Decimal(request.form.get('valor'))
+            valor_total = para_dinheiro(request.form.get('valor'))
             data_vencimento_str = request.form.get('data_vencimento')
             data_lancamento = datetime.strptime(data_vencimento_str, '%Y-%m-%d').date()
             subcategoria_id = request.form.get('subcategoria_cartao_id')
@@ -223,7 +106,7 @@ def gerenciar_lancamentos():
             if recorrencia_tipo == 'unica':
                 novo_lancamento = Lancamento(
                     descricao=descricao, 
-                    valor=float(valor_total), 
+                    valor=valor_total, 
                     tipo='Despesa',
                     data_vencimento=data_vencimento_fatura, 
                     subcategoria_id=subcategoria_id, 
@@ -234,164 +117,27 @@ def gerenciar_lancamentos():
                 flash('Lançamento no cartão de crédito adicionado com sucesso!', 'success')
 
             elif recorrencia_tipo == 'parcelada':
-                total_parcelas = int(request.form.get('num_parcelas_cartao', 2))
                 frequencia = request.form.get('frequencia_cartao', 'Mensal')
-                tipo_recorrencia = 'Parcelada'
-                valor_total_centavos = int(valor_total * 100)
-                valor_parcela_centavos = valor_total_centavos // total_parcelas
-                resto_centavos = valor_total_centavos % total_parcelas
-
-                nova_recorrencia = Recorrencia(
-                    descricao_base=descricao, 
-                    tipo=tipo_recorrencia, 
-                    total_parcelas=total_parcelas, 
+                criar_recorrencia(
+                    'parcelada', descricao, valor_total, 'Despesa', data_vencimento_fatura, subcategoria_id,
+                    cartao_credito_id=cartao_credito_id,
+                    total_parcelas=int(request.form.get('num_parcelas_cartao', 2)),
                     frequencia=frequencia
                 )
-                db.session.add(nova_recorrencia)
-                db.session.flush()
-
-                for i in range(total_parcelas):
-                    valor_parcela_atual_centavos = valor_parcela_centavos
-                    if i == total_parcelas - 1:
-                        valor_parcela_atual_centavos += resto_centavos
-                    valor_parcela_atual = float(Decimal(valor_parcela_atual_centavos) / 100)
-
-                    if frequencia == 'Semanal': 
-                        vencimento_parcela = data_vencimento_fatura + relativedelta(weeks=i)
-                    elif frequencia == 'Quinzenal': 
-                        vencimento_parcela = data_vencimento_fatura + relativedelta(days=i*15)
-                    elif frequencia == 'Anual': 
-                        vencimento_parcela = data_vencimento_fatura + relativedelta(years=i)
-                    else: 
-                        vencimento_parcela = data_vencimento_fatura + relativedelta(months=i)
-                    
-                    descricao_parcela = f"{descricao} ({i+1}/{total_parcelas})"
-                    
-                    lancamento_rec = Lancamento(
-                        descricao=descricao_parcela, 
-                        valor=valor_parcela_atual, 
-                        tipo='Despesa', 
-                        data_vencimento=vencimento_parcela, 
-                        subcategoria_id=subcategoria_id, 
-                        cartao_credito_id=cartao_credito_id,
-                        conta_id=None,
-                        recorrencia_id=nova_recorrencia.id
-                    )
-                    db.session.add(lancamento_rec)
-
                 flash(f'Parcelamento no cartão ({frequencia}) adicionado com sucesso!', 'success')
-                
-            elif recorrencia_tipo == 'fixa':
-                frequencia = 'Mensal'
-                total_meses = 60
-                nova_recorrencia = Recorrencia(
-                    descricao_base=descricao, 
-                    tipo='Fixa', 
-                    total_parcelas=total_meses, 
-                    frequencia=frequencia
-                )
-                db.session.add(nova_recorrencia)
-                db.session.flush()
-
-                for i in range(total_meses):
-                    vencimento_mes = data_vencimento_fatura + relativedelta(months=i)
-                    lancamento_fixo = Lancamento(
-                        descricao=descricao, 
-                        valor=float(valor_total), 
-                        tipo='Despesa', 
-                        data_vencimento=vencimento_mes, 
-                        subcategoria_id=subcategoria_id, 
-                        cartao_credito_id=cartao_credito_id,
-                        conta_id=None,
-                        recorrencia_id=nova_recorrencia.id
-                    )
-                    db.session.add(lancamento_fixo)
-                flash(f'Lançamento fixo no cartão criado para os próximos {total_meses} meses!', 'success')
-
-            elif recorrencia_tipo == 'anual':
-                frequencia = 'Anual'
-                total_anos = 5
-                nova_recorrencia = Recorrencia(
-                    descricao_base=descricao, 
-                    tipo='Anual', 
-                    total_parcelas=total_anos, 
-                    frequencia=frequencia
-                )
-                db.session.add(nova_recorrencia)
-                db.session.flush()
-
-                for i in range(total_anos):
-                    vencimento_anual = data_vencimento_fatura + relativedelta(years=i)
-                    lancamento_anual = Lancamento(
-                        descricao=descricao, 
-                        valor=float(valor_total), 
-                        tipo='Despesa', 
-                        data_vencimento=vencimento_anual, 
-                        subcategoria_id=subcategoria_id, 
-                        cartao_credito_id=cartao_credito_id,
-                        conta_id=None,
-                        recorrencia_id=nova_recorrencia.id
-                    )
-                    db.session.add(lancamento_anual)
-                flash(f'Lançamento anual no cartão criado para os próximos {total_anos} anos!', 'success')
-
-            elif recorrencia_tipo == 'semanal':
-                frequencia = 'Semanal'
-                total_semanas = 52
-                nova_recorrencia = Recorrencia(
-                    descricao_base=descricao, 
-                    tipo='Semanal', 
-                    total_parcelas=total_semanas, 
-                    frequencia=frequencia
-                )
-                db.session.add(nova_recorrencia)
-                db.session.flush()
-
-                for i in range(total_semanas):
-                    vencimento_semanal = data_vencimento_fatura + relativedelta(weeks=i)
-                    lancamento_semanal = Lancamento(
-                        descricao=descricao, 
-                        valor=float(valor_total), 
-                        tipo='Despesa', 
-                        data_vencimento=vencimento_semanal, 
-                        subcategoria_id=subcategoria_id, 
-                        cartao_credito_id=cartao_credito_id,
-                        conta_id=None,
-                        recorrencia_id=nova_recorrencia.id
-                    )
-                    db.session.add(lancamento_semanal)
-                flash(f'Lançamento semanal no cartão criado para as próximas {total_semanas} semanas!', 'success')
-
-            elif recorrencia_tipo == 'quinzenal':
-                frequencia = 'Quinzenal'
-                total_quinzenas = 26
-                nova_recorrencia = Recorrencia(
-                    descricao_base=descricao, 
-                    tipo='Quinzenal', 
-                    total_parcelas=total_quinzenas, 
-                    frequencia=frequencia
+
+            elif recorrencia_tipo in REGRAS_RECORRENCIA:
+                nova_recorrencia = criar_recorrencia(
+                    recorrencia_tipo, descricao, valor_total, 'Despesa', data_vencimento_fatura, subcategoria_id,
+                    cartao_credito_id=cartao_credito_id
                 )
-                db.session.add(nova_recorrencia)
-                db.session.flush()
-
-                for i in range(total_quinzenas):
-                    vencimento_quinzenal = data_vencimento_fatura + relativedelta(days=i*15)
-                    lancamento_quinzenal = Lancamento(
-                        descricao=descricao, 
-                        valor=float(valor_total), 
-                        tipo='Despesa', 
-                        data_vencimento=vencimento_quinzenal, 
-                        subcategoria_id=subcategoria_id, 
-                        cartao_credito_id=cartao_credito_id,
-                        conta_id=None,
-                        recorrencia_id=nova_recorrencia.id
-                    )
-                    db.session.add(lancamento_quinzenal)
-                flash(f'Lançamento quinzenal no cartão criado para as próximas {total_quinzenas} quinzenas!', 'success')
+                flash(MENSAGENS_RECORRENCIA[recorrencia_tipo].format(
+                    onde=' no cartão', quantidade=nova_recorrencia.total_parcelas
+                ), 'success')
         
         elif tipo_lancamento == 'Transferencia':
             descricao = request.form.get('descricao')
-            valor = float(request.form.get('valor'))
+            valor = para_dinheiro(request.form.get('valor'))
             data_str = request.form.get('data_vencimento')
             data = datetime.strptime(data_str, '%Y-%m-%d').date()
             conta_origem_id = request.form.get('conta_origem_id')
@@ -441,51 +187,12 @@ def gerenciar_lancamentos():
         db.session.commit()
         return redirect(url_for('lancamentos_bp.gerenciar_lancamentos'))
 
-    lancamentos_unicos = Lancamento.query.filter(
-        Lancamento.recorrencia_id == None, 
-        Lancamento.transferencia_grupo_id == None
-    ).all()
-    
-    recorrencias = Recorrencia.query.all()
-    
-    transferencias = TransferenciaGrupo.query.all()
-    
-    todos_lancamentos = []
-    
-    for lancamento in lancamentos_unicos:
-        todos_lancamentos.append({
-            'tipo': 'unico',
-            'objeto': lancamento
-        })
-    
-    for recorrencia in recorrencias:
-        todos_lancamentos.append({
-            'tipo': 'recorrencia',
-            'objeto': recorrencia
-        })
-    
-    for transferencia in transferencias:
-        todos_lancamentos.append({
-            'tipo': 'transferencia', 
-            'objeto': transferencia
-        })
-    
-    def get_sort_key(item):
-        obj = item['objeto']
-        data_ref = obj.data_criacao
-        
-        if not data_ref:
-            data_ref = datetime.now()
-        
-        return (data_ref, obj.id)
-
-    todos_lancamentos.sort(
-        key=get_sort_key,
-        reverse=True
-    )
+    cursor = decodificar_cursor(request.args.get('apos'))
+    todos_lancamentos, proximo_cursor = pagina_lancamentos(cursor)
     
     contas = Conta.query.order_by(Conta.nome).all()
-    categorias = Categoria.query.order_by(Categoria.nome).all()
+    # As subcategorias são usadas no formulário de importação de extrato
+    categorias = Categoria.query.options(joinedload(Categoria.subcategorias)).order_by(Categoria.nome).all()
     cartoes = CartaoCredito.query.filter_by(ativo=True).order_by(CartaoCredito.nome).all()
     
     return render_template(
@@ -493,9 +200,48 @@ def gerenciar_lancamentos():
         contas=contas, 
         categorias=categorias,
         cartoes=cartoes,
-        todos_lancamentos=todos_lancamentos
+        todos_lancamentos=todos_lancamentos,
+        proximo_cursor=proximo_cursor,
+        primeira_pagina=cursor is None
     )
 
+@lancamentos_bp.route('/lancamentos/importar', methods=['POST'])
+def importar_lancamentos():
+    arquivo = request.files.get('arquivo')
+    destino = request.form.get('destino', '')
+    tipo_destino, _, destino_id = destino.partition('-')
+
+    if not arquivo or not arquivo.filename:
+        flash('Selecione o arquivo do extrato.', 'danger')
+        return redirect(url_for('lancamentos_bp.gerenciar_lancamentos'))
+
+    try:
+        resultado = importar_extrato(
+            arquivo.stream, formato_do_arquivo(arquivo.filename),
+            request.form.get('subcategoria_id', type=int),
+            conta_id=int(destino_id) if tipo_destino == 'conta' else None,
+            cartao_id=int(destino_id) if tipo_destino == 'cartao' else None
+        )
+        db.session.commit()
+    except ValueError as e:
+        db.session.rollback()
+        flash(f'Não foi possível importar o extrato: {e}', 'danger')
+        return redirect(url_for('lancamentos_bp.gerenciar_lancamentos'))
+
+    flash(f"{resultado['inseridas']} lançamentos importados, {resultado['categorizadas']} categorizados pelas regras "
+          f"({resultado['duplicadas']} já existiam, {resultado['ignoradas']} ignorados) "
+          f"em {resultado['segundos']:.1f}s.", 'success')
+    return redirect(url_for('lancamentos_bp.gerenciar_lancamentos'))
+
+@lancamentos_bp.route('/api/categorizar')
+def api_categorizar():
+    """Sugestão de subcategoria para a descrição digitada, pelas regras de categorização"""
+    subcategoria_id = classificar([request.args.get('descricao', '')])[0]
+    subcategoria = db.session.get(Subcategoria, subcategoria_id) if subcategoria_id else None
+    if subcategoria is None:
+        return jsonify({'subcategoria_id': None, 'categoria_id': None})
+    return jsonify({'subcategoria_id': subcategoria.id, 'categoria_id': subcategoria.categoria_id})
+
 @lancamentos_bp.route('/api/subcategorias/<int:categoria_id>')
 def api_get_subcategorias(categoria_id):
     subcategorias = Subcategoria.query.filter_by(categoria_id=categoria_id).order_by(Subcategoria.nome).all()
@@ -508,31 +254,22 @@ def deletar_lancamento():
     recorrencia_id = request.form.get('recorrencia_id')
 
     if tipo_exclusao == 'unico':
-        lancamento = Lancamento.query.get_or_404(lancamento_id)
-        db.session.delete(lancamento)
+        lancamento = obter_lancamento(lancamento_id)
+        excluir_ocorrencia(lancamento)
         flash('Lançamento deletado com sucesso.', 'info')
 
     elif tipo_exclusao == 'todos_recorrencia':
+        # A recorrência de origem leva junto as partes criadas ao dividir a regra
         recorrencia = Recorrencia.query.get_or_404(recorrencia_id)
-        db.session.delete(recorrencia)
+        db.session.delete(partes_da_recorrencia(recorrencia)[0])
         flash('Toda a recorrência foi deletada com sucesso.', 'info')
 
     elif tipo_exclusao == 'futuros_recorrencia':
-        lancamento_base = Lancamento.query.get_or_404(lancamento_id)
+        lancamento_base = obter_lancamento(lancamento_id)
         data_base = lancamento_base.data_vencimento
         
-        lancamentos_a_deletar = Lancamento.query.filter(
-            Lancamento.recorrencia_id == recorrencia_id,
-            Lancamento.data_vencimento >= data_base
-        ).all()
-        
-        for lanc in lancamentos_a_deletar:
-            db.session.delete(lanc)
-        
-        recorrencia_restante = Lancamento.query.filter_by(recorrencia_id=recorrencia_id).first()
-        if not recorrencia_restante:
-            recorrencia_pai = Recorrencia.query.get(recorrencia_id)
-            db.session.delete(recorrencia_pai)
+        encerrar_recorrencia(Recorrencia.query.get(recorrencia_id), data_base)
+        excluir_futuros(recorrencia_id, data_base)
 
         flash('Este e todos os futuros lançamentos da recorrência foram deletados.', 'info')
     
@@ -544,7 +281,7 @@ def editar_lancamento_unico(id):
     lancamento = Lancamento.query.get_or_404(id)
     if request.method == 'POST':
         lancamento.descricao = request.form['descricao']
-        lancamento.valor = float(request.form['valor'])
+        lancamento.valor = para_dinheiro(request.form['valor'])
         lancamento.data_vencimento = datetime.strptime(request.form['data_vencimento'], '%Y-%m-%d').date()
         
         if lancamento.cartao_credito_id:
@@ -566,13 +303,16 @@ def editar_lancamento_unico(id):
 @lancamentos_bp.route('/lancamentos/editar_recorrencia/<int:id>', methods=['GET', 'POST'])
 def editar_recorrencia(id):
     recorrencia = Recorrencia.query.get_or_404(id)
-    primeiro_lancamento = recorrencia.lancamentos[0] if recorrencia.lancamentos else None
+    primeiro_lancamento = recorrencia.primeira_ocorrencia
 
     if request.method == 'POST':
         tipo_edicao = request.form.get('tipo_edicao')
+        if tipo_edicao not in ('todos', 'futuros'):
+            flash('Tipo de edição inválido. Nenhuma alteração foi feita.', 'danger')
+            return redirect(url_for('lancamentos_bp.editar_recorrencia', id=id))
         
         nova_descricao = request.form['descricao']
-        novo_valor = float(request.form['valor'])
+        novo_valor = para_dinheiro(request.form['valor'])
         nova_subcategoria_id = request.form['subcategoria_id']
         
         if primeiro_lancamento and primeiro_lancamento.cartao_credito_id:
@@ -580,29 +320,25 @@ def editar_recorrencia(id):
         else:
             nova_conta_id = request.form['conta_id']
         
-        recorrencia.descricao_base = nova_descricao
+        # Recorrências virtuais: as ocorrências ainda não gravadas seguem a regra
+        if primeiro_lancamento and primeiro_lancamento.cartao_credito_id:
+            campos_regra = {'cartao_credito_id': novo_cartao_id}
+        else:
+            campos_regra = {'conta_id': nova_conta_id}
         
-        lancamentos_para_alterar = []
-        if tipo_edicao == 'todos':
-            lancamentos_para_alterar = recorrencia.lancamentos
-        elif tipo_edicao == 'futuros':
+        data_inicio = None
+        if tipo_edicao == 'futuros':
             data_inicio_str = request.form['data_inicio']
             data_inicio = datetime.strptime(data_inicio_str, '%Y-%m-%d').date()
-            lancamentos_para_alterar = [l for l in recorrencia.lancamentos if l.data_vencimento >= data_inicio]
 
-        for lancamento in lancamentos_para_alterar:
-            lancamento.valor = novo_valor
-            lancamento.subcategoria_id = nova_subcategoria_id
-            
-            if primeiro_lancamento and primeiro_lancamento.cartao_credito_id:
-                lancamento.cartao_credito_id = novo_cartao_id
-            else:
-                lancamento.conta_id = nova_conta_id
-                
-            if recorrencia.tipo == 'Parcelada':
-                partes = lancamento.descricao.split('(')
-                if len(partes) > 1:
-                    lancamento.descricao = f"{nova_descricao} ({partes[1]}"
+        # Com ocorrências antes de data_inicio, a regra do grupo é dividida na data
+        atualizar_regra(recorrencia, data_inicio, descricao_base=nova_descricao, valor=novo_valor,
+                        subcategoria_id=nova_subcategoria_id, **campos_regra)
+        
+        # Um único UPDATE nos lançamentos gravados; só as parceladas têm a descrição refeita
+        descricao = nova_descricao if recorrencia.tipo == 'Parcelada' else None
+        atualizar_futuros(recorrencia, data_inicio, descricao=descricao, valor=novo_valor,
+                          subcategoria_id=nova_subcategoria_id, **campos_regra)
 
         db.session.commit()
         flash('Recorrência atualizada com sucesso!', 'success')
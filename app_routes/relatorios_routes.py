@@ -0,0 +1,37 @@
+# app_routes/relatorios_routes.py
+
+from datetime import datetime
+
+from flask import Blueprint, jsonify, request
+
+from app_services.periodos import somar_meses
+from app_services.relatorios import relatorio_categorias
+
+relatorios_bp = Blueprint(
+    'relatorios_bp', __name__,
+    template_folder='../templates'
+)
+
+# Limite de meses por relatório, como na projeção
+MAXIMO_MESES = 60
+
+
+@relatorios_bp.route('/relatorios/categorias', methods=['GET'])
+def relatorio_por_categoria():
+    """Gastos por categoria/subcategoria de cada mês: ?inicio=YYYY-MM&fim=YYYY-MM (padrão: últimos 12 meses)"""
+    hoje = datetime.now()
+    fim = request.args.get('fim', f'{hoje.year}-{hoje.month:02d}')
+
+    try:
+        fim_data = datetime.strptime(fim, '%Y-%m')
+        padrao_inicio = '{}-{:02d}'.format(*somar_meses(fim_data.year, fim_data.month, -11))
+        inicio_data = datetime.strptime(request.args.get('inicio', padrao_inicio), '%Y-%m')
+    except ValueError:
+        return jsonify({'erro': 'Parâmetros inicio e fim devem estar no formato YYYY-MM.'}), 400
+
+    meses = (fim_data.year - inicio_data.year) * 12 + fim_data.month - inicio_data.month + 1
+    if not 1 <= meses <= MAXIMO_MESES:
+        return jsonify({'erro': f'O período deve ter entre 1 e {MAXIMO_MESES} meses, com inicio antes de fim.'}), 400
+
+    relatorio = relatorio_categorias(inicio_data.year, inicio_data.month, fim_data.year, fim_data.month)
+    return jsonify({'inicio': inicio_data.strftime('%Y-%m'), 'fim': fim_data.strftime('%Y-%m'), **relatorio})
@@ -0,0 +1,215 @@
+# app_services/cache.py
+
+import os
+import threading
+import uuid
+from collections import OrderedDict
+from datetime import date
+
+from flask import g, has_app_context
+from sqlalchemy import event, inspect, or_, select
+from sqlalchemy.orm import Session
+
+from extensions import db
+from models import CartaoCredito, Categoria, Conta, FaturaCartao, Lancamento, Recorrencia, Subcategoria, VersaoMes
+from app_services.upsert import insert_upsert
+
+
+# =============================================================================
+# BACKENDS
+# =============================================================================
+# Um backend guarda valores por chave (str) e implementa get(chave),
+# set(chave, valor), delete(*chaves) e clear(). get retorna None quando a
+# chave não existe. Um backend compatível com Redis pode serializar os valores
+# (apenas tipos simples e datas) e usar as mesmas chaves.
+
+class CacheLocal:
+    """Cache em memória do processo com descarte LRU"""
+
+    def __init__(self, maximo=24):
+        self.maximo = maximo
+        self._itens = OrderedDict()
+        self._trava = threading.Lock()
+
+    def get(self, chave):
+        with self._trava:
+            if chave not in self._itens:
+                return None
+            self._itens.move_to_end(chave)
+            return self._itens[chave]
+
+    def set(self, chave, valor):
+        with self._trava:
+            self._itens[chave] = valor
+            self._itens.move_to_end(chave)
+            while len(self._itens) > self.maximo:
+                self._itens.popitem(last=False)
+
+    def delete(self, *chaves):
+        with self._trava:
+            for chave in chaves:
+                self._itens.pop(chave, None)
+
+    def clear(self):
+        with self._trava:
+            self._itens.clear()
+
+
+cache_resumos = CacheLocal(int(os.getenv('RESUMO_CACHE_MAXIMO', 24)))
+
+
+def configurar_backend(backend):
+    """Troca o backend do cache de resumos mensais (ex.: um cliente Redis)"""
+    global cache_resumos
+    cache_resumos = backend
+
+
+# =============================================================================
+# RESUMOS MENSAIS
+# =============================================================================
+# A versão de cada mês fica no banco (versoes_mes) e é sorteada de novo na
+# mesma transação que altera os dados do mês. Os resumos são guardados com a
+# versão na chave: uma versão nova nunca encontra um resumo antigo, em nenhum
+# processo, e as entradas que ficaram para trás saem pelo LRU. A versão é
+# lida uma vez por requisição e guardada em g.
+
+# Versão geral: ano = mes = 0
+GERAL = (0, 0)
+
+
+def chave_mes(ano, mes, versao):
+    return f'resumo:{ano:04d}-{mes:02d}:{versao}'
+
+
+def _ler_versao(ano, mes):
+    versoes = dict(
+        ((linha.ano, linha.mes), linha.versao)
+        for linha in db.session.execute(
+            select(VersaoMes.ano, VersaoMes.mes, VersaoMes.versao).where(or_(
+                (VersaoMes.ano == ano) & (VersaoMes.mes == mes),
+                (VersaoMes.ano == GERAL[0]) & (VersaoMes.mes == GERAL[1])
+            ))
+        )
+    )
+    return f"{versoes.get(GERAL, '0')}.{versoes.get((ano, mes), '0')}"
+
+
+def versao_mes(ano, mes):
+    """
+    Versão atual dos dados do mês ('<geral>.<mês>'), lida do banco uma única
+    vez por requisição. Usada como ETag pela API do dashboard e na chave dos
+    resumos em cache.
+    """
+    if not has_app_context():
+        return _ler_versao(ano, mes)
+
+    if '_versoes_mes' not in g:
+        g._versoes_mes = {}
+    if (ano, mes) not in g._versoes_mes:
+        g._versoes_mes[(ano, mes)] = _ler_versao(ano, mes)
+    return g._versoes_mes[(ano, mes)]
+
+
+def obter_resumo(ano, mes, calcular, versao=None):
+    """
+    Retorna o resumo da versão do mês (por padrão a atual) em cache ou o
+    calcula com calcular() e guarda
+    """
+    chave = chave_mes(ano, mes, versao or versao_mes(ano, mes))
+    resumo = cache_resumos.get(chave)
+    if resumo is None:
+        resumo = calcular()
+        cache_resumos.set(chave, resumo)
+    return resumo
+
+
+def trocar_versoes(conexao, meses):
+    """Sorteia uma nova versão para cada (ano, mes), com um único upsert"""
+    if not meses:
+        return
+    if has_app_context():
+        g.pop('_versoes_mes', None)
+    comando = insert_upsert(conexao, VersaoMes.__table__).values([
+        {'ano': ano, 'mes': mes, 'versao': uuid.uuid4().hex[:12]} for ano, mes in sorted(meses)
+    ])
+    conexao.execute(comando.on_conflict_do_update(
+        index_elements=['ano', 'mes'], set_={'versao': comando.excluded.versao}
+    ))
+
+
+def meses_entre(inicio, fim):
+    """Lista os (ano, mes) de inicio até fim, inclusive"""
+    meses = []
+    ano, mes = inicio.year, inicio.month
+    while (ano, mes) <= (fim.year, fim.month):
+        meses.append((ano, mes))
+        ano, mes = (ano + 1, 1) if mes == 12 else (ano, mes + 1)
+    return meses
+
+
+# =============================================================================
+# INVALIDAÇÃO NA ESCRITA
+# =============================================================================
+# A versão dos meses afetados é trocada na própria transação da escrita: os
+# outros processos passam a ver a versão nova junto com os dados, no commit,
+# e um rollback desfaz as duas coisas. O custo é que o upsert trava a linha
+# do mês (e a linha GERAL, nas alterações de contas, cartões e categorias)
+# até o commit: escritas concorrentes no mesmo mês são serializadas nela.
+
+TODOS = 'todos'
+
+
+def _valores(obj, campo):
+    """Valores atual e anterior ao flush de um atributo"""
+    historico = inspect(obj).attrs[campo].history
+    return [v for v in (*historico.added, *historico.deleted, *historico.unchanged) if v is not None]
+
+
+def _meses_do_objeto(obj):
+    if isinstance(obj, Lancamento):
+        return {(d.year, d.month) for d in _valores(obj, 'data_vencimento')}
+
+    if isinstance(obj, FaturaCartao):
+        return {(obj.ano, obj.mes)}
+
+    if isinstance(obj, Recorrencia) and obj.virtual and obj.data_inicio:
+        # Todas as ocorrências da regra, antes e depois da alteração
+        inicio = min(_valores(obj, 'data_inicio'))
+        total = max(_valores(obj, 'total_parcelas') or [0])
+        if not total:
+            return set()
+        fim = max(obj.data_ocorrencia(total), inicio)
+        return set(meses_entre(inicio, fim))
+
+    if isinstance(obj, CartaoCredito):
+        return TODOS
+
+    # Nomes, ícones e cores aparecem nos dados de todos os meses da API
+    if isinstance(obj, (Conta, Categoria, Subcategoria)):
+        estado = inspect(obj)
+        if estado.deleted or estado.session.is_modified(obj, include_collections=False):
+            return TODOS
+    return set()
+
+
+def registrar_meses(session, meses):
+    """Troca a versão dos (ano, mes) alterados, ou a geral com TODOS"""
+    trocar_versoes(session.connection(), {GERAL} if meses == TODOS else set(meses))
+
+
+def registrar_linhas(session, linhas):
+    """Registra os meses de lançamentos gravados em lote, sem passar pelo flush"""
+    registrar_meses(session, {
+        (linha['data_vencimento'].year, linha['data_vencimento'].month)
+        for linha in linhas if isinstance(linha.get('data_vencimento'), date)
+    })
+
+
+@event.listens_for(Session, 'after_flush')
+def _coletar_meses_apos_flush(session, flush_context):
+    meses = set()
+    for obj in (*session.new, *session.dirty, *session.deleted):
+        meses_obj = _meses_do_objeto(obj)
+        meses |= {GERAL} if meses_obj == TODOS else meses_obj
+    if meses:
+        trocar_versoes(session.connection(), meses)
@@ -0,0 +1,47 @@
+# app_services/carregamento.py
+#
+# Perfis de carregamento por tela: opções de joinedload/selectinload com os
+# relacionamentos que cada template usa, para evitar um SELECT por linha.
+
+from sqlalchemy.orm import joinedload, selectinload
+
+from models import CartaoCredito, Lancamento, Recorrencia, Subcategoria, TransferenciaGrupo
+
+# Lançamentos do dashboard: categoria, conta e dados da recorrência de cada linha
+PERFIL_DASHBOARD = (
+    joinedload(Lancamento.subcategoria).joinedload(Subcategoria.categoria),
+    joinedload(Lancamento.conta),
+    joinedload(Lancamento.recorrencia),
+)
+
+# Cartões listados no dashboard, com a conta de pagamento da fatura
+PERFIL_CARTOES_DASHBOARD = (
+    joinedload(CartaoCredito.conta_pagamento),
+)
+
+# Lançamentos do extrato do cartão
+PERFIL_EXTRATO_CARTAO = (
+    joinedload(Lancamento.subcategoria).joinedload(Subcategoria.categoria),
+    joinedload(Lancamento.recorrencia),
+)
+
+# Regras das recorrências virtuais: as ocorrências calculadas usam os
+# relacionamentos da regra no lugar dos do lançamento
+PERFIL_RECORRENCIA_VIRTUAL = (
+    joinedload(Recorrencia.subcategoria).joinedload(Subcategoria.categoria),
+    joinedload(Recorrencia.conta),
+    joinedload(Recorrencia.cartao_credito),
+)
+
+# Listagem de /lancamentos
+PERFIL_LISTAGEM = {
+    Lancamento: (
+        joinedload(Lancamento.subcategoria).joinedload(Subcategoria.categoria),
+        joinedload(Lancamento.conta),
+        joinedload(Lancamento.cartao_credito),
+    ),
+    Recorrencia: PERFIL_RECORRENCIA_VIRTUAL,
+    TransferenciaGrupo: (
+        selectinload(TransferenciaGrupo.lancamentos).joinedload(Lancamento.conta),
+    ),
+}
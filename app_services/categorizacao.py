@@ -0,0 +1,200 @@
+# app_services/categorizacao.py
+#
+# Categorização automática por regras (regras_categorizacao: padrão ->
+# subcategoria). Todas as regras são compiladas num único autômato de
+# Aho-Corasick sobre as descrições normalizadas (minúsculas e sem acentos):
+# classificar uma descrição percorre cada caractere uma vez, O(tamanho da
+# descrição), qualquer que seja a quantidade de regras.
+#
+# O autômato fica em memória e é reconstruído quando as regras mudam: no
+# próprio processo logo após o commit que as alterou, e nos demais processos
+# pela assinatura (quantidade de regras, última alteração) conferida com uma
+# consulta a cada classificação.
+
+import threading
+import unicodedata
+from collections import deque
+
+from sqlalchemy import event, func, select, update
+from sqlalchemy.orm import Session
+
+from extensions import db
+from models import Lancamento, RegraCategorizacao
+from app_services import resumo_mensal
+from app_services.cache import registrar_meses
+
+TAMANHO_LOTE = 1000
+
+
+def normalizar_descricao(texto):
+    """Minúsculas, sem acentos e com os espaços colapsados"""
+    sem_acentos = unicodedata.normalize('NFKD', texto or '').encode('ascii', 'ignore').decode('ascii')
+    return ' '.join(sem_acentos.lower().split())
+
+
+# =============================================================================
+# AUTÔMATO
+# =============================================================================
+
+class Automato:
+    """
+    Aho-Corasick dos padrões. Quando mais de uma regra casa com a descrição
+    vence a de maior prioridade, depois a do padrão mais longo e, por fim, a
+    mais antiga.
+    """
+
+    def __init__(self, regras):
+        # Estado 0 é a raiz; cada estado tem as transições, o estado de falha
+        # e a melhor regra (ordem, subcategoria_id) que termina nele
+        self._transicoes = [{}]
+        self._falha = [0]
+        self._saida = [None]
+        self.quantidade = 0
+
+        for regra in regras:
+            padrao = normalizar_descricao(regra.padrao)
+            if padrao:
+                self._inserir(padrao, ((regra.prioridade or 0), len(padrao), -regra.id), regra.subcategoria_id)
+        self._calcular_falhas()
+
+    def _inserir(self, padrao, ordem, subcategoria_id):
+        estado = 0
+        for caractere in padrao:
+            proximo = self._transicoes[estado].get(caractere)
+            if proximo is None:
+                proximo = len(self._transicoes)
+                self._transicoes[estado][caractere] = proximo
+                self._transicoes.append({})
+                self._falha.append(0)
+                self._saida.append(None)
+            estado = proximo
+        self._saida[estado] = self._melhor(self._saida[estado], (ordem, subcategoria_id))
+        self.quantidade += 1
+
+    @staticmethod
+    def _melhor(a, b):
+        if a is None:
+            return b
+        if b is None:
+            return a
+        return a if a[0] >= b[0] else b
+
+    def _calcular_falhas(self):
+        """Busca em largura: a falha de cada estado é o maior sufixo que também é prefixo de um padrão"""
+        fila = deque(self._transicoes[0].values())
+        while fila:
+            estado = fila.popleft()
+            for caractere, proximo in self._transicoes[estado].items():
+                fila.append(proximo)
+                falha = self._falha[estado]
+                while falha and caractere not in self._transicoes[falha]:
+                    falha = self._falha[falha]
+                destino = self._transicoes[falha].get(caractere, 0)
+                self._falha[proximo] = destino if destino != proximo else 0
+                # Padrões que são sufixo deste também casam aqui
+                self._saida[proximo] = self._melhor(self._saida[proximo], self._saida[self._falha[proximo]])
+
+    def classificar(self, descricao):
+        """subcategoria_id da melhor regra que casa com a descrição (já normalizada), ou None"""
+        transicoes, falhas, saidas = self._transicoes, self._falha, self._saida
+        estado, melhor = 0, None
+        for caractere in descricao:
+            while estado and caractere not in transicoes[estado]:
+                estado = falhas[estado]
+            estado = transicoes[estado].get(caractere, 0)
+            if saidas[estado] is not None and (melhor is None or saidas[estado][0] > melhor[0]):
+                melhor = saidas[estado]
+        return melhor[1] if melhor else None
+
+
+# =============================================================================
+# CACHE DO AUTÔMATO
+# =============================================================================
+
+_trava = threading.Lock()
+_compilado = {'assinatura': None, 'automato': None}
+
+
+def _assinatura():
+    quantidade, alteracao = db.session.execute(
+        select(func.count(RegraCategorizacao.id), func.max(RegraCategorizacao.data_atualizacao))
+    ).one()
+    return quantidade, str(alteracao)
+
+
+def obter_automato():
+    """Autômato das regras atuais, compilado de novo apenas se elas mudaram"""
+    assinatura = _assinatura()
+    with _trava:
+        if _compilado['automato'] is None or _compilado['assinatura'] != assinatura:
+            _compilado['automato'] = Automato(RegraCategorizacao.query.order_by(RegraCategorizacao.id).all())
+            _compilado['assinatura'] = assinatura
+        return _compilado['automato']
+
+
+def invalidar_automato():
+    with _trava:
+        _compilado['automato'] = None
+
+
+def classificar(descricoes):
+    """Lista com o subcategoria_id (ou None) de cada descrição, com um único autômato"""
+    automato = obter_automato()
+    return [automato.classificar(normalizar_descricao(descricao)) for descricao in descricoes]
+
+
+@event.listens_for(Session, 'after_flush')
+def _marcar_regras_alteradas(session, flush_context):
+    if any(isinstance(obj, RegraCategorizacao) for obj in (*session.new, *session.dirty, *session.deleted)):
+        session.info['regras_alteradas'] = True
+
+
+@event.listens_for(Session, 'after_commit')
+def _recompilar_apos_commit(session):
+    if session.info.pop('regras_alteradas', False):
+        invalidar_automato()
+
+
+@event.listens_for(Session, 'after_rollback')
+def _descartar_apos_rollback(session):
+    session.info.pop('regras_alteradas', None)
+
+
+# =============================================================================
+# CATEGORIZAÇÃO DOS LANÇAMENTOS EXISTENTES
+# =============================================================================
+
+def categorizar_sem_subcategoria(tamanho_lote=TAMANHO_LOTE):
+    """
+    Percorre os lançamentos sem subcategoria em ordem de id, tamanho_lote por
+    vez, e grava a subcategoria dos que casam com alguma regra com um UPDATE
+    em lote por chave primária. Gera (lidos, categorizados) a cada lote; quem
+    chama decide quando commitar.
+    """
+    automato = obter_automato()
+    ultimo_id = 0
+    while True:
+        lote = db.session.execute(
+            select(Lancamento.id, *(getattr(Lancamento, campo) for campo in resumo_mensal.CAMPOS_RESUMO))
+            .where(Lancamento.subcategoria_id.is_(None), Lancamento.id > ultimo_id)
+            .order_by(Lancamento.id)
+            .limit(tamanho_lote)
+        ).all()
+        if not lote:
+            return
+        ultimo_id = lote[-1].id
+
+        alteracoes, antigos, novos, meses = [], [], [], set()
+        for linha in lote:
+            subcategoria_id = automato.classificar(normalizar_descricao(linha.descricao))
+            if subcategoria_id is not None:
+                alteracoes.append({'id': linha.id, 'subcategoria_id': subcategoria_id})
+                antigos.append(linha)
+                novos.append(dict(linha._mapping, subcategoria_id=subcategoria_id))
+                meses.add((linha.data_vencimento.year, linha.data_vencimento.month))
+
+        if alteracoes:
+            db.session.execute(update(Lancamento), alteracoes)
+            resumo_mensal.registrar_lote(antigos, novos)
+            registrar_meses(db.session, meses)
+        yield len(lote), len(alteracoes)
@@ -0,0 +1,39 @@
+# app_services/dinheiro.py
+#
+# Valores monetários são Decimal com duas casas no Python e NUMERIC(12,2) no
+# banco (models.Dinheiro): somas e saldos ficam exatos, sem erro de float.
+
+from decimal import ROUND_HALF_UP, Decimal, InvalidOperation
+
+ZERO = Decimal('0.00')
+CENTAVO = Decimal('0.01')
+
+
+def para_dinheiro(valor):
+    """
+    Converte texto do formulário, int, float ou Decimal em Decimal com duas
+    casas (arredondando meio centavo para cima). Floats são convertidos pelo
+    texto ('0.1' e não 0.1000000000000000055...). Levanta ValueError, como
+    float(), quando o valor não é numérico.
+    """
+    if isinstance(valor, float):
+        valor = repr(valor)
+    try:
+        return Decimal(valor).quantize(CENTAVO, rounding=ROUND_HALF_UP)
+    except (InvalidOperation, TypeError):
+        raise ValueError(f'Valor monetário inválido: {valor!r}')
+
+
+def para_centavos(valor):
+    """Valor em centavos inteiros"""
+    return int(para_dinheiro(valor) * 100)
+
+
+def de_centavos(centavos):
+    """Decimal com duas casas a partir de centavos inteiros"""
+    return Decimal(centavos).scaleb(-2)
+
+
+def para_json(valor):
+    """Número para respostas JSON (Decimal não é serializável pelo json)"""
+    return float(valor or 0)
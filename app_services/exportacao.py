@@ -0,0 +1,253 @@
+# app_services/exportacao.py
+#
+# Exportação dos lançamentos em CSV e OFX com memória constante: uma única
+# consulta com junções (conta, cartão, subcategoria e categoria) lida em
+# lotes com yield_per, que no PostgreSQL usa um cursor do lado do servidor, e
+# geradores que produzem o arquivo aos pedaços para uma resposta em streaming.
+# As ocorrências das recorrências virtuais ainda não gravadas, com os mesmos
+# filtros, são intercaladas por vencimento; elas ficam em memória, mas são
+# limitadas pelas regras (no máximo total_parcelas por recorrência), não
+# pelo número de lançamentos.
+
+import csv
+import heapq
+import io
+from collections import namedtuple
+from datetime import date, datetime, timedelta
+
+from sqlalchemy import case, func, literal, select
+from sqlalchemy.orm import aliased
+
+from extensions import db
+from models import CartaoCredito, Categoria, Conta, Lancamento, Recorrencia, Subcategoria
+from app_services.dinheiro import ZERO
+from app_services.recorrencias import ocorrencias_virtuais
+
+TAMANHO_LOTE = 1000
+
+COLUNAS_CSV = (
+    'id', 'data_vencimento', 'data_pagamento', 'descricao', 'tipo', 'status', 'valor',
+    'origem_destino', 'conta', 'cartao', 'categoria', 'subcategoria', 'parcela'
+)
+
+# Ocorrência virtual com as mesmas colunas das linhas da consulta
+LinhaVirtual = namedtuple('LinhaVirtual', COLUNAS_CSV)
+
+
+def consulta_exportacao(conta_id=None, cartao_id=None, categoria_id=None, subcategoria_id=None,
+                        inicio=None, fim=None):
+    """
+    SELECT dos lançamentos com os nomes já resolvidos, filtrado por conta,
+    cartão, categoria, subcategoria e vencimento entre inicio e fim (inclusive),
+    em ordem de vencimento.
+    """
+    conta = aliased(Conta)
+    cartao = aliased(CartaoCredito)
+    subcategoria = aliased(Subcategoria)
+    categoria = aliased(Categoria)
+
+    consulta = select(
+        Lancamento.id,
+        Lancamento.data_vencimento,
+        Lancamento.data_pagamento,
+        Lancamento.descricao,
+        Lancamento.tipo,
+        Lancamento.status,
+        Lancamento.valor,
+        # Mesma regra de Lancamento.origem_destino, resolvida na consulta
+        func.coalesce(
+            case((Lancamento.conta_id.isnot(None), conta.nome)),
+            case((Lancamento.cartao_credito_id.isnot(None), cartao.nome)),
+            literal('N/A')
+        ).label('origem_destino'),
+        conta.nome.label('conta'),
+        cartao.nome.label('cartao'),
+        categoria.nome.label('categoria'),
+        subcategoria.nome.label('subcategoria'),
+        Lancamento.numero_parcela.label('parcela'),
+    ).select_from(Lancamento).outerjoin(
+        conta, conta.id == Lancamento.conta_id
+    ).outerjoin(
+        cartao, cartao.id == Lancamento.cartao_credito_id
+    ).outerjoin(
+        subcategoria, subcategoria.id == Lancamento.subcategoria_id
+    ).outerjoin(
+        categoria, categoria.id == subcategoria.categoria_id
+    )
+
+    if conta_id:
+        consulta = consulta.where(Lancamento.conta_id == conta_id)
+    if cartao_id:
+        consulta = consulta.where(Lancamento.cartao_credito_id == cartao_id)
+    if categoria_id:
+        consulta = consulta.where(subcategoria.categoria_id == categoria_id)
+    if subcategoria_id:
+        consulta = consulta.where(Lancamento.subcategoria_id == subcategoria_id)
+    if inicio:
+        consulta = consulta.where(Lancamento.data_vencimento >= inicio)
+    if fim:
+        consulta = consulta.where(Lancamento.data_vencimento <= fim)
+
+    return consulta.order_by(Lancamento.data_vencimento, Lancamento.id)
+
+
+def _linha_virtual(ocorrencia):
+    subcategoria = ocorrencia.subcategoria
+    conta = ocorrencia.conta.nome if ocorrencia.conta_id else None
+    cartao = ocorrencia.cartao_credito.nome if ocorrencia.cartao_credito_id else None
+    return LinhaVirtual(
+        id=ocorrencia.id,
+        data_vencimento=ocorrencia.data_vencimento,
+        data_pagamento=None,
+        descricao=ocorrencia.descricao,
+        tipo=ocorrencia.tipo,
+        status=ocorrencia.status,
+        valor=ocorrencia.valor,
+        origem_destino=conta or cartao or 'N/A',
+        conta=conta,
+        cartao=cartao,
+        categoria=subcategoria.categoria.nome if subcategoria else None,
+        subcategoria=subcategoria.nome if subcategoria else None,
+        parcela=ocorrencia.numero_parcela,
+    )
+
+
+def linhas_virtuais(conta_id=None, cartao_id=None, categoria_id=None, subcategoria_id=None,
+                    inicio=None, fim=None):
+    """Ocorrências virtuais com os filtros da exportação, em ordem de vencimento"""
+    filtros = []
+    if conta_id:
+        filtros.append(Recorrencia.conta_id == conta_id)
+    if cartao_id:
+        filtros.append(Recorrencia.cartao_credito_id == cartao_id)
+    if categoria_id:
+        filtros.append(Recorrencia.subcategoria_id.in_(
+            select(Subcategoria.id).where(Subcategoria.categoria_id == categoria_id)
+        ))
+    if subcategoria_id:
+        filtros.append(Recorrencia.subcategoria_id == subcategoria_id)
+
+    # fim é inclusivo aqui e exclusivo em ocorrencias_virtuais
+    fim_exclusivo = fim + timedelta(days=1) if fim else date.max
+    linhas = [_linha_virtual(o) for o in ocorrencias_virtuais(inicio or date.min, fim_exclusivo, *filtros)]
+    linhas.sort(key=lambda linha: linha.data_vencimento)
+    return linhas
+
+
+def linhas_exportacao(**filtros):
+    """
+    Gera as linhas da exportação, lendo TAMANHO_LOTE por vez do banco e
+    intercalando as ocorrências virtuais pela data de vencimento
+    """
+    virtuais = linhas_virtuais(**filtros)
+    resultado = db.session.execute(
+        consulta_exportacao(**filtros),
+        execution_options={'yield_per': TAMANHO_LOTE}
+    )
+    try:
+        yield from heapq.merge(resultado, virtuais, key=lambda linha: linha.data_vencimento)
+    finally:
+        resultado.close()
+
+
+# =============================================================================
+# CSV
+# =============================================================================
+
+def _valor_csv(valor):
+    """Datas em dd/mm/aaaa e números com vírgula decimal, como o Excel em português espera"""
+    if isinstance(valor, date):
+        return valor.strftime('%d/%m/%Y')
+    if valor is None:
+        return ''
+    if isinstance(valor, (int, str)):
+        return valor
+    return f'{valor:.2f}'.replace('.', ',')
+
+
+def gerar_csv(linhas):
+    """Produz o CSV (separado por ';', UTF-8 com BOM) em pedaços de TAMANHO_LOTE linhas"""
+    buffer = io.StringIO()
+    escritor = csv.writer(buffer, delimiter=';', lineterminator='\r\n')
+
+    buffer.write('\ufeff')
+    escritor.writerow(COLUNAS_CSV)
+    for numero, linha in enumerate(linhas, start=1):
+        escritor.writerow([_valor_csv(getattr(linha, coluna)) for coluna in COLUNAS_CSV])
+        if numero % TAMANHO_LOTE == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+# =============================================================================
+# OFX
+# =============================================================================
+
+def _texto_ofx(texto, limite=255):
+    texto = (texto or '').replace('&', '&amp;').replace('<', '&lt;').replace('>', '&gt;')
+    return ' '.join(texto.split())[:limite]
+
+
+def _data_ofx(valor):
+    return valor.strftime('%Y%m%d')
+
+
+def gerar_ofx(linhas, inicio=None, fim=None, conta=None, cartao=None, saldo=None):
+    """
+    Produz um extrato OFX 1.02 (SGML, o formato dos bancos brasileiros). Com
+    um cartão o extrato é de cartão de crédito (CCSTMTRS); nos demais casos é
+    bancário, identificado pela conta filtrada ou por 'TODAS'. O saldo final
+    (LEDGERBAL) é 'saldo' ou, sem ele, a soma dos lançamentos exportados,
+    calculada durante o streaming.
+    """
+    agora = datetime.now().strftime('%Y%m%d%H%M%S')
+    if cartao is not None:
+        mensagens, resposta, abertura = 'CREDITCARDMSGSRSV1', 'CCSTMTTRNRS', 'CCSTMTRS'
+        conta_ofx = f'<CCACCTFROM>\n<ACCTID>{_texto_ofx(cartao.nome, 22)}\n</CCACCTFROM>\n'
+    else:
+        mensagens, resposta, abertura = 'BANKMSGSRSV1', 'STMTTRNRS', 'STMTRS'
+        acctid = _texto_ofx(conta.nome, 22) if conta is not None else 'TODAS'
+        conta_ofx = (
+            '<BANKACCTFROM>\n<BANKID>0000\n'
+            f'<ACCTID>{acctid}\n<ACCTTYPE>CHECKING\n</BANKACCTFROM>\n'
+        )
+
+    yield (
+        'OFXHEADER:100\nDATA:OFXSGML\nVERSION:102\nSECURITY:NONE\nENCODING:UTF-8\n'
+        'CHARSET:NONE\nCOMPRESSION:NONE\nOLDFILEUID:NONE\nNEWFILEUID:NONE\n\n'
+        '<OFX>\n<SIGNONMSGSRSV1>\n<SONRS>\n<STATUS>\n<CODE>0\n<SEVERITY>INFO\n</STATUS>\n'
+        f'<DTSERVER>{agora}\n<LANGUAGE>POR\n</SONRS>\n</SIGNONMSGSRSV1>\n'
+        f'<{mensagens}>\n<{resposta}>\n<TRNUID>1\n<STATUS>\n<CODE>0\n<SEVERITY>INFO\n</STATUS>\n'
+        f'<{abertura}>\n<CURDEF>BRL\n{conta_ofx}'
+        f'<BANKTRANLIST>\n<DTSTART>{_data_ofx(inicio or date(1970, 1, 1))}\n'
+        f'<DTEND>{_data_ofx(fim or date.today())}\n'
+    )
+
+    total = ZERO
+    pedaco = []
+    for numero, linha in enumerate(linhas, start=1):
+        valor = linha.valor if linha.tipo == 'Receita' else -linha.valor
+        total += valor
+        memo = ' / '.join(parte for parte in (linha.categoria, linha.subcategoria, linha.origem_destino) if parte)
+        pedaco.append(
+            '<STMTTRN>\n'
+            f'<TRNTYPE>{"CREDIT" if valor >= 0 else "DEBIT"}\n'
+            f'<DTPOSTED>{_data_ofx(linha.data_pagamento or linha.data_vencimento)}\n'
+            f'<TRNAMT>{valor:.2f}\n'
+            f'<FITID>{linha.id}\n'
+            f'<NAME>{_texto_ofx(linha.descricao, 32)}\n'
+            f'<MEMO>{_texto_ofx(memo)}\n'
+            '</STMTTRN>\n'
+        )
+        if numero % TAMANHO_LOTE == 0:
+            yield ''.join(pedaco)
+            pedaco = []
+
+    saldo = total if saldo is None else saldo
+    yield ''.join(pedaco) + (
+        '</BANKTRANLIST>\n'
+        f'<LEDGERBAL>\n<BALAMT>{saldo:.2f}\n<DTASOF>{agora}\n</LEDGERBAL>\n'
+        f'</{abertura}>\n</{resposta}>\n</{mensagens}>\n</OFX>\n'
+    )
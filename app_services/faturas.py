@@ -0,0 +1,70 @@
+# app_services/faturas.py
+
+import calendar
+from datetime import date
+
+from extensions import db
+from models import CartaoCredito, FaturaCartao, Recorrencia
+from app_services.dinheiro import ZERO
+from app_services.periodos import intervalo_mes
+from app_services.recorrencias import ocorrencias_virtuais
+
+
+def data_vencimento_fatura(cartao, ano, mes):
+    """Dia de vencimento do cartão no mês, limitado ao último dia do mês"""
+    ultimo_dia = calendar.monthrange(ano, mes)[1]
+    return date(ano, mes, min(cartao.dia_vencimento, ultimo_dia))
+
+
+def resumo_faturas(ano, mes, cartoes=None):
+    """
+    Retorna a fatura do mês de cada cartão (ativos, se nenhum for informado)
+    com o total de gastos e o status de pagamento. Os totais dos lançamentos
+    gravados vêm de faturas_cartao (uma busca pela chave cartão/ano/mês); só
+    as ocorrências das recorrências virtuais são somadas aqui.
+    """
+    if cartoes is None:
+        cartoes = CartaoCredito.query.filter_by(ativo=True).order_by(CartaoCredito.nome).all()
+    if not cartoes:
+        return []
+
+    totais = {cartao.id: [ZERO, 0, False] for cartao in cartoes}
+    linhas = db.session.query(
+        FaturaCartao.cartao_id, FaturaCartao.valor_total, FaturaCartao.qtd_lancamentos, FaturaCartao.paga
+    ).filter(
+        FaturaCartao.cartao_id.in_(list(totais)),
+        FaturaCartao.ano == ano,
+        FaturaCartao.mes == mes
+    ).all()
+    for cartao_id, valor, qtd, paga in linhas:
+        totais[cartao_id] = [valor, qtd, bool(paga)]
+
+    # Somar as ocorrências das recorrências virtuais dos cartões no mês
+    inicio, fim = intervalo_mes(ano, mes)
+    ocorrencias = ocorrencias_virtuais(
+        inicio, fim,
+        Recorrencia.cartao_credito_id.in_(list(totais)),
+        Recorrencia.tipo_lancamento == 'Despesa'
+    )
+    for ocorrencia in ocorrencias:
+        if not ocorrencia.descricao.startswith('Fatura '):
+            totais[ocorrencia.cartao_credito_id][0] += ocorrencia.valor
+            totais[ocorrencia.cartao_credito_id][1] += 1
+
+    faturas = []
+    for cartao in cartoes:
+        valor, qtd, paga = totais[cartao.id]
+        faturas.append({
+            'id': f'cartao_{cartao.id}_{ano}_{mes}',
+            'descricao': f'Fatura {cartao.nome}',
+            'valor': valor,
+            'qtd_lancamentos': qtd,
+            'data_vencimento': data_vencimento_fatura(cartao, ano, mes),
+            'cartao': cartao,
+            'paga': paga,
+            'status': 'Pago' if paga else 'Pendente',
+            'tipo': 'CartaoCredito'
+        })
+
+    faturas.sort(key=lambda x: x['data_vencimento'])
+    return faturas
@@ -0,0 +1,30 @@
+# app_services/formatacao.py
+
+from decimal import Decimal
+
+# Troca os separadores do formato inglês (1,234.56) pelos do pt_BR (1.234,56)
+_SEPARADORES_BR = str.maketrans(',.', '.,')
+
+
+def formatar_brl(valor):
+    """
+    Formata um valor em reais ("R$ 1.234,56" / "-R$ 1.234,56"), com o mesmo
+    resultado de locale.currency(valor, grouping=True) em pt_BR, mas sem
+    depender do locale do processo: não altera estado global e pode ser usada
+    por várias threads ao mesmo tempo.
+    """
+    if valor is None:
+        return 'R$ 0,00'
+    if not isinstance(valor, (int, float, Decimal)):
+        try:
+            valor = float(valor)
+        except (ValueError, TypeError):
+            return valor
+
+    texto = format(abs(valor), ',.2f').translate(_SEPARADORES_BR)
+    return f'-R$ {texto}' if valor < 0 else f'R$ {texto}'
+
+
+def formatar_brl_lista(valores):
+    """Formata uma sequência de valores de uma vez, na mesma ordem"""
+    return [formatar_brl(valor) for valor in valores]
@@ -0,0 +1,348 @@
+# app_services/importacao.py
+#
+# Importação de extratos bancários e de cartão (CSV ou OFX). O arquivo é lido
+# como stream e processado em lotes de TAMANHO_LOTE transações. Cada lote:
+#   1. busca os lançamentos que já existiam no mesmo destino nas datas ainda
+#      não vistas (uma consulta pelo índice (conta_id|cartao_credito_id,
+#      data_vencimento)) e os indexa por hash de (destino, data, valor,
+#      descrição normalizada);
+#   2. descarta as transações cujo hash já existia e classifica as demais
+#      pelas regras de categorização;
+#   3. grava as novas com um único INSERT multi-valores, mantendo saldos_conta,
+#      faturas_cartao e o cache dos meses pelos helpers de lote.
+# Nada é commitado aqui: quem chama grava o arquivo inteiro numa transação.
+
+import codecs
+import csv
+import hashlib
+import io
+import re
+import time
+from collections import Counter
+from datetime import date, datetime, timedelta
+from decimal import Decimal, InvalidOperation
+from itertools import islice
+
+from sqlalchemy import func, insert, select
+
+from extensions import db
+from models import CartaoCredito, Conta, Lancamento, Subcategoria
+from app_services import resumo_mensal, saldos, totais_faturas
+from app_services.cache import registrar_linhas
+from app_services.categorizacao import classificar, normalizar_descricao
+from app_services.dinheiro import para_dinheiro
+from app_services.periodos import somar_meses
+
+TAMANHO_LOTE = 5000
+
+# A fatura fecha alguns dias antes do vencimento: compras a partir do
+# fechamento entram na fatura seguinte
+DIAS_FECHAMENTO = 7
+
+FORMATOS = ('csv', 'ofx')
+
+COLUNAS_DATA = ('data', 'data_vencimento', 'dt', 'date')
+COLUNAS_DESCRICAO = ('descricao', 'historico', 'lancamento', 'description', 'memo')
+COLUNAS_VALOR = ('valor', 'valor_rs', 'amount', 'trnamt')
+
+
+# =============================================================================
+# CHAVE DE DEDUPLICAÇÃO
+# =============================================================================
+
+def chave_deduplicacao(destino_id, data, valor, descricao):
+    """Hash de (destino, data, valor com sinal, descrição normalizada)"""
+    texto = f'{destino_id}|{data.isoformat()}|{para_dinheiro(valor)}|{normalizar_descricao(descricao)}'
+    return hashlib.blake2b(texto.encode('utf-8'), digest_size=16).digest()
+
+
+def _valor_com_sinal(tipo, valor):
+    return valor if tipo == 'Receita' else -valor
+
+
+# =============================================================================
+# LEITURA DOS ARQUIVOS
+# =============================================================================
+
+def _chave_coluna(nome):
+    return normalizar_descricao(nome).replace(' ', '_').replace('$', '').replace('(', '').replace(')', '')
+
+
+def _ler_data(texto):
+    texto = texto.strip()
+    if texto[:8].isdigit():
+        # OFX: AAAAMMDD seguido opcionalmente de hora e fuso
+        formatos, texto = ('%Y%m%d',), texto[:8]
+    else:
+        formatos, texto = ('%d/%m/%Y', '%Y-%m-%d', '%d/%m/%y'), texto[:10]
+    for formato in formatos:
+        try:
+            return datetime.strptime(texto, formato).date()
+        except ValueError:
+            continue
+    raise ValueError(f"Data inválida: '{texto}'.")
+
+
+# 1.234 / -1.234.567: ponto como separador de milhar, sem parte decimal
+_VALOR_COM_MILHAR = re.compile(r'[-+]?[1-9]\d{0,2}(\.\d{3})+')
+
+
+def _ler_valor(texto, ponto_milhar=True):
+    """
+    Aceita 1.234,56 / 1.234 / -1234,56 / 1234.56 / R$ 10,00. Com
+    ponto_milhar=False (OFX) o ponto é sempre o separador decimal. O valor
+    nunca é arredondado: mais de duas casas decimais é erro.
+    """
+    original = texto.strip()
+    texto = original.replace('R$', '').replace(' ', '')
+    if ',' in texto or (ponto_milhar and _VALOR_COM_MILHAR.fullmatch(texto)):
+        texto = texto.replace('.', '').replace(',', '.')
+    try:
+        valor = Decimal(texto)
+    except InvalidOperation:
+        raise ValueError(f"Valor inválido: '{original}'.") from None
+    if not valor.is_finite():
+        raise ValueError(f"Valor inválido: '{original}'.")
+    if valor != para_dinheiro(valor):
+        raise ValueError(f"Valor com mais de duas casas decimais: '{original}'.")
+    return para_dinheiro(valor)
+
+
+def ler_csv(arquivo):
+    """
+    Gera (data, descricao, valor) de um CSV com cabeçalho, separado por ';' ou
+    ','. As colunas são reconhecidas pelo nome (data, descrição/histórico e
+    valor); valores negativos são saídas.
+    """
+    texto = io.TextIOWrapper(arquivo, encoding='utf-8-sig', errors='replace', newline='')
+    cabecalho = texto.readline()
+    if not cabecalho.strip():
+        raise ValueError('O arquivo CSV está vazio.')
+    delimitador = ';' if cabecalho.count(';') >= cabecalho.count(',') else ','
+    colunas = [_chave_coluna(nome) for nome in next(csv.reader([cabecalho], delimiter=delimitador))]
+
+    def posicao(nomes):
+        for nome in nomes:
+            if nome in colunas:
+                return colunas.index(nome)
+        raise ValueError(f"Coluna obrigatória ausente no CSV: {nomes[0]}.")
+
+    i_data, i_descricao, i_valor = posicao(COLUNAS_DATA), posicao(COLUNAS_DESCRICAO), posicao(COLUNAS_VALOR)
+    minimo = max(i_data, i_descricao, i_valor) + 1
+    leitor = csv.reader(texto, delimiter=delimitador)
+    for campos in leitor:
+        if not any(campo.strip() for campo in campos):
+            continue
+        # +1 pelo cabeçalho, lido fora do csv.reader
+        linha = leitor.line_num + 1
+        if len(campos) < minimo:
+            raise ValueError(f"Linha {linha} do CSV tem {len(campos)} campo(s); eram esperados {minimo}.")
+        try:
+            yield _ler_data(campos[i_data]), campos[i_descricao].strip(), _ler_valor(campos[i_valor])
+        except ValueError as erro:
+            raise ValueError(f"Linha {linha} do CSV: {erro}") from None
+
+
+_TAG_OFX = re.compile(r'<(/?)([A-Za-z0-9.]+)>([^<]*)')
+
+
+def _decodificador_ofx(cabecalho):
+    """O cabeçalho SGML diz a codificação; os bancos brasileiros usam em geral a 1252"""
+    if re.search(rb'ENCODING:\s*UTF-?8', cabecalho, re.IGNORECASE) or cabecalho.lstrip().startswith(b'<?xml'):
+        return codecs.getincrementaldecoder('utf-8')(errors='replace')
+    return codecs.getincrementaldecoder('cp1252')(errors='replace')
+
+
+def _tags_ofx(arquivo, tamanho_bloco):
+    """Gera (fechamento, tag, conteudo) das tags do OFX, lendo o arquivo em blocos"""
+    bloco = arquivo.read(tamanho_bloco)
+    decodificador = _decodificador_ofx(bloco[:1024])
+    pendente = ''
+
+    while bloco:
+        pendente += decodificador.decode(bloco)
+        # Só processa até a última tag iniciada; o resto espera o próximo bloco
+        corte = pendente.rfind('<')
+        if corte > 0:
+            yield from _TAG_OFX.findall(pendente[:corte])
+            pendente = pendente[corte:]
+        bloco = arquivo.read(tamanho_bloco)
+
+    yield from _TAG_OFX.findall(pendente + decodificador.decode(b'', final=True))
+
+
+def ler_ofx(arquivo, tamanho_bloco=64 * 1024):
+    """
+    Gera (data, descricao, valor) de cada <STMTTRN> de um OFX (SGML 1.x ou
+    XML 2.x). A descrição é o NAME, ou o MEMO quando não há NAME.
+    """
+    transacao = None
+    for fechamento, tag, conteudo in _tags_ofx(arquivo, tamanho_bloco):
+        tag = tag.upper()
+        if tag == 'STMTTRN':
+            if fechamento and transacao is not None:
+                yield _transacao_ofx(transacao)
+                transacao = None
+            elif not fechamento:
+                transacao = {}
+        elif transacao is not None and not fechamento and conteudo.strip():
+            transacao[tag] = conteudo.strip()
+
+    if transacao:
+        yield _transacao_ofx(transacao)
+
+
+def _transacao_ofx(transacao):
+    if 'DTPOSTED' not in transacao or 'TRNAMT' not in transacao:
+        raise ValueError('Transação OFX sem DTPOSTED ou TRNAMT.')
+    descricao = transacao.get('NAME') or transacao.get('MEMO') or 'Sem descrição'
+    descricao = descricao.replace('&amp;', '&').replace('&lt;', '<').replace('&gt;', '>')
+    return _ler_data(transacao['DTPOSTED']), descricao, _ler_valor(transacao['TRNAMT'], ponto_milhar=False)
+
+
+LEITORES = {'csv': ler_csv, 'ofx': ler_ofx}
+
+
+def formato_do_arquivo(nome):
+    extensao = (nome or '').rsplit('.', 1)[-1].lower()
+    if extensao not in FORMATOS:
+        raise ValueError('Formato não suportado: envie um arquivo .csv ou .ofx.')
+    return extensao
+
+
+# =============================================================================
+# IMPORTAÇÃO
+# =============================================================================
+
+def mes_da_fatura(dia_vencimento, data_compra):
+    """
+    Vencimento (dia 1 do mês, como no formulário de lançamentos) da fatura em
+    que a compra entra: a primeira cujo fechamento, DIAS_FECHAMENTO dias antes
+    do vencimento, ainda não passou na data da compra.
+    """
+    ano, mes = data_compra.year, data_compra.month
+    while True:
+        ultimo_dia = (date(*somar_meses(ano, mes, 1), 1) - timedelta(days=1)).day
+        vencimento = date(ano, mes, min(dia_vencimento, ultimo_dia))
+        if data_compra < vencimento - timedelta(days=DIAS_FECHAMENTO):
+            return date(ano, mes, 1)
+        ano, mes = somar_meses(ano, mes, 1)
+
+
+def _lotes(iteravel, tamanho):
+    iterador = iter(iteravel)
+    while lote := list(islice(iterador, tamanho)):
+        yield lote
+
+
+def _carregar_existentes(existentes, carregadas, coluna, destino_id, datas, limite_id):
+    """
+    Acrescenta a 'existentes' os hashes dos lançamentos gravados antes da
+    importação nas datas ainda não carregadas, com uma consulta pelo intervalo.
+    Extratos fora de ordem não relêem as mesmas datas a cada lote.
+    """
+    faltantes = datas - carregadas
+    if not faltantes:
+        return
+    consulta = select(Lancamento.tipo, Lancamento.valor, Lancamento.data_vencimento, Lancamento.descricao).where(
+        coluna == destino_id,
+        Lancamento.data_vencimento.between(min(faltantes), max(faltantes)),
+        Lancamento.id <= limite_id
+    )
+    for tipo, valor, vencimento, descricao in db.session.execute(consulta):
+        if vencimento in faltantes:
+            existentes[chave_deduplicacao(destino_id, vencimento, _valor_com_sinal(tipo, valor), descricao)] += 1
+    carregadas |= faltantes
+
+
+def _linha(data, descricao, valor, subcategoria_id, conta_id=None, cartao=None):
+    """Transação do extrato -> lançamento. Retorna None para créditos no cartão."""
+    base = {
+        'descricao': descricao[:100],
+        'subcategoria_id': subcategoria_id,
+        'conta_id': conta_id,
+        'cartao_credito_id': None,
+        'data_pagamento': None,
+    }
+    if cartao is not None:
+        # Pagamentos e estornos da fatura não são despesas do cartão
+        if valor >= 0:
+            return None
+        base.update(tipo='Despesa', status='Pendente', valor=-valor, cartao_credito_id=cartao.id,
+                    data_vencimento=mes_da_fatura(cartao.dia_vencimento, data))
+    else:
+        base.update(tipo='Receita' if valor > 0 else 'Despesa', status='Pago', valor=abs(valor),
+                    data_vencimento=data, data_pagamento=data)
+    return base
+
+
+def importar_extrato(arquivo, formato, subcategoria_id, conta_id=None, cartao_id=None):
+    """
+    Importa o extrato de 'arquivo' (binário) para a conta ou para o cartão.
+    Transações já existentes (mesmo hash) são ignoradas; uma transação que
+    aparece repetida no arquivo só é descartada tantas vezes quantas já existia.
+    A subcategoria vem das regras de categorização e, para as descrições que
+    não casam com nenhuma regra, de 'subcategoria_id'.
+
+    Retorna {'lidas', 'inseridas', 'duplicadas', 'ignoradas', 'categorizadas', 'segundos', 'linhas_s'}.
+    """
+    if bool(conta_id) == bool(cartao_id):
+        raise ValueError('Informe a conta ou o cartão do extrato (apenas um deles).')
+    if db.session.get(Subcategoria, subcategoria_id) is None:
+        raise ValueError('Subcategoria não encontrada.')
+
+    cartao = None
+    if cartao_id:
+        cartao = db.session.get(CartaoCredito, cartao_id)
+        if cartao is None:
+            raise ValueError('Cartão não encontrado.')
+        coluna, destino_id = Lancamento.cartao_credito_id, cartao.id
+    else:
+        if db.session.get(Conta, conta_id) is None:
+            raise ValueError('Conta não encontrada.')
+        conta_id = int(conta_id)
+        coluna, destino_id = Lancamento.conta_id, conta_id
+
+    inicio = time.perf_counter()
+    # Os lotes seguintes não devem ver como "existentes" as linhas já importadas
+    limite_id = db.session.query(func.max(Lancamento.id)).scalar() or 0
+    existentes, carregadas, descartadas = Counter(), set(), Counter()
+    resultado = {'lidas': 0, 'inseridas': 0, 'duplicadas': 0, 'ignoradas': 0, 'categorizadas': 0}
+
+    for lote in _lotes(LEITORES[formato](arquivo), TAMANHO_LOTE):
+        resultado['lidas'] += len(lote)
+        linhas = [_linha(*transacao, subcategoria_id, conta_id=None if cartao else conta_id, cartao=cartao)
+                  for transacao in lote]
+        resultado['ignoradas'] += linhas.count(None)
+        linhas = [linha for linha in linhas if linha is not None]
+        if not linhas:
+            continue
+
+        _carregar_existentes(existentes, carregadas, coluna, destino_id,
+                             {linha['data_vencimento'] for linha in linhas}, limite_id)
+        novas = []
+        for linha in linhas:
+            chave = chave_deduplicacao(destino_id, linha['data_vencimento'],
+                                       _valor_com_sinal(linha['tipo'], linha['valor']), linha['descricao'])
+            if descartadas[chave] < existentes[chave]:
+                descartadas[chave] += 1
+                continue
+            novas.append(linha)
+
+        resultado['duplicadas'] += len(linhas) - len(novas)
+        for linha, regra in zip(novas, classificar(linha['descricao'] for linha in novas)):
+            if regra is not None:
+                linha['subcategoria_id'] = regra
+                resultado['categorizadas'] += 1
+        if novas:
+            db.session.execute(insert(Lancamento), novas)
+            registrar_linhas(db.session, novas)
+            saldos.registrar_lote([], [(l['conta_id'], l['tipo'], l['status'], l['valor']) for l in novas])
+            totais_faturas.registrar_lote([], novas)
+            resumo_mensal.registrar_lote([], novas)
+            resultado['inseridas'] += len(novas)
+
+    segundos = time.perf_counter() - inicio
+    resultado['segundos'] = round(segundos, 3)
+    resultado['linhas_s'] = round(resultado['lidas'] / segundos) if segundos else 0
+    return resultado
@@ -0,0 +1,101 @@
+# app_services/instrumentacao.py
+
+import heapq
+import json
+import logging
+import os
+import time
+
+from flask import current_app, g, has_request_context, request
+from sqlalchemy import event
+
+logger = logging.getLogger('sistema_financeiro.sql')
+
+# Quantidade de comandos mais lentos guardados por requisição
+MAIS_LENTAS = 5
+
+
+def _antes_do_comando(conn, cursor, statement, parameters, context, executemany):
+    context._inicio_sql = time.perf_counter()
+
+
+def _depois_do_comando(conn, cursor, statement, parameters, context, executemany):
+    duracao_ms = (time.perf_counter() - context._inicio_sql) * 1000
+    if not has_request_context() or '_sql' not in g:
+        return
+
+    medicao = g._sql
+    medicao['comandos'] += 1
+    medicao['tempo_ms'] += duracao_ms
+
+    # Mantém apenas os N comandos mais lentos (heap mínimo pela duração)
+    item = (duracao_ms, medicao['comandos'], statement)
+    if len(medicao['lentas']) < MAIS_LENTAS:
+        heapq.heappush(medicao['lentas'], item)
+    else:
+        heapq.heappushpop(medicao['lentas'], item)
+
+    if duracao_ms >= medicao['limite_lenta_ms']:
+        logger.warning(
+            'Consulta lenta (%.1f ms) em %s %s: %s | parâmetros: %r',
+            duracao_ms, request.method, request.path, statement, parameters
+        )
+
+
+def _iniciar_medicao():
+    g._sql = {
+        'inicio': time.perf_counter(),
+        'comandos': 0,
+        'tempo_ms': 0.0,
+        'espera_pool_ms': 0.0,
+        'lentas': [],
+        'limite_lenta_ms': current_app.config['SQL_LENTA_MS'],
+    }
+
+
+def _finalizar_medicao(response):
+    medicao = g.pop('_sql', None)
+    if medicao is None:
+        return response
+
+    total_ms = (time.perf_counter() - medicao['inicio']) * 1000
+    response.headers.add(
+        'Server-Timing',
+        f'sql;dur={medicao["tempo_ms"]:.1f};desc="{medicao["comandos"]} consultas", '
+        f'pool;dur={medicao["espera_pool_ms"]:.1f}, app;dur={total_ms:.1f}'
+    )
+
+    if not logger.isEnabledFor(logging.DEBUG):
+        return response
+    logger.debug(json.dumps({
+        'metodo': request.method,
+        'caminho': request.path,
+        'status': response.status_code,
+        'consultas': medicao['comandos'],
+        'sql_ms': round(medicao['tempo_ms'], 2),
+        'espera_pool_ms': round(medicao['espera_pool_ms'], 2),
+        'total_ms': round(total_ms, 2),
+        'mais_lentas': [
+            {'ms': round(duracao, 2), 'sql': ' '.join(sql.split())[:200]}
+            for duracao, _, sql in sorted(medicao['lentas'], reverse=True)
+        ],
+    }, ensure_ascii=False))
+    return response
+
+
+def registrar_instrumentacao(app, db):
+    """
+    Liga a contagem e a cronometragem dos comandos SQL de cada requisição.
+    O limite para registrar consultas lentas (WARNING) vem de SQL_LENTA_MS
+    (padrão 100 ms); a linha de cada requisição sai em DEBUG. Handlers e
+    níveis do logger 'sistema_financeiro.sql' ficam a cargo da configuração
+    da aplicação.
+    """
+    app.config.setdefault('SQL_LENTA_MS', float(os.getenv('SQL_LENTA_MS', 100)))
+
+    with app.app_context():
+        event.listen(db.engine, 'before_cursor_execute', _antes_do_comando)
+        event.listen(db.engine, 'after_cursor_execute', _depois_do_comando)
+
+    app.before_request(_iniciar_medicao)
+    app.after_request(_finalizar_medicao)
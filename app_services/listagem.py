@@ -0,0 +1,170 @@
+# app_services/listagem.py
+
+from datetime import datetime
+from sqlalchemy import func, literal, or_, select, tuple_, union_all
+
+from extensions import db
+from models import Lancamento, OcorrenciaVirtual, Recorrencia, TransferenciaGrupo
+from app_services.carregamento import PERFIL_LISTAGEM
+from app_services.dinheiro import ZERO
+from app_services.recorrencias import numeros_ocupados
+
+TAMANHO_PAGINA = 50
+
+# origem -> (modelo, filtros da origem)
+FONTES = {
+    'unico': (Lancamento, (Lancamento.recorrencia_id.is_(None), Lancamento.transferencia_grupo_id.is_(None))),
+    # Partes criadas ao dividir uma regra aparecem junto com a de origem
+    'recorrencia': (Recorrencia, (Recorrencia.recorrencia_origem_id.is_(None),)),
+    'transferencia': (TransferenciaGrupo, ()),
+}
+
+
+# =============================================================================
+# CURSOR
+# =============================================================================
+
+def codificar_cursor(data_criacao, item_id, origem):
+    return f'{data_criacao.isoformat()}_{item_id}_{origem}'
+
+
+def decodificar_cursor(cursor):
+    """Retorna (data_criacao, id, origem) ou None se o cursor for inválido"""
+    try:
+        data_str, item_id, origem = cursor.rsplit('_', 2)
+        if origem not in FONTES:
+            return None
+        return datetime.fromisoformat(data_str), int(item_id), origem
+    except (AttributeError, ValueError):
+        return None
+
+
+# =============================================================================
+# PÁGINA DE LANÇAMENTOS
+# =============================================================================
+
+def _consulta_fonte(origem, cursor, limite):
+    """SELECT de uma origem já filtrado pelo cursor, ordenado e limitado"""
+    modelo, filtros = FONTES[origem]
+    consulta = select(
+        literal(origem).label('origem'),
+        modelo.id.label('id'),
+        modelo.data_criacao.label('data_criacao')
+    ).where(*filtros)
+
+    if cursor:
+        data_cursor, id_cursor, origem_cursor = cursor
+        chave = tuple_(modelo.data_criacao, modelo.id)
+        # Desempate pela origem: a ordem da página é (data_criacao, id, origem) decrescente
+        if origem < origem_cursor:
+            consulta = consulta.where(chave <= tuple_(data_cursor, id_cursor))
+        else:
+            consulta = consulta.where(chave < tuple_(data_cursor, id_cursor))
+
+    return consulta.order_by(modelo.data_criacao.desc(), modelo.id.desc()).limit(limite)
+
+
+def pagina_lancamentos(cursor=None, tamanho=TAMANHO_PAGINA):
+    """
+    Retorna (itens, proximo_cursor) com os lançamentos únicos, recorrências e
+    transferências mais recentes. Cada origem é lida já limitada pelo cursor
+    (data_criacao, id), e o UNION apenas intercala as páginas das três.
+    """
+    limite = tamanho + 1
+    fontes = union_all(*[
+        _consulta_fonte(origem, cursor, limite).subquery().select()
+        for origem in FONTES
+    ]).subquery('itens')
+
+    chaves = db.session.execute(
+        select(fontes.c.origem, fontes.c.id, fontes.c.data_criacao)
+        .order_by(fontes.c.data_criacao.desc(), fontes.c.id.desc(), fontes.c.origem.desc())
+        .limit(limite)
+    ).all()
+
+    proximo_cursor = None
+    if len(chaves) > tamanho:
+        chaves = chaves[:tamanho]
+        origem, item_id, data_criacao = chaves[-1]
+        proximo_cursor = codificar_cursor(data_criacao, item_id, origem)
+
+    # Carregar os objetos da página com uma consulta por origem; as
+    # recorrências vêm com as demais partes dos seus grupos
+    objetos = {}
+    partes = []
+    for origem, (modelo, _) in FONTES.items():
+        ids = [item_id for o, item_id, _ in chaves if o == origem]
+        if ids:
+            filtro = modelo.id.in_(ids)
+            if modelo is Recorrencia:
+                filtro = or_(filtro, Recorrencia.recorrencia_origem_id.in_(ids))
+            carregados = modelo.query.options(*PERFIL_LISTAGEM[modelo]).filter(filtro).all()
+            objetos[origem] = {obj.id: obj for obj in carregados}
+            if modelo is Recorrencia:
+                partes = carregados
+
+    resumos = resumo_recorrencias(partes)
+
+    itens = []
+    for origem, item_id, _ in chaves:
+        item = {'tipo': origem, 'objeto': objetos[origem][item_id]}
+        if origem == 'recorrencia':
+            item['primeira_ocorrencia'], item['valor_total'] = resumos[item_id]
+        itens.append(item)
+
+    return itens, proximo_cursor
+
+
+def resumo_recorrencias(recorrencias):
+    """
+    Retorna {recorrencia_id: (primeira_ocorrencia, valor_total)} calculando
+    os agregados dos lançamentos gravados no banco; as ocorrências virtuais
+    são somadas a partir da regra. As partes de uma regra dividida entram
+    no resumo da recorrência de origem.
+    """
+    ids = [r.id for r in recorrencias]
+    if not ids:
+        return {}
+
+    totais = dict(db.session.query(
+        Lancamento.recorrencia_id, func.sum(Lancamento.valor)
+    ).filter(Lancamento.recorrencia_id.in_(ids)).group_by(Lancamento.recorrencia_id))
+
+    numerados = select(
+        Lancamento.id,
+        func.row_number().over(
+            partition_by=Lancamento.recorrencia_id,
+            order_by=(Lancamento.data_vencimento, Lancamento.id)
+        ).label('ordem')
+    ).where(Lancamento.recorrencia_id.in_(ids)).subquery()
+    primeiros = {
+        l.recorrencia_id: l
+        for l in Lancamento.query.options(*PERFIL_LISTAGEM[Lancamento])
+        .join(numerados, numerados.c.id == Lancamento.id).filter(numerados.c.ordem == 1)
+    }
+
+    virtuais = [r for r in recorrencias if r.virtual]
+    ocupados = numeros_ocupados([r.id for r in virtuais]) if virtuais else set()
+
+    resumos = {}
+    for recorrencia in recorrencias:
+        origem_id = recorrencia.recorrencia_origem_id or recorrencia.id
+        primeira, valor_total = resumos.get(origem_id, (None, ZERO))
+        gravada = primeiros.get(recorrencia.id)
+        if gravada is not None and (primeira is None or gravada.data_vencimento < primeira.data_vencimento):
+            primeira = gravada
+        valor_total += totais.get(recorrencia.id) or ZERO
+
+        if recorrencia.virtual:
+            numeros = [
+                numero for numero in range(recorrencia.primeira_parcela, (recorrencia.total_parcelas or 0) + 1)
+                if (recorrencia.id, numero) not in ocupados
+            ]
+            valor_total += (recorrencia.valor or ZERO) * len(numeros)
+            if numeros:
+                ocorrencia = OcorrenciaVirtual(recorrencia, numeros[0])
+                if primeira is None or ocorrencia.data_vencimento < primeira.data_vencimento:
+                    primeira = ocorrencia
+
+        resumos[origem_id] = (primeira, valor_total)
+    return resumos
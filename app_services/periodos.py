@@ -0,0 +1,35 @@
+# app_services/periodos.py
+
+from datetime import date
+from sqlalchemy import and_
+
+
+def intervalo_mes(ano, mes):
+    """Retorna (primeiro dia do mês, primeiro dia do mês seguinte)"""
+    inicio = date(ano, mes, 1)
+    if mes == 12:
+        fim = date(ano + 1, 1, 1)
+    else:
+        fim = date(ano, mes + 1, 1)
+    return inicio, fim
+
+
+def filtro_mes(coluna, ano, mes):
+    """
+    Filtra a coluna de data pelo mês com um intervalo semiaberto
+    (coluna >= primeiro dia AND coluna < primeiro dia do mês seguinte),
+    que aproveita os índices sobre a coluna, ao contrário de extract().
+    """
+    inicio, fim = intervalo_mes(ano, mes)
+    return and_(coluna >= inicio, coluna < fim)
+
+
+def ano_mes(data):
+    """Retorna (ano, mes) da data"""
+    return data.year, data.month
+
+
+def somar_meses(ano, mes, quantidade):
+    """Retorna (ano, mes) deslocado em 'quantidade' meses"""
+    indice = ano * 12 + (mes - 1) + quantidade
+    return indice // 12, indice % 12 + 1
@@ -0,0 +1,197 @@
+# app_services/pool.py
+#
+# Configuração do pool de conexões a partir de variáveis de ambiente e
+# métricas de checkout (espera por conexão, overflow, tempo de uso e
+# esgotamento do pool), coletadas pelos eventos públicos do pool e guardadas
+# em app.extensions['metricas_pool']. create_app() usa opcoes_engine() antes
+# de db.init_app(), então essa parte não pode depender do engine nem de uma
+# aplicação já criada.
+
+import os
+import threading
+import time
+
+from flask import g, has_app_context, has_request_context, jsonify
+from sqlalchemy import event
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.orm import Session
+from sqlalchemy.pool import QueuePool
+
+
+def _env_int(nome, padrao):
+    return int(os.getenv(nome, padrao))
+
+
+def _env_bool(nome, padrao):
+    return os.getenv(nome, str(padrao)).strip().lower() in ('1', 'true', 'sim', 'yes', 'on')
+
+
+class MetricasPool:
+    """Contadores acumulados dos checkouts do pool, seguros entre threads"""
+
+    def __init__(self):
+        self._trava = threading.Lock()
+        # Conexões DBAPI abertas pelo pool; não é zerado com as métricas
+        self.abertas = 0
+        self.zerar()
+
+    def zerar(self):
+        with self._trava:
+            self.checkouts = 0
+            self.espera_total_ms = 0.0
+            self.espera_max_ms = 0.0
+            self.overflows = 0
+            self.esgotamentos = 0
+            self.devolucoes = 0
+            self.uso_total_ms = 0.0
+            self.uso_max_ms = 0.0
+
+    def registrar(self, espera_ms, esgotado=False):
+        with self._trava:
+            if esgotado:
+                self.esgotamentos += 1
+            else:
+                self.checkouts += 1
+            self.espera_total_ms += espera_ms
+            self.espera_max_ms = max(self.espera_max_ms, espera_ms)
+
+    def registrar_conexao(self, tamanho):
+        """Nova conexão aberta: além de 'tamanho' simultâneas, é overflow"""
+        with self._trava:
+            self.abertas += 1
+            if tamanho is not None and self.abertas > tamanho:
+                self.overflows += 1
+
+    def registrar_fechamento(self):
+        with self._trava:
+            self.abertas -= 1
+
+    def registrar_uso(self, uso_ms):
+        with self._trava:
+            self.devolucoes += 1
+            self.uso_total_ms += uso_ms
+            self.uso_max_ms = max(self.uso_max_ms, uso_ms)
+
+    def resumo(self, pool=None):
+        with self._trava:
+            dados = {
+                'checkouts': self.checkouts,
+                'espera_media_ms': round(self.espera_total_ms / self.checkouts, 3) if self.checkouts else 0.0,
+                'espera_max_ms': round(self.espera_max_ms, 3),
+                'uso_medio_ms': round(self.uso_total_ms / self.devolucoes, 3) if self.devolucoes else 0.0,
+                'uso_max_ms': round(self.uso_max_ms, 3),
+                'overflows': self.overflows,
+                'esgotamentos': self.esgotamentos,
+            }
+        if isinstance(pool, QueuePool):
+            dados.update(
+                tamanho=pool.size(),
+                em_uso=pool.checkedout(),
+                ociosas=pool.checkedin(),
+                overflow_atual=max(pool.overflow(), 0),
+                status=pool.status(),
+            )
+        return dados
+
+
+# =============================================================================
+# EVENTOS DO POOL
+# =============================================================================
+#
+# O pool não tem evento antes do checkout. A sessão pede a conexão logo
+# depois de abrir a transação, então a espera é medida desde
+# after_transaction_create até o evento 'checkout' do pool (inclui o
+# pre-ping). Conexões pedidas fora da sessão contam sem espera.
+
+@event.listens_for(Session, 'after_transaction_create')
+def _marcar_pedido_de_conexao(session, transacao):
+    if transacao.parent is None and has_app_context():
+        g._pedido_conexao = time.perf_counter()
+
+
+@event.listens_for(Session, 'after_transaction_end')
+def _descartar_pedido_de_conexao(session, transacao):
+    # Transação que terminou sem pedir conexão
+    if transacao.parent is None and has_app_context():
+        g.pop('_pedido_conexao', None)
+
+
+def _espera_desde_o_pedido():
+    if not has_app_context():
+        return 0.0
+    inicio = g.pop('_pedido_conexao', None)
+    if inicio is None:
+        return 0.0
+    espera_ms = (time.perf_counter() - inicio) * 1000
+    if has_request_context() and '_sql' in g:
+        g._sql['espera_pool_ms'] += espera_ms
+    return espera_ms
+
+
+def _ouvir_pool(engine, metricas):
+    pool = engine.pool
+    tamanho = pool.size() if isinstance(pool, QueuePool) else None
+
+    @event.listens_for(engine, 'connect')
+    def _nova_conexao(conexao_dbapi, registro):
+        metricas.registrar_conexao(tamanho)
+
+    @event.listens_for(engine, 'close')
+    def _conexao_fechada(conexao_dbapi, registro):
+        metricas.registrar_fechamento()
+
+    @event.listens_for(engine, 'checkout')
+    def _checkout(conexao_dbapi, registro, proxy):
+        registro.info['_checkout_em'] = time.perf_counter()
+        metricas.registrar(_espera_desde_o_pedido())
+
+    @event.listens_for(engine, 'checkin')
+    def _checkin(conexao_dbapi, registro):
+        inicio = registro.info.pop('_checkout_em', None)
+        if inicio is not None:
+            metricas.registrar_uso((time.perf_counter() - inicio) * 1000)
+
+
+def opcoes_engine(uri):
+    """
+    Opções do engine (SQLALCHEMY_ENGINE_OPTIONS) a partir do ambiente:
+      DB_POOL_SIZE (5), DB_MAX_OVERFLOW (10), DB_POOL_TIMEOUT (30 s),
+      DB_POOL_RECYCLE (1800 s), DB_POOL_PRE_PING (true) e
+      DB_STATEMENT_TIMEOUT_MS (0 = sem limite, só PostgreSQL).
+    O SQLite em memória usa um pool próprio e não recebe essas opções.
+    """
+    if not uri or uri == 'sqlite://' or ':memory:' in uri:
+        return {}
+
+    opcoes = {
+        'pool_size': _env_int('DB_POOL_SIZE', 5),
+        'max_overflow': _env_int('DB_MAX_OVERFLOW', 10),
+        'pool_timeout': _env_int('DB_POOL_TIMEOUT', 30),
+        'pool_recycle': _env_int('DB_POOL_RECYCLE', 1800),
+        'pool_pre_ping': _env_bool('DB_POOL_PRE_PING', True),
+    }
+
+    timeout_ms = _env_int('DB_STATEMENT_TIMEOUT_MS', 0)
+    if timeout_ms and uri.startswith('postgresql'):
+        opcoes['connect_args'] = {'options': f'-c statement_timeout={timeout_ms}'}
+    return opcoes
+
+
+def registrar_metricas_pool(app, db):
+    """Liga as métricas do pool do engine da aplicação e as expõe em /metricas/pool"""
+    metricas = MetricasPool()
+    app.extensions['metricas_pool'] = metricas
+
+    with app.app_context():
+        _ouvir_pool(db.engine, metricas)
+
+    def _contar_esgotamento(erro):
+        # Pool esgotado: o checkout desistiu depois de pool_timeout
+        if isinstance(erro, PoolTimeoutError):
+            metricas.registrar(_espera_desde_o_pedido(), esgotado=True)
+
+    def _metricas():
+        return jsonify(metricas.resumo(db.engine.pool))
+
+    app.teardown_request(_contar_esgotamento)
+    app.add_url_rule('/metricas/pool', 'metricas_pool', _metricas)
@@ -0,0 +1,152 @@
+# app_services/projecao.py
+
+from collections import defaultdict
+from datetime import date
+from itertools import accumulate
+from sqlalchemy import and_, func, or_, tuple_
+
+from extensions import db
+from models import CartaoCredito, Conta, FaturaCartao, ResumoMensal
+from app_services.dinheiro import ZERO, para_json
+from app_services.periodos import ano_mes, intervalo_mes, somar_meses
+from app_services.recorrencias import ocorrencias_virtuais
+from app_services.resumo import Soma, totalizar
+from app_services.resumo_mensal import SEM_VINCULO
+from app_services.saldos import saldos_contas
+
+
+def _ate(ano_coluna, mes_coluna, ultimo_mes):
+    """
+    Filtro dos meses até ultimo_mes (ano, mes), inclusive. A comparação de
+    linha (ano, mes) <= (a, m) usa o índice sobre (ano, mes); ano * 100 + mes
+    não usaria.
+    """
+    return tuple_(ano_coluna, mes_coluna) <= tuple_(*ultimo_mes)
+
+
+def _somas_ate(ultimo_mes, ids_cartoes):
+    """
+    Uma única consulta em resumo_mensal, agrupada por mês, tipo, status e
+    cartão, com as somas dos lançamentos de conta e dos gastos dos cartões
+    (sem as faturas) de todos os meses até ultimo_mes: os meses anteriores
+    à projeção entram pelas pendências que ainda carregam
+    """
+    return db.session.query(
+        ResumoMensal.ano,
+        ResumoMensal.mes,
+        ResumoMensal.tipo,
+        ResumoMensal.status,
+        ResumoMensal.cartao_id,
+        func.sum(ResumoMensal.valor_total)
+    ).filter(
+        _ate(ResumoMensal.ano, ResumoMensal.mes, ultimo_mes),
+        or_(
+            and_(ResumoMensal.conta_id != SEM_VINCULO, ResumoMensal.cartao_id == SEM_VINCULO),
+            and_(
+                ResumoMensal.cartao_id.in_(ids_cartoes),
+                ResumoMensal.tipo == 'Despesa',
+                ResumoMensal.origem != 'fatura'
+            )
+        )
+    ).group_by(
+        ResumoMensal.ano, ResumoMensal.mes, ResumoMensal.tipo, ResumoMensal.status, ResumoMensal.cartao_id
+    ).all()
+
+
+def calcular_projecao(ano, mes, meses):
+    """
+    Receitas, despesas, faturas e saldo projetado de 'meses' meses a partir
+    de (ano, mes). Os totais de cada mês usam a mesma regra do dashboard
+    (totalizar), e o saldo projetado acumula as pendências de cada mês sobre
+    o saldo atual das contas correntes mais as pendências (receitas,
+    despesas e faturas em aberto) vencidas antes de (ano, mes).
+    """
+    periodo = [somar_meses(ano, mes, i) for i in range(meses)]
+    fim = intervalo_mes(*periodo[-1])[1]
+
+    ids_cartoes = [id for id, in db.session.query(CartaoCredito.id).filter_by(ativo=True)]
+
+    contas = defaultdict(lambda: {'Receita': defaultdict(lambda: ZERO), 'Despesa': defaultdict(lambda: ZERO)})
+    gastos_cartoes = defaultdict(lambda: ZERO)
+
+    for ano_linha, mes_linha, tipo, status, cartao_id, valor in _somas_ate(periodo[-1], ids_cartoes):
+        chave = (ano_linha, mes_linha)
+        if cartao_id == SEM_VINCULO:
+            contas[chave][tipo][status] += valor or ZERO
+        else:
+            gastos_cartoes[(chave, cartao_id)] += valor or ZERO
+
+    # Ocorrências das recorrências virtuais até o fim do período (as que
+    # venceram antes dele continuam pendentes)
+    for ocorrencia in ocorrencias_virtuais(date.min, fim):
+        chave = ano_mes(ocorrencia.data_vencimento)
+        if ocorrencia.cartao_credito_id is None:
+            contas[chave][ocorrencia.tipo][ocorrencia.status] += ocorrencia.valor
+        elif (ocorrencia.cartao_credito_id in ids_cartoes and ocorrencia.tipo == 'Despesa'
+              and not ocorrencia.descricao.startswith('Fatura ')):
+            gastos_cartoes[(chave, ocorrencia.cartao_credito_id)] += ocorrencia.valor
+
+    faturas_pagas = set()
+    if gastos_cartoes:
+        faturas_pagas = {
+            ((f.ano, f.mes), f.cartao_id)
+            for f in FaturaCartao.query.filter(
+                FaturaCartao.paga.is_(True),
+                _ate(FaturaCartao.ano, FaturaCartao.mes, periodo[-1])
+            )
+        }
+
+    faturas_por_mes = defaultdict(list)
+    for (chave, cartao_id), valor in gastos_cartoes.items():
+        if valor > 0:
+            faturas_por_mes[chave].append(
+                {'valor': valor, 'status': 'Pago' if (chave, cartao_id) in faturas_pagas else 'Pendente'}
+            )
+
+    def totais_do_mes(chave):
+        receitas = [Soma(valor, status) for status, valor in contas[chave]['Receita'].items()]
+        despesas = [Soma(valor, status) for status, valor in contas[chave]['Despesa'].items()]
+        return totalizar(receitas, despesas, faturas_por_mes[chave])
+
+    totais = [totais_do_mes(chave) for chave in periodo]
+
+    # Pendências vencidas antes do período (atrasadas, ou dos meses entre
+    # hoje e um início no futuro)
+    anteriores = [totais_do_mes(chave) for chave in sorted(set(contas) | set(faturas_por_mes)) if chave < periodo[0]]
+    pendencias_anteriores = sum(
+        (t['receitas_pendentes'] - t['total_despesas_pendentes'] for t in anteriores), ZERO
+    )
+
+    # Saldo atual das contas correntes, como no dashboard
+    saldos = saldos_contas()
+    saldo_atual = sum(
+        saldos.get(conta_id, ZERO)
+        for conta_id, in db.session.query(Conta.id).filter_by(tipo_conta='Corrente')
+    )
+
+    saldos_projetados = accumulate(
+        (t['receitas_pendentes'] - t['total_despesas_pendentes'] for t in totais),
+        initial=saldo_atual + pendencias_anteriores
+    )
+    next(saldos_projetados)  # descarta o valor inicial
+
+    projecao = []
+    for (ano_item, mes_item), total, saldo_projetado in zip(periodo, totais, saldos_projetados):
+        projecao.append({
+            'ano': ano_item,
+            'mes': mes_item,
+            'receitas': para_json(total['total_receitas_mes']),
+            'despesas': para_json(total['total_despesas_mes']),
+            'faturas': para_json(total['total_faturas_mes']),
+            'despesas_total': para_json(total['total_despesas_completo']),
+            'receitas_pendentes': para_json(total['receitas_pendentes']),
+            'despesas_pendentes': para_json(total['total_despesas_pendentes']),
+            'resultado': para_json(total['total_receitas_mes'] - total['total_despesas_completo']),
+            'saldo_projetado': para_json(saldo_projetado),
+        })
+
+    return {
+        'saldo_atual': para_json(saldo_atual),
+        'pendencias_anteriores': para_json(pendencias_anteriores),
+        'meses': projecao,
+    }
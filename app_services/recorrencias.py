@@ -0,0 +1,440 @@
+# app_services/recorrencias.py
+
+from dateutil.relativedelta import relativedelta
+from flask import abort
+from sqlalchemy import String, cast, delete, event, insert, literal, or_, select, update
+
+from extensions import db
+from app_services.cache import meses_entre, registrar_linhas, registrar_meses
+from app_services.carregamento import PERFIL_RECORRENCIA_VIRTUAL
+from app_services.dinheiro import de_centavos, para_centavos, para_dinheiro
+from app_services import resumo_mensal, saldos, totais_faturas
+from models import Lancamento, OcorrenciaVirtual, Recorrencia, RecorrenciaExcecao
+
+# Recorrências de duração fixa: recorrencia_tipo -> (tipo, frequência, quantidade).
+# São criadas como virtuais: apenas a regra é gravada e as ocorrências são
+# calculadas sob demanda por ocorrencias_virtuais()
+REGRAS_RECORRENCIA = {
+    'fixa': ('Fixa', 'Mensal', 60),
+    'anual': ('Anual', 'Anual', 5),
+    'semanal': ('Semanal', 'Semanal', 52),
+    'quinzenal': ('Quinzenal', 'Quinzenal', 26),
+}
+
+
+def calcular_vencimento(data_base, frequencia, indice):
+    """Data da ocorrência de número 'indice' (a partir de 0) da recorrência"""
+    if frequencia == 'Semanal':
+        return data_base + relativedelta(weeks=indice)
+    elif frequencia == 'Quinzenal':
+        return data_base + relativedelta(days=indice*15)
+    elif frequencia == 'Anual':
+        return data_base + relativedelta(years=indice)
+    return data_base + relativedelta(months=indice)
+
+
+def dividir_parcelas(valor_total, total_parcelas):
+    """Divide o valor em centavos; o resto da divisão vai para a última parcela"""
+    valor_total_centavos = para_centavos(valor_total)
+    valor_parcela_centavos = valor_total_centavos // total_parcelas
+    resto_centavos = valor_total_centavos % total_parcelas
+
+    valores = [valor_parcela_centavos] * total_parcelas
+    valores[-1] += resto_centavos
+    return [de_centavos(centavos) for centavos in valores]
+
+
+def _id_ou_none(valor):
+    return int(valor) if valor not in (None, '') else None
+
+
+def gerar_linhas(recorrencia, valores, tipo, data_base, subcategoria_id,
+                 conta_id=None, cartao_credito_id=None):
+    """
+    Monta os lançamentos da recorrência como dicionários prontos para o
+    INSERT em lote. Os vínculos são validados uma única vez, já que são
+    iguais para todas as linhas.
+    """
+    conta_id = _id_ou_none(conta_id)
+    cartao_credito_id = _id_ou_none(cartao_credito_id)
+    Lancamento.validar_vinculos(conta_id, cartao_credito_id)
+
+    parcelada = recorrencia.tipo == 'Parcelada'
+    total = len(valores)
+    base = {
+        'tipo': tipo,
+        'status': 'Pendente',
+        'subcategoria_id': _id_ou_none(subcategoria_id),
+        'conta_id': conta_id,
+        'cartao_credito_id': cartao_credito_id,
+        'recorrencia_id': recorrencia.id,
+    }
+
+    linhas = []
+    for i, valor in enumerate(valores):
+        linha = dict(base)
+        linha['descricao'] = f"{recorrencia.descricao_base} ({i+1}/{total})" if parcelada else recorrencia.descricao_base
+        linha['valor'] = valor
+        linha['data_vencimento'] = calcular_vencimento(data_base, recorrencia.frequencia, i)
+        linha['numero_parcela'] = i + 1
+        linhas.append(linha)
+    return linhas
+
+
+def inserir_linhas(linhas):
+    """Grava todas as linhas com um único INSERT multi-valores"""
+    if linhas:
+        db.session.execute(insert(Lancamento), linhas)
+        registrar_linhas(db.session, linhas)
+        totais_faturas.registrar_lote([], linhas)
+        resumo_mensal.registrar_lote([], linhas)
+
+
+def criar_recorrencia(recorrencia_tipo, descricao, valor_total, tipo, data_base, subcategoria_id,
+                      conta_id=None, cartao_credito_id=None, total_parcelas=None, frequencia=None):
+    """
+    Cria a Recorrencia. Parceladas têm todas as parcelas gravadas em lote;
+    as demais (chaves de REGRAS_RECORRENCIA) guardam apenas a regra.
+    """
+    if recorrencia_tipo != 'parcelada':
+        tipo_recorrencia, frequencia, quantidade = REGRAS_RECORRENCIA[recorrencia_tipo]
+        conta_id = _id_ou_none(conta_id)
+        cartao_credito_id = _id_ou_none(cartao_credito_id)
+        Lancamento.validar_vinculos(conta_id, cartao_credito_id)
+
+        nova_recorrencia = Recorrencia(
+            descricao_base=descricao,
+            tipo=tipo_recorrencia,
+            total_parcelas=quantidade,
+            frequencia=frequencia,
+            virtual=True,
+            tipo_lancamento=tipo,
+            valor=para_dinheiro(valor_total),
+            data_inicio=data_base,
+            subcategoria_id=_id_ou_none(subcategoria_id),
+            conta_id=conta_id,
+            cartao_credito_id=cartao_credito_id
+        )
+        db.session.add(nova_recorrencia)
+        return nova_recorrencia
+
+    frequencia = frequencia or 'Mensal'
+    nova_recorrencia = Recorrencia(
+        descricao_base=descricao,
+        tipo='Parcelada',
+        total_parcelas=total_parcelas,
+        frequencia=frequencia
+    )
+    db.session.add(nova_recorrencia)
+    db.session.flush()
+
+    inserir_linhas(gerar_linhas(
+        nova_recorrencia, dividir_parcelas(valor_total, total_parcelas), tipo, data_base, subcategoria_id,
+        conta_id=conta_id, cartao_credito_id=cartao_credito_id
+    ))
+    return nova_recorrencia
+
+
+# =============================================================================
+# OCORRÊNCIAS VIRTUAIS
+# =============================================================================
+
+def numeros_no_intervalo(recorrencia, inicio, fim):
+    """Gera os números das ocorrências da regra com vencimento em [inicio, fim)"""
+    base = recorrencia.data_inicio
+    if recorrencia.frequencia == 'Semanal':
+        indice = (inicio - base).days // 7
+    elif recorrencia.frequencia == 'Quinzenal':
+        indice = (inicio - base).days // 15
+    elif recorrencia.frequencia == 'Anual':
+        indice = inicio.year - base.year
+    else:
+        indice = (inicio.year - base.year) * 12 + inicio.month - base.month
+
+    # Começa uma ocorrência antes da estimativa por causa dos meses curtos
+    indice = max(indice - 1, recorrencia.primeira_parcela - 1)
+    while indice < (recorrencia.total_parcelas or 0):
+        vencimento = calcular_vencimento(base, recorrencia.frequencia, indice)
+        if vencimento >= fim:
+            break
+        if vencimento >= inicio:
+            yield indice + 1
+        indice += 1
+
+
+def numeros_ocupados(recorrencia_ids):
+    """Pares (recorrencia_id, numero) já gravados em lancamentos ou excluídos"""
+    gravados = db.session.query(Lancamento.recorrencia_id, Lancamento.numero_parcela).filter(
+        Lancamento.recorrencia_id.in_(recorrencia_ids),
+        Lancamento.numero_parcela.isnot(None)
+    )
+    excluidos = db.session.query(RecorrenciaExcecao.recorrencia_id, RecorrenciaExcecao.numero_parcela).filter(
+        RecorrenciaExcecao.recorrencia_id.in_(recorrencia_ids)
+    )
+    return set(gravados.union_all(excluidos).all())
+
+
+def ocorrencias_virtuais(inicio, fim, *filtros):
+    """
+    Gera as ocorrências virtuais com vencimento em [inicio, fim) das
+    recorrências virtuais que atendem aos filtros (expressões sobre
+    Recorrencia), ignorando as já gravadas em lancamentos e as excluídas.
+    """
+    recorrencias = Recorrencia.query.options(*PERFIL_RECORRENCIA_VIRTUAL).filter(
+        Recorrencia.virtual.is_(True),
+        Recorrencia.data_inicio < fim,
+        Recorrencia.data_fim >= inicio,
+        *filtros
+    ).all()
+    if not recorrencias:
+        return
+
+    ocupados = numeros_ocupados([r.id for r in recorrencias])
+    for recorrencia in recorrencias:
+        for numero in numeros_no_intervalo(recorrencia, inicio, fim):
+            if (recorrencia.id, numero) not in ocupados:
+                yield OcorrenciaVirtual(recorrencia, numero)
+
+
+@event.listens_for(Recorrencia, 'before_insert')
+@event.listens_for(Recorrencia, 'before_update')
+def _atualizar_data_fim(mapper, conexao, recorrencia):
+    """Recalcula data_fim, que limita em SQL as regras lidas por ocorrencias_virtuais()"""
+    total = recorrencia.total_parcelas or 0
+    # Antes do INSERT o default de primeira_parcela ainda não foi aplicado
+    if recorrencia.virtual and recorrencia.data_inicio and total >= (recorrencia.primeira_parcela or 1):
+        recorrencia.data_fim = recorrencia.data_ocorrencia(total)
+    else:
+        recorrencia.data_fim = None
+
+
+def materializar_ocorrencia(recorrencia, numero):
+    """Grava a ocorrência em lancamentos (se ainda não estiver) e a retorna"""
+    lancamento = Lancamento.query.filter_by(recorrencia_id=recorrencia.id, numero_parcela=numero).first()
+    if lancamento is None:
+        lancamento = Lancamento(**OcorrenciaVirtual(recorrencia, numero).como_linha())
+        db.session.add(lancamento)
+        db.session.flush()
+    return lancamento
+
+
+def obter_lancamento(chave):
+    """
+    Retorna o Lancamento pelo id. Chaves no formato 'v<recorrencia>-<numero>'
+    identificam ocorrências virtuais, que são gravadas neste momento.
+    """
+    chave = str(chave)
+    if not chave.startswith('v'):
+        return Lancamento.query.get_or_404(chave)
+
+    try:
+        recorrencia_id, numero = (int(parte) for parte in chave[1:].split('-'))
+    except ValueError:
+        abort(404)
+
+    recorrencia = Recorrencia.query.get_or_404(recorrencia_id)
+    if not recorrencia.virtual or not recorrencia.primeira_parcela <= numero <= (recorrencia.total_parcelas or 0):
+        abort(404)
+    return materializar_ocorrencia(recorrencia, numero)
+
+
+COLUNAS_REGRA = ('descricao_base', 'tipo', 'total_parcelas', 'frequencia', 'data_criacao', 'virtual',
+                 'tipo_lancamento', 'valor', 'data_inicio', 'conta_id', 'cartao_credito_id', 'subcategoria_id')
+
+
+def _primeira_a_partir(recorrencia, data_base):
+    """Número da primeira ocorrência da regra com vencimento a partir de data_base"""
+    numero = recorrencia.primeira_parcela
+    while numero <= (recorrencia.total_parcelas or 0) and recorrencia.data_ocorrencia(numero) < data_base:
+        numero += 1
+    return numero
+
+
+def partes_da_recorrencia(recorrencia):
+    """
+    A recorrência e as demais partes do seu grupo (criadas por
+    _dividir_regra a partir da mesma origem), em ordem de parcela
+    """
+    if recorrencia is None:
+        return []
+    if not recorrencia.virtual:
+        return [recorrencia]
+    origem_id = recorrencia.recorrencia_origem_id or recorrencia.id
+    return Recorrencia.query.filter(
+        or_(Recorrencia.id == origem_id, Recorrencia.recorrencia_origem_id == origem_id)
+    ).order_by(Recorrencia.primeira_parcela).all()
+
+
+def _encerrar_regra(recorrencia, data_base):
+    recorrencia.total_parcelas = _primeira_a_partir(recorrencia, data_base) - 1
+
+
+def _dividir_regra(recorrencia, numero):
+    """
+    Encerra a regra antes da ocorrência 'numero' e cria outra igual, no mesmo
+    grupo, a partir dela. Os lançamentos gravados e as exclusões dessas
+    ocorrências passam para a nova regra com dois UPDATEs, sem mudar
+    vencimento nem valor.
+    """
+    nova = Recorrencia(**{coluna: getattr(recorrencia, coluna) for coluna in COLUNAS_REGRA},
+                       primeira_parcela=numero,
+                       recorrencia_origem_id=recorrencia.recorrencia_origem_id or recorrencia.id)
+    _encerrar_regra(recorrencia, recorrencia.data_ocorrencia(numero))
+    db.session.add(nova)
+    db.session.flush()
+
+    db.session.execute(
+        update(Lancamento)
+        .where(Lancamento.recorrencia_id == recorrencia.id, Lancamento.numero_parcela >= numero)
+        .values(recorrencia_id=nova.id)
+    )
+    db.session.execute(
+        update(RecorrenciaExcecao)
+        .where(RecorrenciaExcecao.recorrencia_id == recorrencia.id, RecorrenciaExcecao.numero_parcela >= numero)
+        .values(recorrencia_id=nova.id)
+    )
+    db.session.expire(recorrencia, ['lancamentos', 'excecoes'])
+    return nova
+
+
+def atualizar_regra(recorrencia, data_inicio=None, **campos):
+    """
+    Altera as regras do grupo da recorrência virtual a partir de
+    data_inicio (todas, sem data_inicio). A parte com ocorrências antes e
+    depois da data é dividida (veja _dividir_regra) e só a nova recebe os
+    campos. Recorrências que não são virtuais só têm descricao_base alterada.
+    """
+    if recorrencia is None:
+        return
+
+    if not recorrencia.virtual:
+        if 'descricao_base' in campos:
+            recorrencia.descricao_base = campos['descricao_base']
+        return
+
+    for parte in partes_da_recorrencia(recorrencia):
+        if data_inicio is not None:
+            numero = _primeira_a_partir(parte, data_inicio)
+            if numero > (parte.total_parcelas or 0):
+                # Nenhuma ocorrência da parte a partir da data
+                continue
+            if numero > parte.primeira_parcela:
+                parte = _dividir_regra(parte, numero)
+
+        for campo, valor in campos.items():
+            setattr(parte, campo, valor)
+
+
+def excluir_ocorrencia(lancamento):
+    """Exclui o lançamento, impedindo que a ocorrência virtual reapareça"""
+    recorrencia = lancamento.recorrencia
+    if recorrencia is not None and recorrencia.virtual and lancamento.numero_parcela:
+        db.session.add(RecorrenciaExcecao(recorrencia_id=recorrencia.id, numero_parcela=lancamento.numero_parcela))
+    db.session.delete(lancamento)
+
+
+def encerrar_recorrencia(recorrencia, data_base):
+    """Remove das regras do grupo as ocorrências virtuais com vencimento a partir de data_base"""
+    if recorrencia is None or not recorrencia.virtual:
+        return
+    for parte in partes_da_recorrencia(recorrencia):
+        _encerrar_regra(parte, data_base)
+
+
+def _vazia(recorrencia):
+    if Lancamento.query.filter_by(recorrencia_id=recorrencia.id).first():
+        return False
+    return not (recorrencia.virtual and (recorrencia.total_parcelas or 0) >= recorrencia.primeira_parcela)
+
+
+def remover_recorrencia_se_vazia(recorrencia_id):
+    """
+    Exclui as partes do grupo da recorrência que não têm mais nenhum
+    lançamento gravado nem ocorrência virtual. A de origem, que leva as
+    demais junto, só sai quando o grupo inteiro está vazio.
+    """
+    partes = partes_da_recorrencia(Recorrencia.query.get(recorrencia_id))
+    vazias = [parte for parte in partes if _vazia(parte)]
+    if vazias and len(vazias) == len(partes):
+        db.session.delete(partes[0])
+        return
+    for parte in vazias:
+        if parte.recorrencia_origem_id is not None:
+            db.session.delete(parte)
+
+
+# =============================================================================
+# ALTERAÇÃO E EXCLUSÃO DE 'ESTE E FUTUROS' EM LOTE
+# =============================================================================
+# Os lançamentos gravados da recorrência a partir de uma data são alterados
+# ou excluídos com um único UPDATE/DELETE, sem carregá-los na sessão. Como o
+# comando não passa pelo flush, saldos_conta e o cache dos meses são mantidos
+# aqui, a partir das linhas devolvidas pelo RETURNING: saldos_conta, os totais
+# das faturas, resumo_mensal e o cache dos meses.
+
+COLUNAS_LOTE = (Lancamento.conta_id, Lancamento.tipo, Lancamento.status, Lancamento.valor,
+                Lancamento.data_vencimento, Lancamento.cartao_credito_id, Lancamento.descricao,
+                Lancamento.subcategoria_id, Lancamento.transferencia_grupo_id)
+
+
+def _filtro_futuros(recorrencia_ids, data_base=None):
+    filtros = [Lancamento.recorrencia_id.in_(recorrencia_ids)]
+    if data_base is not None:
+        filtros.append(Lancamento.data_vencimento >= data_base)
+    return filtros
+
+
+def _registrar_meses_lote(linhas):
+    vencimentos = [linha.data_vencimento for linha in linhas]
+    if vencimentos:
+        registrar_meses(db.session, meses_entre(min(vencimentos), max(vencimentos)))
+
+
+def descricao_parcela_sql(descricao, total_parcelas):
+    """Expressão SQL de '<descricao> (<numero_parcela>/<total>)'"""
+    return literal(f'{descricao} (') + cast(Lancamento.numero_parcela, String) + f'/{total_parcelas})'
+
+
+def atualizar_futuros(recorrencia, data_base=None, descricao=None, **campos):
+    """
+    Aplica 'campos' (valor, subcategoria_id, conta_id ou cartao_credito_id) a
+    todos os lançamentos gravados do grupo da recorrência com vencimento a
+    partir de data_base (todos, sem data_base). Com 'descricao', parceladas
+    recebem '<descricao> (n/total)' e as demais a própria descrição.
+    """
+    filtros = _filtro_futuros([parte.id for parte in partes_da_recorrencia(recorrencia)], data_base)
+    valores = dict(campos)
+    if descricao is not None:
+        if recorrencia.tipo == 'Parcelada':
+            valores['descricao'] = descricao_parcela_sql(descricao, recorrencia.total_parcelas)
+        else:
+            valores['descricao'] = descricao
+
+    antes = db.session.execute(select(*COLUNAS_LOTE).where(*filtros)).all()
+    depois = db.session.execute(
+        update(Lancamento).where(*filtros).values(**valores).returning(*COLUNAS_LOTE)
+    ).all()
+
+    saldos.registrar_lote(antes, depois)
+    totais_faturas.registrar_lote(antes, depois)
+    resumo_mensal.registrar_lote(antes, depois)
+    _registrar_meses_lote(depois)
+    return len(depois)
+
+
+def excluir_futuros(recorrencia_id, data_base):
+    """
+    Exclui os lançamentos gravados do grupo da recorrência com vencimento a
+    partir de data_base e as partes do grupo que ficarem vazias.
+    """
+    ids = [parte.id for parte in partes_da_recorrencia(Recorrencia.query.get(recorrencia_id))]
+    removidos = db.session.execute(
+        delete(Lancamento).where(*_filtro_futuros(ids, data_base)).returning(*COLUNAS_LOTE)
+    ).all()
+
+    saldos.registrar_lote(removidos, [])
+    totais_faturas.registrar_lote(removidos, [])
+    resumo_mensal.registrar_lote(removidos, [])
+    _registrar_meses_lote(removidos)
+    remover_recorrencia_se_vazia(recorrencia_id)
+    return len(removidos)
@@ -0,0 +1,163 @@
+# app_services/relatorios.py
+#
+# Relatório de gastos por categoria e subcategoria. Uma única consulta sobre
+# resumo_mensal soma as despesas de contas e cartões por mês, categoria e
+# subcategoria; no PostgreSQL com GROUP BY ROLLUP, que já devolve os subtotais
+# por categoria, por mês e o total geral, e no SQLite (sem ROLLUP) agrupando
+# só pelas folhas e acumulando os subtotais em Python. Transferências e
+# pagamentos de fatura ('Fatura ...', já contados pelas compras do cartão)
+# ficam de fora; as ocorrências das recorrências virtuais entram como no
+# dashboard.
+
+from collections import defaultdict
+
+from sqlalchemy import func, literal, select
+
+from extensions import db
+from models import Categoria, Recorrencia, ResumoMensal, Subcategoria
+from app_services.dinheiro import ZERO, para_json
+from app_services.periodos import ano_mes, intervalo_mes, somar_meses
+from app_services.recorrencias import ocorrencias_virtuais
+from app_services.resumo_mensal import SEM_VINCULO, filtro_meses
+
+# Valor das colunas agregadas pelo ROLLUP (None é a ausência de categoria)
+TODOS = '*'
+
+SEM_CATEGORIA = {'id': None, 'nome': 'Sem categoria', 'cor': '#808080', 'icone': 'bi-question-circle'}
+
+
+def _consulta_gastos(primeiro_mes, ultimo_mes, rollup):
+    """
+    SELECT mes, categoria_id, subcategoria_id, soma, quantidade, nivel, com
+    mes = ano * 100 + mes. Com rollup, 'nivel' é o GROUPING(): bit 2 = mês
+    agregado, bit 1 = categoria, bit 0 = subcategoria. O mês vem de uma
+    subconsulta para que a expressão não se repita (com parâmetros
+    diferentes) no SELECT e no GROUP BY.
+    """
+    gastos = select(
+        (ResumoMensal.ano * 100 + ResumoMensal.mes).label('mes'),
+        Subcategoria.categoria_id,
+        func.nullif(ResumoMensal.subcategoria_id, SEM_VINCULO).label('subcategoria_id'),
+        ResumoMensal.valor_total,
+        ResumoMensal.qtd_lancamentos
+    ).select_from(ResumoMensal).outerjoin(
+        Subcategoria, Subcategoria.id == ResumoMensal.subcategoria_id
+    ).where(
+        ResumoMensal.tipo == 'Despesa',
+        ResumoMensal.origem == 'lancamento',
+        filtro_meses(primeiro_mes, ultimo_mes)
+    ).subquery()
+
+    colunas = (gastos.c.mes, gastos.c.categoria_id, gastos.c.subcategoria_id)
+    consulta = select(
+        *colunas,
+        func.coalesce(func.sum(gastos.c.valor_total), 0),
+        func.coalesce(func.sum(gastos.c.qtd_lancamentos), 0),
+        func.grouping(*colunas) if rollup else literal(0)
+    )
+    return consulta.group_by(func.rollup(*colunas)) if rollup else consulta.group_by(*colunas)
+
+
+def _ano_mes(mes):
+    """Converte o mês da consulta (ano * 100 + mes) em (ano, mes)"""
+    return divmod(int(mes), 100)
+
+
+def _chave(nivel, mes, categoria_id, subcategoria_id):
+    return (
+        TODOS if nivel & 4 else _ano_mes(mes),
+        TODOS if nivel & 2 else categoria_id,
+        TODOS if nivel & 1 else subcategoria_id,
+    )
+
+
+def _acumular(totais, mes, categoria_id, subcategoria_id, valor, quantidade):
+    """Soma uma folha em todos os níveis do ROLLUP (mes, categoria, subcategoria)"""
+    for chave in ((mes, categoria_id, subcategoria_id), (mes, categoria_id, TODOS), (mes, TODOS, TODOS),
+                  (TODOS, TODOS, TODOS)):
+        soma, qtd = totais[chave]
+        totais[chave] = (soma + valor, qtd + quantidade)
+
+
+def somar_gastos(primeiro_mes, ultimo_mes):
+    """
+    {(ano_mes, categoria_id, subcategoria_id): (soma, quantidade)} dos gastos
+    dos meses (ano, mes) primeiro_mes a ultimo_mes, inclusive, com TODOS nas
+    posições agregadas.
+    """
+    rollup = db.session.get_bind().dialect.name == 'postgresql'
+    totais = defaultdict(lambda: (ZERO, 0))
+
+    for mes, categoria_id, subcategoria_id, soma, quantidade, nivel in db.session.execute(
+            _consulta_gastos(primeiro_mes, ultimo_mes, rollup)):
+        if rollup:
+            totais[_chave(nivel, mes, categoria_id, subcategoria_id)] = (soma, int(quantidade))
+        else:
+            _acumular(totais, _ano_mes(mes), categoria_id, subcategoria_id, soma, int(quantidade))
+
+    inicio, fim = intervalo_mes(*primeiro_mes)[0], intervalo_mes(*ultimo_mes)[1]
+    categorias_das_subcategorias = None
+    for ocorrencia in ocorrencias_virtuais(inicio, fim, Recorrencia.tipo_lancamento == 'Despesa'):
+        if categorias_das_subcategorias is None:
+            categorias_das_subcategorias = dict(db.session.query(Subcategoria.id, Subcategoria.categoria_id))
+        _acumular(totais, ano_mes(ocorrencia.data_vencimento),
+                  categorias_das_subcategorias.get(ocorrencia.subcategoria_id), ocorrencia.subcategoria_id,
+                  ocorrencia.valor, 1)
+    return totais
+
+
+def relatorio_categorias(ano_inicio, mes_inicio, ano_fim, mes_fim):
+    """
+    Gastos por categoria e subcategoria de cada mês, de (ano_inicio,
+    mes_inicio) a (ano_fim, mes_fim) inclusive, em séries alinhadas com
+    'meses' (prontas para gráficos) e com a cor e o ícone das categorias.
+    """
+    meses = [somar_meses(ano_inicio, mes_inicio, i)
+             for i in range((ano_fim - ano_inicio) * 12 + mes_fim - mes_inicio + 1)]
+    totais = somar_gastos(meses[0], meses[-1])
+
+    def serie(categoria_id, subcategoria_id):
+        valores = [totais.get((mes, categoria_id, subcategoria_id), (ZERO, 0)) for mes in meses]
+        return {
+            'por_mes': [para_json(soma) for soma, _ in valores],
+            'total': para_json(sum((soma for soma, _ in valores), ZERO)),
+            'quantidade': sum(qtd for _, qtd in valores),
+        }
+
+    ids_categorias = {c for (_, c, s) in totais if c != TODOS and s == TODOS}
+    ids_subcategorias = defaultdict(set)
+    for _, categoria_id, subcategoria_id in totais:
+        if categoria_id != TODOS and subcategoria_id != TODOS:
+            ids_subcategorias[categoria_id].add(subcategoria_id)
+
+    nomes_categorias = {c.id: c for c in Categoria.query.filter(Categoria.id.in_(ids_categorias - {None}))}
+    nomes_subcategorias = dict(
+        db.session.query(Subcategoria.id, Subcategoria.nome)
+        .filter(Subcategoria.id.in_({s for ids in ids_subcategorias.values() for s in ids} - {None}))
+    )
+
+    categorias = []
+    for categoria_id in ids_categorias:
+        categoria = nomes_categorias.get(categoria_id)
+        if categoria is None:
+            dados = dict(SEM_CATEGORIA)
+        else:
+            dados = {'id': categoria.id, 'nome': categoria.nome, 'cor': categoria.cor, 'icone': categoria.icone}
+        dados.update(serie(categoria_id, TODOS))
+        dados['subcategorias'] = sorted(
+            (dict(id=subcategoria_id, nome=nomes_subcategorias.get(subcategoria_id, SEM_CATEGORIA['nome']),
+                  **serie(categoria_id, subcategoria_id))
+             for subcategoria_id in ids_subcategorias[categoria_id]),
+            key=lambda s: (-s['total'], s['nome'])
+        )
+        categorias.append(dados)
+    categorias.sort(key=lambda c: (-c['total'], c['nome']))
+
+    geral = serie(TODOS, TODOS)
+    return {
+        'meses': [f'{ano}-{mes:02d}' for ano, mes in meses],
+        'categorias': categorias,
+        'total_por_mes': geral['por_mes'],
+        'total': para_json(totais[(TODOS, TODOS, TODOS)][0]),
+        'quantidade': totais[(TODOS, TODOS, TODOS)][1],
+    }
@@ -0,0 +1,93 @@
+# app_services/resumo.py
+
+from collections import namedtuple
+
+from sqlalchemy import func
+
+from extensions import db
+from models import OcorrenciaVirtual, ResumoMensal
+from app_services.cache import obter_resumo
+from app_services.dinheiro import ZERO
+from app_services.faturas import resumo_faturas
+from app_services.resumo_mensal import SEM_VINCULO
+
+# Soma agrupada de lançamentos de conta, com a mesma interface (valor, status)
+# dos lançamentos usados por totalizar()
+Soma = namedtuple('Soma', 'valor status')
+
+
+def somas_das_contas(ano, mes):
+    """Somas dos lançamentos gravados de conta do mês por tipo e status, lidas de resumo_mensal"""
+    somas = {'Receita': [], 'Despesa': []}
+    linhas = db.session.query(
+        ResumoMensal.tipo, ResumoMensal.status, func.sum(ResumoMensal.valor_total)
+    ).filter(
+        ResumoMensal.ano == ano,
+        ResumoMensal.mes == mes,
+        ResumoMensal.conta_id != SEM_VINCULO,
+        ResumoMensal.cartao_id == SEM_VINCULO
+    ).group_by(ResumoMensal.tipo, ResumoMensal.status)
+    for tipo, status, valor in linhas:
+        if tipo in somas:
+            somas[tipo].append(Soma(valor or ZERO, status))
+    return somas
+
+
+def calcular_resumo_mes(ano, mes, receitas, despesas, cartoes):
+    """
+    Totais do mês exibidos no dashboard. Os lançamentos gravados são somados
+    em resumo_mensal; das listas receitas e despesas entram só as ocorrências
+    virtuais. As faturas são guardadas sem o objeto do cartão (apenas
+    cartao_id) para que o resumo possa ir para o cache.
+    """
+    somas = somas_das_contas(ano, mes)
+    receitas = somas['Receita'] + [r for r in receitas if isinstance(r, OcorrenciaVirtual)]
+    despesas = somas['Despesa'] + [d for d in despesas if isinstance(d, OcorrenciaVirtual)]
+
+    faturas = []
+    for fatura in resumo_faturas(ano, mes, cartoes):
+        if fatura['valor'] > 0:
+            linha = {campo: valor for campo, valor in fatura.items() if campo != 'cartao'}
+            linha['cartao_id'] = fatura['cartao'].id
+            faturas.append(linha)
+
+    return dict(totalizar(receitas, despesas, faturas), faturas=faturas)
+
+
+def totalizar(receitas, despesas, faturas):
+    """
+    Totais e pendências do mês. receitas e despesas são itens com valor e
+    status (lançamentos ou somas já agrupadas); faturas são dicionários com
+    'valor' e 'status'.
+    """
+    total_receitas_mes = sum((r.valor for r in receitas), ZERO)
+    total_despesas_mes = sum((d.valor for d in despesas), ZERO)
+    total_faturas_mes = sum((f['valor'] for f in faturas), ZERO)
+
+    receitas_pendentes = sum((r.valor for r in receitas if r.status == 'Pendente'), ZERO)
+    despesas_pendentes = sum((d.valor for d in despesas if d.status == 'Pendente'), ZERO)
+    faturas_pendentes = sum((f['valor'] for f in faturas if f['status'] == 'Pendente'), ZERO)
+
+    return {
+        'total_receitas_mes': total_receitas_mes,
+        'total_despesas_mes': total_despesas_mes,
+        'total_faturas_mes': total_faturas_mes,
+        'total_despesas_completo': total_despesas_mes + total_faturas_mes,
+        'receitas_pendentes': receitas_pendentes,
+        'despesas_pendentes': despesas_pendentes,
+        'faturas_pendentes': faturas_pendentes,
+        'total_despesas_pendentes': despesas_pendentes + faturas_pendentes,
+    }
+
+
+def resumo_mes(ano, mes, receitas, despesas, cartoes, versao=None):
+    """Resumo do mês (da versão dada ou da atual), calculado apenas quando não estiver no cache"""
+    resumo = obter_resumo(ano, mes, lambda: calcular_resumo_mes(ano, mes, receitas, despesas, cartoes), versao)
+
+    # Religar as faturas aos cartões carregados nesta requisição
+    cartoes_por_id = {cartao.id: cartao for cartao in cartoes}
+    faturas = [
+        dict(fatura, cartao=cartoes_por_id[fatura['cartao_id']])
+        for fatura in resumo['faturas'] if fatura['cartao_id'] in cartoes_por_id
+    ]
+    return dict(resumo, faturas=faturas)
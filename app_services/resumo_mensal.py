@@ -0,0 +1,207 @@
+# app_services/resumo_mensal.py
+#
+# Tabela de fatos resumo_mensal: soma e quantidade dos lançamentos gravados
+# por (ano, mês, conta/cartão, subcategoria, tipo, status, origem). Os totais
+# do dashboard, da projeção e o relatório de categorias leem daqui, e o custo
+# deixa de crescer com o número de lançamentos. É mantida pelo after_flush a
+# cada lançamento criado, alterado ou excluído, pelos comandos em lote via
+# registrar_lote() e pode ser reconstruída com 'flask recompute-resumo-mensal'.
+
+from sqlalchemy import and_, case, delete, event, extract, func, insert, select, tuple_
+from sqlalchemy.orm import Session
+
+from extensions import db
+from models import Lancamento, ResumoMensal
+from app_services.dinheiro import ZERO, para_dinheiro
+from app_services.saldos import estado_lancamento
+from app_services.upsert import insert_upsert
+
+CAMPOS_RESUMO = ('conta_id', 'cartao_credito_id', 'subcategoria_id', 'tipo', 'status', 'valor',
+                 'data_vencimento', 'transferencia_grupo_id', 'descricao')
+
+# Colunas da chave, na ordem das tuplas usadas como chave dos deltas
+COLUNAS_CHAVE = ('ano', 'mes', 'conta_id', 'cartao_id', 'subcategoria_id', 'tipo', 'status', 'origem')
+
+# conta_id, cartao_id ou subcategoria_id ausente
+SEM_VINCULO = 0
+
+
+def origem(transferencia_grupo_id, descricao):
+    if transferencia_grupo_id is not None:
+        return 'transferencia'
+    if descricao and descricao.startswith('Fatura '):
+        return 'fatura'
+    return 'lancamento'
+
+
+def filtro_meses(inicio, fim):
+    """
+    Filtro das linhas de (ano, mes) inicio a fim, inclusive, com comparações
+    de linha que usam o índice ix_resumo_mensal_ano_mes
+    """
+    chave = tuple_(ResumoMensal.ano, ResumoMensal.mes)
+    return and_(chave >= tuple_(*inicio), chave <= tuple_(*fim))
+
+
+# =============================================================================
+# VARREDURA COMPLETA E RECONSTRUÇÃO
+# =============================================================================
+
+def _consulta_totais():
+    """SELECT das COLUNAS_CHAVE, valor_total e qtd_lancamentos sobre os lançamentos"""
+    # As expressões ficam numa subconsulta para não se repetirem (com
+    # parâmetros diferentes) no SELECT e no GROUP BY
+    linhas = select(
+        extract('year', Lancamento.data_vencimento).label('ano'),
+        extract('month', Lancamento.data_vencimento).label('mes'),
+        func.coalesce(Lancamento.conta_id, SEM_VINCULO).label('conta_id'),
+        func.coalesce(Lancamento.cartao_credito_id, SEM_VINCULO).label('cartao_id'),
+        func.coalesce(Lancamento.subcategoria_id, SEM_VINCULO).label('subcategoria_id'),
+        Lancamento.tipo,
+        Lancamento.status,
+        case(
+            (Lancamento.transferencia_grupo_id.isnot(None), 'transferencia'),
+            (Lancamento.descricao.like('Fatura %'), 'fatura'),
+            else_='lancamento'
+        ).label('origem'),
+        Lancamento.valor
+    ).subquery()
+
+    chave = [linhas.c[coluna] for coluna in COLUNAS_CHAVE]
+    return select(*chave, func.coalesce(func.sum(linhas.c.valor), 0), func.count()).group_by(*chave)
+
+
+def varrer_totais():
+    """Retorna {chave: (valor_total, qtd_lancamentos)} com uma varredura completa"""
+    return {
+        (int(ano), int(mes), *resto): (para_dinheiro(valor), qtd)
+        for ano, mes, *resto, valor, qtd in db.session.execute(_consulta_totais())
+    }
+
+
+def _materializados():
+    totais = {}
+    for linha in ResumoMensal.query.all():
+        chave = tuple(getattr(linha, coluna) for coluna in COLUNAS_CHAVE)
+        valor, qtd = totais.get(chave, (ZERO, 0))
+        totais[chave] = (valor + linha.valor_total, qtd + linha.qtd_lancamentos)
+    return totais
+
+
+def reconstruir_resumo():
+    """
+    Reescreve resumo_mensal a partir da varredura completa e retorna a lista
+    de (chave, materializado, calculado) das chaves que divergiam.
+    """
+    calculados = varrer_totais()
+    materializados = _materializados()
+    divergencias = [
+        (chave, materializados.get(chave, (ZERO, 0)), calculados.get(chave, (ZERO, 0)))
+        for chave in set(calculados) | set(materializados)
+        if materializados.get(chave, (ZERO, 0)) != calculados.get(chave, (ZERO, 0))
+    ]
+
+    if divergencias:
+        db.session.execute(delete(ResumoMensal))
+        if calculados:
+            db.session.execute(insert(ResumoMensal), [
+                dict(zip(COLUNAS_CHAVE, chave), valor_total=valor, qtd_lancamentos=qtd)
+                for chave, (valor, qtd) in calculados.items()
+            ])
+
+    return sorted(divergencias)
+
+
+# =============================================================================
+# MANUTENÇÃO INCREMENTAL NA ESCRITA
+# =============================================================================
+
+def _id(valor):
+    """Id da chave: os formulários atribuem ids como texto antes do flush"""
+    return int(valor) if valor else SEM_VINCULO
+
+
+def _acumular(deltas, estado, sinal):
+    conta_id, cartao_id, subcategoria_id, tipo, status, valor, vencimento, grupo_id, descricao = estado
+    if vencimento is None or tipo is None:
+        return
+    chave = (vencimento.year, vencimento.month, _id(conta_id), _id(cartao_id), _id(subcategoria_id),
+             tipo, status, origem(grupo_id, descricao))
+    total, qtd = deltas.get(chave, (ZERO, 0))
+    deltas[chave] = (total + sinal * para_dinheiro(valor or 0), qtd + sinal)
+
+
+def deltas_do_flush(session):
+    """Calcula a variação de valor e quantidade por chave do resumo causada pelo flush"""
+    deltas = {}
+    for obj in session.new:
+        if isinstance(obj, Lancamento):
+            _acumular(deltas, estado_lancamento(obj, False, CAMPOS_RESUMO), 1)
+    for obj in session.deleted:
+        if isinstance(obj, Lancamento):
+            _acumular(deltas, estado_lancamento(obj, True, CAMPOS_RESUMO), -1)
+    for obj in session.dirty:
+        if isinstance(obj, Lancamento) and session.is_modified(obj, include_collections=False):
+            _acumular(deltas, estado_lancamento(obj, True, CAMPOS_RESUMO), -1)
+            _acumular(deltas, estado_lancamento(obj, False, CAMPOS_RESUMO), 1)
+    return deltas
+
+
+def aplicar_deltas(conexao, deltas):
+    """
+    Soma as variações em resumo_mensal com um único upsert de várias linhas
+    e remove, com um DELETE, as chaves dos meses afetados que ficaram sem
+    lançamentos
+    """
+    tabela = ResumoMensal.__table__
+    # Em ordem de chave, para que transações concorrentes travem as linhas na mesma ordem
+    linhas = [
+        dict(zip(COLUNAS_CHAVE, chave), valor_total=valor, qtd_lancamentos=qtd)
+        for chave, (valor, qtd) in sorted(deltas.items())
+        if valor or qtd
+    ]
+    if not linhas:
+        return
+
+    comando = insert_upsert(conexao, tabela).values(linhas)
+    conexao.execute(comando.on_conflict_do_update(
+        index_elements=list(COLUNAS_CHAVE),
+        set_={
+            'valor_total': tabela.c.valor_total + comando.excluded.valor_total,
+            'qtd_lancamentos': tabela.c.qtd_lancamentos + comando.excluded.qtd_lancamentos,
+        }
+    ))
+
+    meses_com_saida = {(linha['ano'], linha['mes']) for linha in linhas if linha['qtd_lancamentos'] < 0}
+    if meses_com_saida:
+        conexao.execute(delete(tabela).where(
+            tuple_(tabela.c.ano, tabela.c.mes).in_(sorted(meses_com_saida)),
+            tabela.c.qtd_lancamentos == 0
+        ))
+
+
+def _estado_da_linha(linha):
+    mapa = linha._mapping if hasattr(linha, '_mapping') else linha
+    return tuple(mapa.get(campo) for campo in CAMPOS_RESUMO)
+
+
+def registrar_lote(antigos, novos):
+    """
+    Mantém resumo_mensal após um INSERT/UPDATE/DELETE em lote, que não passa
+    pelo flush. 'antigos' e 'novos' são as linhas afetadas (dicionários ou
+    linhas de RETURNING com os CAMPOS_RESUMO), antes e depois do comando.
+    """
+    deltas = {}
+    for linha in antigos:
+        _acumular(deltas, _estado_da_linha(linha), -1)
+    for linha in novos:
+        _acumular(deltas, _estado_da_linha(linha), 1)
+    if deltas:
+        aplicar_deltas(db.session.connection(), deltas)
+
+
+@event.listens_for(Session, 'after_flush')
+def _atualizar_resumo_apos_flush(session, flush_context):
+    deltas = deltas_do_flush(session)
+    if deltas:
+        aplicar_deltas(session.connection(), deltas)
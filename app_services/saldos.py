@@ -0,0 +1,207 @@
+# app_services/saldos.py
+
+from flask import g, has_app_context
+from sqlalchemy import case, event, func, inspect, insert, select, update
+from sqlalchemy.orm import Session
+
+from extensions import db
+from models import Conta, Lancamento, SaldoConta
+from app_services.dinheiro import ZERO, para_dinheiro
+
+CAMPOS_SALDO = ('conta_id', 'tipo', 'status', 'valor')
+
+
+# =============================================================================
+# LEITURA DOS SALDOS
+# =============================================================================
+
+def calcular_saldos():
+    """Lê o saldo atual de todas as contas a partir da tabela materializada"""
+    linhas = db.session.query(
+        Conta.id,
+        Conta.saldo_inicial
+        + func.coalesce(SaldoConta.total_receitas, 0)
+        - func.coalesce(SaldoConta.total_despesas, 0)
+    ).outerjoin(SaldoConta, SaldoConta.conta_id == Conta.id).all()
+
+    return {conta_id: saldo for conta_id, saldo in linhas}
+
+
+def saldos_contas():
+    """Retorna {conta_id: saldo}, calculado uma única vez por requisição"""
+    if not has_app_context():
+        return calcular_saldos()
+
+    if '_saldos_contas' not in g:
+        g._saldos_contas = calcular_saldos()
+    return g._saldos_contas
+
+
+def saldo_conta(conta_id):
+    return saldos_contas().get(conta_id, ZERO)
+
+
+def invalidar_saldos():
+    if has_app_context():
+        g.pop('_saldos_contas', None)
+
+
+# =============================================================================
+# VARREDURA COMPLETA E RECONSTRUÇÃO
+# =============================================================================
+
+def _consulta_totais():
+    """SELECT conta_id, total_receitas, total_despesas sobre os lançamentos pagos"""
+    return select(
+        Lancamento.conta_id,
+        func.coalesce(func.sum(case((Lancamento.tipo == 'Receita', Lancamento.valor), else_=0)), 0),
+        func.coalesce(func.sum(case((Lancamento.tipo == 'Despesa', Lancamento.valor), else_=0)), 0)
+    ).where(
+        Lancamento.conta_id.isnot(None),
+        Lancamento.status == 'Pago'
+    ).group_by(Lancamento.conta_id)
+
+
+def varrer_totais():
+    """Retorna {conta_id: (total_receitas, total_despesas)} com uma varredura completa"""
+    return {
+        conta_id: (receitas, despesas)
+        for conta_id, receitas, despesas in db.session.execute(_consulta_totais())
+    }
+
+
+def reconstruir_saldos():
+    """
+    Reescreve a tabela saldos_conta a partir da varredura completa e retorna
+    a lista de (conta_id, materializado, calculado) das contas que divergiam.
+    """
+    calculados = varrer_totais()
+    materializados = {s.conta_id: s for s in SaldoConta.query.all()}
+    divergencias = []
+
+    for conta_id in set(calculados) | set(materializados):
+        receitas, despesas = calculados.get(conta_id, (ZERO, ZERO))
+        registro = materializados.get(conta_id)
+
+        if registro is None:
+            registro = SaldoConta(conta_id=conta_id, total_receitas=ZERO, total_despesas=ZERO)
+            db.session.add(registro)
+
+        anterior = (registro.total_receitas, registro.total_despesas)
+        if anterior != (receitas, despesas):
+            divergencias.append((conta_id, anterior, (receitas, despesas)))
+
+        registro.total_receitas = receitas
+        registro.total_despesas = despesas
+
+    return divergencias
+
+
+# =============================================================================
+# MANUTENÇÃO INCREMENTAL NA ESCRITA
+# =============================================================================
+
+def estado_lancamento(lancamento, anterior, campos=CAMPOS_SALDO):
+    """
+    Retorna os valores dos campos (por padrão conta_id, tipo, status, valor)
+    atuais ou anteriores ao flush. Os campos têm active_history no modelo,
+    então o valor anterior de um campo alterado está sempre no histórico.
+    """
+    atributos = inspect(lancamento).attrs
+    valores = []
+    for campo in campos:
+        if not anterior:
+            valores.append(getattr(lancamento, campo))
+            continue
+        historico = atributos[campo].history
+        if historico.deleted:
+            valores.append(historico.deleted[0])
+        elif historico.unchanged:
+            valores.append(historico.unchanged[0])
+        elif historico.added:
+            # Depois do flush o banco já tem o valor novo: sem o anterior,
+            # os totais mantidos na escrita divergiriam
+            raise RuntimeError(f'Valor anterior de Lancamento.{campo} não foi carregado (falta active_history)')
+        else:
+            valores.append(getattr(lancamento, campo))
+    return valores
+
+
+def _acumular(deltas, estado, sinal):
+    conta_id, tipo, status, valor = estado
+    if conta_id is None or status != 'Pago' or not valor:
+        return
+    receitas, despesas = deltas.get(int(conta_id), (ZERO, ZERO))
+    if tipo == 'Receita':
+        receitas += sinal * para_dinheiro(valor)
+    elif tipo == 'Despesa':
+        despesas += sinal * para_dinheiro(valor)
+    deltas[int(conta_id)] = (receitas, despesas)
+
+
+def deltas_do_flush(session):
+    """Calcula a variação de receitas/despesas pagas por conta causada pelo flush"""
+    deltas = {}
+    for obj in session.new:
+        if isinstance(obj, Lancamento):
+            _acumular(deltas, estado_lancamento(obj, anterior=False), 1)
+    for obj in session.deleted:
+        if isinstance(obj, Lancamento):
+            _acumular(deltas, estado_lancamento(obj, anterior=True), -1)
+    for obj in session.dirty:
+        if isinstance(obj, Lancamento) and session.is_modified(obj, include_collections=False):
+            _acumular(deltas, estado_lancamento(obj, anterior=True), -1)
+            _acumular(deltas, estado_lancamento(obj, anterior=False), 1)
+    return deltas
+
+
+def aplicar_deltas(conexao, deltas):
+    """Soma as variações na tabela saldos_conta, criando a linha se necessário"""
+    tabela = SaldoConta.__table__
+    for conta_id, (receitas, despesas) in deltas.items():
+        if not receitas and not despesas:
+            continue
+        resultado = conexao.execute(
+            update(tabela)
+            .where(tabela.c.conta_id == conta_id)
+            .values(
+                total_receitas=tabela.c.total_receitas + receitas,
+                total_despesas=tabela.c.total_despesas + despesas
+            )
+        )
+        if resultado.rowcount == 0:
+            # Primeira movimentação da conta: os lançamentos já foram gravados
+            # neste flush, então a varredura da conta já inclui a variação
+            totais = conexao.execute(
+                _consulta_totais().where(Lancamento.conta_id == conta_id)
+            ).first()
+            conexao.execute(insert(tabela).values(
+                conta_id=conta_id,
+                total_receitas=totais[1] if totais else ZERO,
+                total_despesas=totais[2] if totais else ZERO
+            ))
+
+
+def registrar_lote(antigos, novos):
+    """
+    Mantém saldos_conta após um UPDATE/DELETE em lote, que não passa pelo
+    flush. 'antigos' e 'novos' são as linhas (conta_id, tipo, status, valor)
+    afetadas, antes e depois do comando.
+    """
+    deltas = {}
+    for linha in antigos:
+        _acumular(deltas, tuple(linha)[:4], -1)
+    for linha in novos:
+        _acumular(deltas, tuple(linha)[:4], 1)
+    if deltas:
+        aplicar_deltas(db.session.connection(), deltas)
+    invalidar_saldos()
+
+
+@event.listens_for(Session, 'after_flush')
+def _atualizar_saldos_apos_flush(session, flush_context):
+    deltas = deltas_do_flush(session)
+    if deltas:
+        aplicar_deltas(session.connection(), deltas)
+    # Qualquer escrita no banco pode alterar os saldos já calculados na requisição
+    invalidar_saldos()
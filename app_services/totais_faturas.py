@@ -0,0 +1,164 @@
+# app_services/totais_faturas.py
+#
+# Totais materializados das faturas: faturas_cartao.valor_total e
+# qtd_lancamentos guardam a soma e a quantidade das despesas gravadas de cada
+# cartão no mês de vencimento (sem os lançamentos 'Fatura ...'). São mantidos
+# pelo after_flush a cada lançamento de cartão criado, alterado, movido ou
+# excluído, e pelos comandos em lote via registrar_lote().
+
+from sqlalchemy import and_, event, extract, func, select
+from sqlalchemy.orm import Session
+
+from extensions import db
+from models import FaturaCartao, Lancamento
+from app_services.dinheiro import ZERO, para_dinheiro
+from app_services.saldos import estado_lancamento
+from app_services.upsert import insert_upsert
+
+CAMPOS_FATURA = ('cartao_credito_id', 'tipo', 'descricao', 'valor', 'data_vencimento')
+
+
+def _entra_na_fatura():
+    """Filtro SQL dos lançamentos que compõem a fatura"""
+    return and_(
+        Lancamento.cartao_credito_id.isnot(None),
+        Lancamento.tipo == 'Despesa',
+        ~Lancamento.descricao.like('Fatura %')
+    )
+
+
+# =============================================================================
+# VARREDURA COMPLETA E RECONSTRUÇÃO
+# =============================================================================
+
+def _consulta_totais():
+    """SELECT cartao_id, ano, mes, valor_total, qtd_lancamentos sobre os lançamentos"""
+    ano = extract('year', Lancamento.data_vencimento)
+    mes = extract('month', Lancamento.data_vencimento)
+    return select(
+        Lancamento.cartao_credito_id, ano, mes,
+        func.coalesce(func.sum(Lancamento.valor), 0),
+        func.count()
+    ).where(_entra_na_fatura()).group_by(Lancamento.cartao_credito_id, ano, mes)
+
+
+def varrer_totais():
+    """Retorna {(cartao_id, ano, mes): (valor_total, qtd_lancamentos)} com uma varredura completa"""
+    return {
+        (cartao_id, int(ano), int(mes)): (para_dinheiro(valor), qtd)
+        for cartao_id, ano, mes, valor, qtd in db.session.execute(_consulta_totais())
+    }
+
+
+def reconstruir_faturas():
+    """
+    Reescreve valor_total e qtd_lancamentos de faturas_cartao a partir da
+    varredura completa, criando as faturas que faltam, e retorna a lista de
+    ((cartao_id, ano, mes), materializado, calculado) das que divergiam.
+    """
+    calculados = varrer_totais()
+    materializadas = {(f.cartao_id, f.ano, f.mes): f for f in FaturaCartao.query.all()}
+    divergencias = []
+
+    for chave in set(calculados) | set(materializadas):
+        valor, qtd = calculados.get(chave, (ZERO, 0))
+        fatura = materializadas.get(chave)
+
+        if fatura is None:
+            cartao_id, ano, mes = chave
+            fatura = FaturaCartao(cartao_id=cartao_id, ano=ano, mes=mes, paga=False,
+                                  valor_total=ZERO, qtd_lancamentos=0)
+            db.session.add(fatura)
+
+        anterior = (fatura.valor_total, fatura.qtd_lancamentos)
+        if anterior != (valor, qtd):
+            divergencias.append((chave, anterior, (valor, qtd)))
+
+        fatura.valor_total = valor
+        fatura.qtd_lancamentos = qtd
+
+    return sorted(divergencias)
+
+
+# =============================================================================
+# MANUTENÇÃO INCREMENTAL NA ESCRITA
+# =============================================================================
+
+def _acumular(deltas, estado, sinal):
+    cartao_id, tipo, descricao, valor, vencimento = estado
+    if cartao_id is None or tipo != 'Despesa' or vencimento is None:
+        return
+    if descricao and descricao.startswith('Fatura '):
+        return
+    chave = (int(cartao_id), vencimento.year, vencimento.month)
+    total, qtd = deltas.get(chave, (ZERO, 0))
+    deltas[chave] = (total + sinal * para_dinheiro(valor or 0), qtd + sinal)
+
+
+def deltas_do_flush(session):
+    """Calcula a variação de valor e quantidade por fatura causada pelo flush"""
+    deltas = {}
+    for obj in session.new:
+        if isinstance(obj, Lancamento):
+            _acumular(deltas, estado_lancamento(obj, False, CAMPOS_FATURA), 1)
+    for obj in session.deleted:
+        if isinstance(obj, Lancamento):
+            _acumular(deltas, estado_lancamento(obj, True, CAMPOS_FATURA), -1)
+    for obj in session.dirty:
+        if isinstance(obj, Lancamento) and session.is_modified(obj, include_collections=False):
+            _acumular(deltas, estado_lancamento(obj, True, CAMPOS_FATURA), -1)
+            _acumular(deltas, estado_lancamento(obj, False, CAMPOS_FATURA), 1)
+    return deltas
+
+
+def aplicar_deltas(conexao, deltas):
+    """
+    Soma as variações em faturas_cartao com um único upsert de várias
+    linhas (unique_fatura_mes), criando as faturas que ainda não existem
+    """
+    tabela = FaturaCartao.__table__
+    # Em ordem de chave, para que transações concorrentes travem as linhas na mesma ordem
+    linhas = [
+        {'cartao_id': cartao_id, 'ano': ano, 'mes': mes, 'paga': False,
+         'valor_total': valor, 'qtd_lancamentos': qtd}
+        for (cartao_id, ano, mes), (valor, qtd) in sorted(deltas.items())
+        if valor or qtd
+    ]
+    if not linhas:
+        return
+
+    comando = insert_upsert(conexao, tabela).values(linhas)
+    conexao.execute(comando.on_conflict_do_update(
+        index_elements=['cartao_id', 'ano', 'mes'],
+        set_={
+            'valor_total': tabela.c.valor_total + comando.excluded.valor_total,
+            'qtd_lancamentos': tabela.c.qtd_lancamentos + comando.excluded.qtd_lancamentos,
+        }
+    ))
+
+
+def _estado_da_linha(linha):
+    mapa = linha._mapping if hasattr(linha, '_mapping') else linha
+    return tuple(mapa.get(campo) for campo in CAMPOS_FATURA)
+
+
+def registrar_lote(antigos, novos):
+    """
+    Mantém faturas_cartao após um INSERT/UPDATE/DELETE em lote, que não passa
+    pelo flush. 'antigos' e 'novos' são as linhas afetadas (dicionários ou
+    linhas de RETURNING com os CAMPOS_FATURA), antes e depois do comando.
+    """
+    deltas = {}
+    for linha in antigos:
+        _acumular(deltas, _estado_da_linha(linha), -1)
+    for linha in novos:
+        _acumular(deltas, _estado_da_linha(linha), 1)
+    if deltas:
+        aplicar_deltas(db.session.connection(), deltas)
+
+
+@event.listens_for(Session, 'after_flush')
+def _atualizar_faturas_apos_flush(session, flush_context):
+    deltas = deltas_do_flush(session)
+    if deltas:
+        aplicar_deltas(session.connection(), deltas)
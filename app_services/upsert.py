@@ -0,0 +1,17 @@
+# app_services/upsert.py
+#
+# INSERT ... ON CONFLICT DO UPDATE das tabelas mantidas na escrita. O
+# comando existe no PostgreSQL e no SQLite, mas cada dialeto tem o seu
+# insert(); outros bancos levantam erro em vez de receber a sintaxe errada.
+
+from sqlalchemy.dialects import postgresql, sqlite
+
+DIALETOS = {'postgresql': postgresql, 'sqlite': sqlite}
+
+
+def insert_upsert(conexao, tabela):
+    """insert() do dialeto da conexão, que aceita on_conflict_do_update()"""
+    dialeto = DIALETOS.get(conexao.dialect.name)
+    if dialeto is None:
+        raise NotImplementedError(f"Upsert não suportado no banco '{conexao.dialect.name}'")
+    return dialeto.insert(tabela)
@@ -0,0 +1,152 @@
+# benchmarks/consultas.py
+"""
+Conta os comandos SQL executados ao renderizar as páginas principais e
+falha se alguma passar do limite. As páginas são medidas com dois volumes
+de dados: a quantidade de consultas não deve crescer com o número de linhas.
+
+Uso: python -m benchmarks.consultas [volume]
+"""
+
+import json
+import sys
+from datetime import date, datetime, timedelta
+
+from sqlalchemy import event
+
+from app import create_app
+from extensions import db
+from models import (
+    Categoria, Subcategoria, Conta, CartaoCredito, Lancamento, TransferenciaGrupo
+)
+from app_services.recorrencias import criar_recorrencia
+
+app = create_app({'SQLALCHEMY_DATABASE_URI': 'sqlite://', 'SECRET_KEY': 'benchmark'})
+
+# página -> número máximo de comandos SQL por requisição. O dashboard inclui a
+# leitura da versão do mês em versoes_mes, que mantém o cache dos resumos
+# correto entre processos
+LIMITES = {
+    '/dashboard?ano=2025&mes=3': 12,
+    '/cartoes/extrato?cartao_id=1&ano=2025&mes=3': 8,
+    '/lancamentos': 11,
+}
+
+
+def popular_banco(volume):
+    """Cria contas, cartões e 'volume' lançamentos de cada espécie por mês"""
+    db.drop_all()
+    db.create_all()
+
+    subcategorias = []
+    for i in range(4):
+        categoria = Categoria(nome=f'Categoria {i}', cor='#6c757d', icone='bi bi-tag')
+        db.session.add(categoria)
+        db.session.flush()
+        for j in range(3):
+            subcategoria = Subcategoria(nome=f'Subcategoria {i}.{j}', categoria_id=categoria.id)
+            db.session.add(subcategoria)
+            subcategorias.append(subcategoria)
+
+    contas = [Conta(nome=f'Conta {i}', saldo_inicial=1000.0) for i in range(3)]
+    db.session.add_all(contas)
+    db.session.flush()
+    cartoes = [
+        CartaoCredito(nome=f'Cartão {i}', dia_vencimento=10, conta_pagamento_id=contas[0].id)
+        for i in range(2)
+    ]
+    db.session.add_all(cartoes)
+    db.session.flush()
+
+    # Datas de criação intercaladas para que a listagem tenha todas as origens
+    criacao = (datetime(2025, 1, 1) + timedelta(minutes=k) for k in range(10 ** 6))
+
+    for mes in range(1, 13):
+        for i in range(volume):
+            subcategoria = subcategorias[i % len(subcategorias)]
+            vencimento = date(2025, mes, 1 + i % 28)
+            db.session.add(Lancamento(
+                descricao=f'Despesa {mes}.{i}', valor=10.0 + i, tipo='Despesa',
+                status='Pago' if i % 2 else 'Pendente', data_vencimento=vencimento,
+                data_criacao=next(criacao), conta_id=contas[i % len(contas)].id, subcategoria_id=subcategoria.id
+            ))
+            db.session.add(Lancamento(
+                descricao=f'Receita {mes}.{i}', valor=20.0 + i, tipo='Receita',
+                data_vencimento=vencimento, data_criacao=next(criacao), conta_id=contas[i % len(contas)].id,
+                subcategoria_id=subcategoria.id
+            ))
+            db.session.add(Lancamento(
+                descricao=f'Compra {mes}.{i}', valor=5.0 + i, tipo='Despesa',
+                data_vencimento=vencimento, data_criacao=next(criacao),
+                cartao_credito_id=cartoes[i % len(cartoes)].id, subcategoria_id=subcategoria.id
+            ))
+
+            grupo = TransferenciaGrupo(data_criacao=next(criacao))
+            db.session.add(grupo)
+            db.session.flush()
+            for tipo, conta in (('Despesa', contas[1]), ('Receita', contas[2])):
+                db.session.add(Lancamento(
+                    descricao=f'Transferência {mes}.{i}', valor=15.0, tipo=tipo, status='Pago',
+                    data_vencimento=vencimento, conta_id=conta.id, transferencia_grupo_id=grupo.id
+                ))
+
+            # Recorrências criadas junto com os lançamentos mais recentes
+            if mes == 12:
+                recorrencias = [
+                    criar_recorrencia('fixa', f'Fixa {i}', 50.0, 'Despesa', date(2025, 1, 5), subcategoria.id,
+                                      conta_id=contas[0].id),
+                    criar_recorrencia('fixa', f'Assinatura {i}', 30.0, 'Despesa', date(2025, 1, 15),
+                                      subcategoria.id, cartao_credito_id=cartoes[0].id),
+                    criar_recorrencia('parcelada', f'Parcelada {i}', 1200.0, 'Despesa', date(2025, 1, 20),
+                                      subcategoria.id, conta_id=contas[1].id, total_parcelas=12),
+                    criar_recorrencia('parcelada', f'Compra parcelada {i}', 600.0, 'Despesa', date(2025, 1, 20),
+                                      subcategoria.id, cartao_credito_id=cartoes[0].id, total_parcelas=6),
+                ]
+                for recorrencia in recorrencias:
+                    recorrencia.data_criacao = next(criacao)
+
+    db.session.commit()
+
+
+def medir(volume):
+    contador = {'comandos': 0}
+
+    def _contar(conn, cursor, statement, parameters, context, executemany):
+        contador['comandos'] += 1
+
+    with app.app_context():
+        popular_banco(volume)
+        event.listen(db.engine, 'after_cursor_execute', _contar)
+
+    cliente = app.test_client()
+    resultado = {}
+    try:
+        for pagina in LIMITES:
+            contador['comandos'] = 0
+            resposta = cliente.get(pagina)
+            assert resposta.status_code == 200, (pagina, resposta.status_code)
+            resultado[pagina] = contador['comandos']
+    finally:
+        with app.app_context():
+            event.remove(db.engine, 'after_cursor_execute', _contar)
+    return resultado
+
+
+def main(volume=20):
+    medicoes = {volume: medir(volume), volume * 5: medir(volume * 5)}
+    print(json.dumps(medicoes, indent=2, ensure_ascii=False))
+
+    falhas = [
+        f'{pagina}: {comandos} comandos (limite {LIMITES[pagina]}, volume {v})'
+        for v, paginas in medicoes.items()
+        for pagina, comandos in paginas.items()
+        if comandos > LIMITES[pagina]
+    ]
+    for falha in falhas:
+        print(f'[ERRO] {falha}')
+    if falhas:
+        sys.exit(1)
+    print('[SUCESSO] Todas as páginas dentro do limite de consultas.')
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 20)
@@ -0,0 +1,82 @@
+# benchmarks/dinheiro.py
+"""
+Compara a agregação de valores monetários guardados como float, como
+centavos inteiros e como Decimal (NUMERIC), no banco (SUM agrupado) e no
+Python (sum), e mostra o erro acumulado dos floats em relação à soma exata.
+
+Uso: python -m benchmarks.dinheiro [linhas]
+"""
+
+import json
+import random
+import sys
+import timeit
+from decimal import Decimal
+
+import sqlalchemy as sa
+
+from app_services.dinheiro import de_centavos
+
+REPETICOES = 5
+GRUPOS = 50
+
+
+def melhor_tempo_ms(funcao):
+    return min(timeit.repeat(funcao, number=1, repeat=REPETICOES)) * 1000
+
+
+def main(linhas=200000):
+    gerador = random.Random(42)
+    centavos = [gerador.randint(1, 500000) for _ in range(linhas)]
+    grupos = [i % GRUPOS for i in range(linhas)]
+
+    metadados = sa.MetaData()
+    tabela = sa.Table(
+        'valores', metadados,
+        sa.Column('grupo', sa.Integer),
+        sa.Column('valor_float', sa.Float),
+        sa.Column('valor_centavos', sa.Integer),
+        sa.Column('valor_numeric', sa.Numeric(12, 2)),
+    )
+    engine = sa.create_engine('sqlite://')
+    metadados.create_all(engine)
+
+    with engine.begin() as conexao:
+        conexao.execute(tabela.insert(), [
+            {'grupo': g, 'valor_float': c / 100, 'valor_centavos': c, 'valor_numeric': c / 100}
+            for g, c in zip(grupos, centavos)
+        ])
+
+    def soma_sql(coluna):
+        consulta = sa.select(tabela.c.grupo, sa.func.sum(coluna)).group_by(tabela.c.grupo)
+        with engine.connect() as conexao:
+            return conexao.execute(consulta).all()
+
+    floats = [c / 100 for c in centavos]
+    decimais = [de_centavos(c) for c in centavos]
+    exato = de_centavos(sum(centavos))
+
+    resultado = {
+        'linhas': linhas,
+        'sql_ms': {
+            'float': round(melhor_tempo_ms(lambda: soma_sql(tabela.c.valor_float)), 2),
+            'centavos': round(melhor_tempo_ms(lambda: soma_sql(tabela.c.valor_centavos)), 2),
+            'numeric_decimal': round(melhor_tempo_ms(lambda: soma_sql(tabela.c.valor_numeric)), 2),
+        },
+        'python_ms': {
+            'float': round(melhor_tempo_ms(lambda: sum(floats)), 2),
+            'centavos': round(melhor_tempo_ms(lambda: sum(centavos)), 2),
+            'decimal': round(melhor_tempo_ms(lambda: sum(decimais, Decimal('0.00'))), 2),
+        },
+        'soma_exata': str(exato),
+        'erro_float': str(Decimal(repr(sum(floats))) - exato),
+        'erro_decimal': str(sum(decimais, Decimal('0.00')) - exato),
+    }
+
+    print(json.dumps(resultado, indent=2, ensure_ascii=False))
+    if resultado['sql_ms']['centavos'] > resultado['sql_ms']['float'] * 1.1:
+        print('\n[AVISO] A soma em centavos foi mais lenta que a soma de floats.')
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 200000)
@@ -0,0 +1,68 @@
+# benchmarks/exportacao.py
+"""
+Benchmark da exportação em streaming: gera bases sintéticas de tamanhos
+crescentes (benchmarks.gerador) e mede, para o CSV e o OFX, o tempo, o
+tamanho do arquivo e o pico de memória (tracemalloc) enquanto a resposta é
+consumida aos pedaços. Com o yield_per o pico deve ficar estável quando o
+número de lançamentos cresce.
+
+O banco vem de BENCHMARK_DATABASE_URI (no PostgreSQL o yield_per usa um
+cursor do lado do servidor); sem ela é usado SQLite em memória.
+
+Uso: python -m benchmarks.exportacao [anos ...]
+"""
+
+import json
+import logging
+import os
+import sys
+import time
+import tracemalloc
+
+from app import create_app
+from extensions import db
+from models import Lancamento
+from benchmarks.gerador import gerar_dados
+
+URLS = {'csv': '/export/lancamentos.csv', 'ofx': '/export/lancamentos.ofx'}
+
+
+def medir(cliente, url):
+    tracemalloc.start()
+    inicio = time.perf_counter()
+    resposta = cliente.get(url, buffered=False)
+    tamanho = sum(len(pedaco) for pedaco in resposta.response)
+    resposta.close()
+    duracao = time.perf_counter() - inicio
+    _, pico = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {
+        'tempo_s': round(duracao, 3),
+        'tamanho_kb': round(tamanho / 1024, 1),
+        'pico_memoria_kb': round(pico / 1024, 1),
+    }
+
+
+def main(anos=(1, 4, 16)):
+    logging.getLogger('sistema_financeiro.sql').disabled = True
+    app = create_app({
+        'SQLALCHEMY_DATABASE_URI': os.getenv('BENCHMARK_DATABASE_URI', 'sqlite://'),
+        'SECRET_KEY': 'benchmark'
+    })
+    cliente = app.test_client()
+
+    resultado = []
+    with app.app_context():
+        for quantidade in anos:
+            gerar_dados(cliente, anos=quantidade, avulsos_por_mes=100)
+            linha = {'anos': quantidade, 'lancamentos': Lancamento.query.count()}
+            db.session.remove()
+            for formato, url in URLS.items():
+                linha[formato] = medir(cliente, url)
+            resultado.append(linha)
+
+    print(json.dumps(resultado, indent=2, ensure_ascii=False))
+
+
+if __name__ == '__main__':
+    main(tuple(int(a) for a in sys.argv[1:]) or (1, 4, 16))
@@ -0,0 +1,68 @@
+# benchmarks/formatacao.py
+"""
+Compara o filtro 'currency' antigo (setlocale pt_BR a cada valor) com o
+formatador em Python puro, valor a valor e em lote, e confere que os dois
+produzem o mesmo texto quando o locale pt_BR está instalado.
+
+Uso: python -m benchmarks.formatacao [quantidade]
+"""
+
+import json
+import locale
+import random
+import sys
+import timeit
+
+from app_services.formatacao import formatar_brl, formatar_brl_lista
+
+REPETICOES = 5
+
+
+def filtro_antigo(value):
+    """Implementação anterior do filtro, mantida aqui só para comparação"""
+    if value is None: return "R$ 0,00"
+    try:
+        locale.setlocale(locale.LC_ALL, 'pt_BR.UTF-8')
+        return locale.currency(float(value), grouping=True)
+    except (ValueError, TypeError): return value
+
+
+def locale_disponivel():
+    try:
+        locale.setlocale(locale.LC_ALL, 'pt_BR.UTF-8')
+    except locale.Error:
+        return False
+    finally:
+        locale.setlocale(locale.LC_ALL, 'C')
+    return True
+
+
+def melhor_tempo_ms(funcao):
+    return min(timeit.repeat(funcao, number=1, repeat=REPETICOES)) * 1000
+
+
+def main(quantidade=1000):
+    gerador = random.Random(42)
+    valores = [round(gerador.uniform(-50000, 50000), 2) for _ in range(quantidade)]
+
+    resultado = {'valores': quantidade}
+    resultado['novo_ms'] = round(melhor_tempo_ms(lambda: [formatar_brl(v) for v in valores]), 3)
+    resultado['novo_lote_ms'] = round(melhor_tempo_ms(lambda: formatar_brl_lista(valores)), 3)
+
+    if locale_disponivel():
+        resultado['antigo_ms'] = round(melhor_tempo_ms(lambda: [filtro_antigo(v) for v in valores]), 3)
+        resultado['ganho'] = round(resultado['antigo_ms'] / resultado['novo_ms'], 1)
+        divergentes = [v for v in valores if filtro_antigo(v) != formatar_brl(v)]
+        resultado['divergentes'] = len(divergentes)
+        locale.setlocale(locale.LC_ALL, 'C')
+    else:
+        resultado['antigo_ms'] = None
+        resultado['observacao'] = 'locale pt_BR.UTF-8 não instalado: filtro antigo não medido'
+
+    print(json.dumps(resultado, indent=2, ensure_ascii=False))
+    if resultado.get('divergentes'):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 1000)
@@ -0,0 +1,181 @@
+# benchmarks/gerador.py
+"""
+Gerador de dados sintéticos para os benchmarks: categorias, N contas, M
+cartões e K anos de movimento. As recorrências são criadas com POST em
+/lancamentos, pela mesma lógica do formulário de gerenciar_lancamentos
+(inclusive o mês da fatura dos cartões); os lançamentos avulsos de cada mês
+são gravados em lote.
+
+Uso (dentro de um app_context): gerar_dados(cliente, contas=3, cartoes=2, anos=2)
+"""
+
+import random
+from dataclasses import dataclass, field
+from datetime import date, datetime, timedelta
+
+from sqlalchemy import func, insert
+
+from extensions import db
+from app_services import resumo_mensal, saldos, totais_faturas
+from app_services.cache import registrar_linhas
+from app_services.dinheiro import para_dinheiro
+from models import Categoria, Subcategoria, Conta, CartaoCredito, Lancamento, Recorrencia
+
+
+@dataclass
+class Volume:
+    contas: int = 3
+    cartoes: int = 2
+    anos: int = 2
+    avulsos_por_mes: int = 20
+    recorrencias_por_conta: int = 4
+    ano_inicio: int = 2025
+    semente: int = 42
+
+
+@dataclass
+class DadosGerados:
+    volume: Volume
+    subcategorias: list = field(default_factory=list)
+    contas: list = field(default_factory=list)
+    cartoes: list = field(default_factory=list)
+
+    @property
+    def mes_central(self):
+        """(ano, mes) no meio do período gerado, com passado e futuro"""
+        return self.volume.ano_inicio + self.volume.anos // 2, 6
+
+
+def _postar(cliente, **campos):
+    resposta = cliente.post('/lancamentos', data=campos)
+    assert resposta.status_code == 302, (campos, resposta.status_code)
+
+
+def criar_recorrencia_conta(cliente, dados, conta_id, descricao, inicio, parcelas=None, valor='1200.00'):
+    """Cria uma recorrência em conta pelo formulário (parcelada se 'parcelas')"""
+    campos = {
+        'tipo_lancamento': 'Despesa', 'descricao': descricao, 'valor': valor,
+        'data_vencimento': inicio.isoformat(), 'subcategoria_id': str(dados.subcategorias[0]),
+        'conta_id': str(conta_id), 'recorrencia_tipo': 'parcelada' if parcelas else 'fixa',
+    }
+    if parcelas:
+        campos.update(num_parcelas=str(parcelas), frequencia='Mensal')
+    _postar(cliente, **campos)
+    return db.session.query(func.max(Recorrencia.id)).scalar()
+
+
+def criar_recorrencia_cartao(cliente, dados, cartao_id, descricao, compra, parcelas=None, valor='600.00'):
+    """Cria uma recorrência no cartão pelo formulário, com a fatura no mês seguinte à compra"""
+    campos = {
+        'tipo_lancamento': 'CartaoCredito', 'descricao': descricao, 'valor': valor,
+        'data_vencimento': compra.isoformat(), 'subcategoria_cartao_id': str(dados.subcategorias[1]),
+        'cartao_credito_id': str(cartao_id), 'fatura_inicio_mes': str(compra.month % 12 + 1),
+        'recorrencia_tipo_cartao': 'parcelada' if parcelas else 'fixa',
+    }
+    if parcelas:
+        campos.update(num_parcelas_cartao=str(parcelas), frequencia_cartao='Mensal')
+    _postar(cliente, **campos)
+    return db.session.query(func.max(Recorrencia.id)).scalar()
+
+
+def _cadastros(dados):
+    volume = dados.volume
+    for i in range(4):
+        categoria = Categoria(nome=f'Categoria {i}', cor='#6c757d', icone='bi bi-tag')
+        db.session.add(categoria)
+        db.session.flush()
+        for j in range(3):
+            subcategoria = Subcategoria(nome=f'Subcategoria {i}.{j}', categoria_id=categoria.id)
+            db.session.add(subcategoria)
+            db.session.flush()
+            dados.subcategorias.append(subcategoria.id)
+
+    for i in range(volume.contas):
+        conta = Conta(nome=f'Conta {i}', saldo_inicial=1000)
+        db.session.add(conta)
+        db.session.flush()
+        dados.contas.append(conta.id)
+
+    for i in range(volume.cartoes):
+        cartao = CartaoCredito(nome=f'Cartão {i}', dia_vencimento=10, conta_pagamento_id=dados.contas[0])
+        db.session.add(cartao)
+        db.session.flush()
+        dados.cartoes.append(cartao.id)
+    db.session.commit()
+
+
+def _avulsos(dados, gerador):
+    """Receitas, despesas e compras únicas de cada mês, num INSERT por mês"""
+    volume = dados.volume
+    criacao = datetime(volume.ano_inicio, 1, 1)
+    hoje = date.today()
+
+    for ano in range(volume.ano_inicio, volume.ano_inicio + volume.anos):
+        for mes in range(1, 13):
+            linhas = []
+            for i in range(volume.avulsos_por_mes):
+                vencimento = date(ano, mes, gerador.randint(1, 28))
+                criacao += timedelta(minutes=1)
+                linha = {
+                    'descricao': f'Avulso {ano}-{mes:02d}.{i}',
+                    'valor': para_dinheiro(round(gerador.uniform(5, 500), 2)),
+                    'tipo': 'Receita' if i % 4 == 0 else 'Despesa',
+                    'status': 'Pago' if vencimento < hoje and i % 3 else 'Pendente',
+                    'data_vencimento': vencimento,
+                    'data_criacao': criacao,
+                    'subcategoria_id': gerador.choice(dados.subcategorias),
+                    'conta_id': None,
+                    'cartao_credito_id': None,
+                }
+                if dados.cartoes and i % 5 == 4:
+                    linha.update(tipo='Despesa', status='Pendente', cartao_credito_id=gerador.choice(dados.cartoes))
+                else:
+                    linha['conta_id'] = gerador.choice(dados.contas)
+                linhas.append(linha)
+            db.session.execute(insert(Lancamento), linhas)
+            registrar_linhas(db.session, linhas)
+            totais_faturas.registrar_lote([], linhas)
+            resumo_mensal.registrar_lote([], linhas)
+    db.session.commit()
+
+
+def _recorrencias(cliente, dados):
+    volume = dados.volume
+    inicio = date(volume.ano_inicio, 1, 5)
+    parcelas = 12 * volume.anos
+
+    for conta_id in dados.contas:
+        for i in range(volume.recorrencias_por_conta):
+            if i % 2:
+                criar_recorrencia_conta(cliente, dados, conta_id, f'Fixa {conta_id}.{i}', inicio, valor='150.00')
+            else:
+                criar_recorrencia_conta(cliente, dados, conta_id, f'Parcelada {conta_id}.{i}', inicio, parcelas)
+
+    for cartao_id in dados.cartoes:
+        for i in range(volume.recorrencias_por_conta):
+            if i % 2:
+                criar_recorrencia_cartao(cliente, dados, cartao_id, f'Assinatura {cartao_id}.{i}', inicio,
+                                         valor='39.90')
+            else:
+                criar_recorrencia_cartao(cliente, dados, cartao_id, f'Compra parcelada {cartao_id}.{i}', inicio,
+                                         parcelas)
+
+
+def gerar_dados(cliente, **volume):
+    """
+    Recria as tabelas e popula o banco. 'cliente' é o test_client da mesma
+    aplicação do app_context ativo; os argumentos nomeados são campos de Volume.
+    """
+    dados = DadosGerados(Volume(**volume))
+    gerador = random.Random(dados.volume.semente)
+
+    db.drop_all()
+    db.create_all()
+    _cadastros(dados)
+    _avulsos(dados, gerador)
+    _recorrencias(cliente, dados)
+
+    # Os avulsos pagos foram gravados sem passar pela sessão
+    saldos.reconstruir_saldos()
+    db.session.commit()
+    return dados
@@ -0,0 +1,57 @@
+# benchmarks/inicializacao.py
+"""
+Mede o custo de inicialização da aplicação: a importação de app.py, a
+primeira chamada a create_app() (que importa modelos, serviços e
+blueprints) e as chamadas seguintes, que criam instâncias isoladas com
+SQLite em memória e as tabelas, como fazem os benchmarks.
+
+Cada medição roda num processo novo, para não aproveitar módulos já
+importados.
+
+Uso: python -m benchmarks.inicializacao [processos] [instancias]
+"""
+
+import json
+import statistics
+import subprocess
+import sys
+
+CODIGO = '''
+import json, time
+inicio = time.perf_counter()
+from app import create_app
+importacao = time.perf_counter()
+from extensions import db
+config = {'SQLALCHEMY_DATABASE_URI': 'sqlite://', 'SECRET_KEY': 'benchmark'}
+create_app(config)
+primeira = time.perf_counter()
+for _ in range(%d):
+    app = create_app(config)
+    with app.app_context():
+        db.create_all()
+fim = time.perf_counter()
+print(json.dumps({
+    'importacao_ms': (importacao - inicio) * 1000,
+    'primeira_create_app_ms': (primeira - importacao) * 1000,
+    'instancia_isolada_ms': (fim - primeira) * 1000 / %d,
+}))
+'''
+
+
+def main(processos=5, instancias=20):
+    medicoes = []
+    for _ in range(processos):
+        saida = subprocess.run(
+            [sys.executable, '-c', CODIGO % (instancias, instancias)],
+            check=True, capture_output=True, text=True
+        ).stdout
+        medicoes.append(json.loads(saida.strip().splitlines()[-1]))
+
+    resultado = {'processos': processos, 'instancias_por_processo': instancias}
+    for chave in medicoes[0]:
+        resultado[chave] = round(statistics.median(m[chave] for m in medicoes), 2)
+    print(json.dumps(resultado, indent=2, ensure_ascii=False))
+
+
+if __name__ == '__main__':
+    main(*[int(a) for a in sys.argv[1:3]])
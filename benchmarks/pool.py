@@ -0,0 +1,96 @@
+# benchmarks/pool.py
+"""
+Teste de carga do pool de conexões: dispara requisições concorrentes ao
+dashboard com diferentes DB_POOL_SIZE e mostra a vazão, a latência p95 e as
+métricas de checkout do pool (espera, overflows e esgotamentos) de cada um.
+
+Cada tamanho de pool usa uma aplicação própria criada com create_app(), que
+lê as opções do pool do ambiente. O banco vem de BENCHMARK_DATABASE_URI (um
+PostgreSQL, para resultados representativos); sem ela é usado um SQLite em
+arquivo.
+
+Uso: python -m benchmarks.pool [threads] [requisicoes_por_thread]
+"""
+
+import json
+import logging
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+from app import create_app
+from extensions import db
+
+TAMANHOS_POOL = (1, 2, 5, 10)
+URL = '/dashboard?ano=2025&mes=3'
+
+
+def medir(app, threads, requisicoes):
+    cliente = app.test_client()
+    metricas_pool = app.extensions['metricas_pool']
+    cliente.get(URL)  # aquecimento
+    metricas_pool.zerar()
+
+    latencias = []
+    trava = threading.Lock()
+
+    def trabalhador():
+        for _ in range(requisicoes):
+            inicio = time.perf_counter()
+            resposta = cliente.get(URL)
+            duracao = (time.perf_counter() - inicio) * 1000
+            assert resposta.status_code == 200, resposta.status_code
+            with trava:
+                latencias.append(duracao)
+
+    inicio = time.perf_counter()
+    trabalhadores = [threading.Thread(target=trabalhador) for _ in range(threads)]
+    for t in trabalhadores:
+        t.start()
+    for t in trabalhadores:
+        t.join()
+    duracao_total = time.perf_counter() - inicio
+
+    with app.app_context():
+        pool = metricas_pool.resumo(db.engine.pool)
+
+    return {
+        'requisicoes_s': round(len(latencias) / duracao_total, 1),
+        'latencia_p50_ms': round(statistics.median(latencias), 2),
+        'latencia_p95_ms': round(statistics.quantiles(latencias, n=20)[-1], 2),
+        'pool': pool,
+    }
+
+
+def preparar_banco(uri):
+    from benchmarks.consultas import popular_banco
+
+    app = create_app({'SQLALCHEMY_DATABASE_URI': uri, 'SECRET_KEY': 'benchmark'})
+    with app.app_context():
+        popular_banco(50)
+        db.engine.dispose()
+
+
+def main(threads=8, requisicoes=25):
+    uri = os.getenv('BENCHMARK_DATABASE_URI')
+    if not uri:
+        uri = f'sqlite:///{os.path.join(tempfile.mkdtemp(), "pool.db")}'
+    logging.getLogger('sistema_financeiro.sql').disabled = True
+    preparar_banco(uri)
+
+    resultado = {'threads': threads, 'requisicoes_por_thread': requisicoes, 'pools': {}}
+    for tamanho in TAMANHOS_POOL:
+        os.environ.update(DB_POOL_SIZE=str(tamanho), DB_MAX_OVERFLOW='0', DB_POOL_TIMEOUT='30')
+        app = create_app({'SQLALCHEMY_DATABASE_URI': uri, 'SECRET_KEY': 'benchmark'})
+        resultado['pools'][tamanho] = medir(app, threads, requisicoes)
+        with app.app_context():
+            db.engine.dispose()
+
+    print(json.dumps(resultado, indent=2, ensure_ascii=False))
+
+
+if __name__ == '__main__':
+    main(*[int(a) for a in sys.argv[1:3]])
@@ -0,0 +1,118 @@
+# benchmarks/recorrencias.py
+"""
+Mede a latência do POST em /lancamentos para cada tipo de recorrência,
+junto com o tempo gasto em SQL e a quantidade de comandos executados, e
+falha se uma parcelada passar do limite de comandos.
+
+Uso: python -m benchmarks.recorrencias [repeticoes]
+"""
+
+import json
+import statistics
+import sys
+import time
+
+from sqlalchemy import event
+
+from app import create_app
+from extensions import db
+from models import Categoria, Subcategoria, Conta, CartaoCredito
+
+app = create_app({'SQLALCHEMY_DATABASE_URI': 'sqlite://', 'SECRET_KEY': 'benchmark'})
+
+CENARIOS = {
+    'conta_fixa': {'tipo_lancamento': 'Despesa', 'recorrencia_tipo': 'fixa'},
+    'conta_anual': {'tipo_lancamento': 'Despesa', 'recorrencia_tipo': 'anual'},
+    'conta_semanal': {'tipo_lancamento': 'Despesa', 'recorrencia_tipo': 'semanal'},
+    'conta_quinzenal': {'tipo_lancamento': 'Despesa', 'recorrencia_tipo': 'quinzenal'},
+    'conta_parcelada_24x': {'tipo_lancamento': 'Despesa', 'recorrencia_tipo': 'parcelada',
+                            'num_parcelas': '24', 'frequencia': 'Mensal'},
+    'cartao_fixa': {'tipo_lancamento': 'CartaoCredito', 'recorrencia_tipo_cartao': 'fixa'},
+    'cartao_semanal': {'tipo_lancamento': 'CartaoCredito', 'recorrencia_tipo_cartao': 'semanal'},
+    'cartao_parcelada_24x': {'tipo_lancamento': 'CartaoCredito', 'recorrencia_tipo_cartao': 'parcelada',
+                             'num_parcelas_cartao': '24', 'frequencia_cartao': 'Mensal'},
+}
+
+# cenário -> número máximo de comandos SQL do POST. As parcelas são gravadas
+# com um INSERT e os totais (versões dos meses, resumo_mensal e faturas) com
+# um upsert cada, qualquer que seja o número de parcelas
+LIMITES = {
+    'conta_parcelada_24x': 4,
+    'cartao_parcelada_24x': 5,
+}
+
+FORMULARIO_BASE = {
+    'descricao': 'Benchmark',
+    'valor': '123.45',
+    'data_vencimento': '2025-01-10',
+    'subcategoria_id': '1',
+    'conta_id': '1',
+    'subcategoria_cartao_id': '1',
+    'cartao_credito_id': '1',
+    'fatura_inicio_mes': '2',
+}
+
+
+def preparar_banco():
+    db.create_all()
+    categoria = Categoria(nome='Benchmark')
+    db.session.add(categoria)
+    db.session.flush()
+    db.session.add(Subcategoria(nome='Benchmark', categoria_id=categoria.id))
+    db.session.add(Conta(nome='Conta Benchmark', saldo_inicial=0.0))
+    db.session.flush()
+    db.session.add(CartaoCredito(nome='Cartão Benchmark', dia_vencimento=10, conta_pagamento_id=1))
+    db.session.commit()
+
+
+def main(repeticoes=30):
+    medicao = {'comandos': 0, 'tempo_sql': 0.0}
+
+    with app.app_context():
+        preparar_banco()
+
+        @event.listens_for(db.engine, 'before_cursor_execute')
+        def _antes(conn, cursor, statement, parameters, context, executemany):
+            conn.info['inicio_sql'] = time.perf_counter()
+
+        @event.listens_for(db.engine, 'after_cursor_execute')
+        def _depois(conn, cursor, statement, parameters, context, executemany):
+            medicao['comandos'] += 1
+            medicao['tempo_sql'] += time.perf_counter() - conn.info.pop('inicio_sql')
+
+    cliente = app.test_client()
+    resultado = {}
+
+    for nome, campos in CENARIOS.items():
+        latencias, tempos_sql, comandos = [], [], []
+        for _ in range(repeticoes):
+            medicao.update(comandos=0, tempo_sql=0.0)
+            inicio = time.perf_counter()
+            resposta = cliente.post('/lancamentos', data={**FORMULARIO_BASE, **campos})
+            latencias.append((time.perf_counter() - inicio) * 1000)
+            assert resposta.status_code == 302, resposta.status_code
+            tempos_sql.append(medicao['tempo_sql'] * 1000)
+            comandos.append(medicao['comandos'])
+
+        resultado[nome] = {
+            'post_ms_p50': round(statistics.median(latencias), 2),
+            'sql_ms_p50': round(statistics.median(tempos_sql), 2),
+            'comandos_sql': int(statistics.median(comandos)),
+        }
+
+    print(json.dumps(resultado, indent=2, ensure_ascii=False))
+
+    falhas = [
+        f'{nome}: {resultado[nome]["comandos_sql"]} comandos (limite {limite})'
+        for nome, limite in LIMITES.items()
+        if resultado[nome]['comandos_sql'] > limite
+    ]
+    for falha in falhas:
+        print(f'[ERRO] {falha}')
+    if falhas:
+        sys.exit(1)
+    print('[SUCESSO] Parceladas dentro do limite de comandos.')
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 30)
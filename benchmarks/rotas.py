@@ -0,0 +1,188 @@
+# benchmarks/rotas.py
+"""
+Benchmark das rotas mais usadas sobre uma base sintética (benchmarks.gerador):
+dashboard, extrato do cartão, GET de /lancamentos e os caminhos de edição e
+exclusão de 'este e futuros' lançamentos de uma recorrência. Para cada cenário
+mostra a latência p50/p95 e a quantidade de comandos SQL por requisição, em
+JSON, para comparar execuções (--saida grava o resultado num arquivo).
+
+Os cenários de escrita recebem, a cada repetição, uma parcelada nova criada
+pelo formulário (fora da medição) e alteram a partir da parcela do meio.
+
+O banco vem de --banco ou BENCHMARK_DATABASE_URI (um PostgreSQL local dá
+resultados representativos); sem eles é usado SQLite em memória.
+
+Uso: python -m benchmarks.rotas [--contas N] [--cartoes M] [--anos K] [--repeticoes R] [--saida arquivo.json]
+"""
+
+import argparse
+import json
+import logging
+import os
+import statistics
+import time
+from datetime import date
+
+from sqlalchemy import event
+
+from app import create_app
+from extensions import db
+from models import Lancamento, Recorrencia
+from benchmarks.gerador import criar_recorrencia_cartao, criar_recorrencia_conta, gerar_dados
+
+
+def _parcela_do_meio(recorrencia_id):
+    recorrencia = db.session.get(Recorrencia, recorrencia_id)
+    lancamento = Lancamento.query.filter_by(
+        recorrencia_id=recorrencia_id, numero_parcela=recorrencia.total_parcelas // 2
+    ).one()
+    return lancamento
+
+
+def _formulario_edicao(lancamento, **campos):
+    dados = {
+        'tipo_edicao': 'futuros',
+        'lancamento_id': str(lancamento.id),
+        'recorrencia_id': str(lancamento.recorrencia_id),
+        'descricao': 'Editada',
+        'valor': '99.90',
+        'subcategoria_id': str(lancamento.subcategoria_id),
+        'data_inicio': lancamento.data_vencimento.isoformat(),
+    }
+    dados.update(campos)
+    return dados
+
+
+def _formulario_exclusao(lancamento, tipo='futuros'):
+    return {
+        'tipo_exclusao': tipo,
+        'lancamento_id': str(lancamento.id),
+        'recorrencia_id': str(lancamento.recorrencia_id),
+    }
+
+
+def cenarios(cliente, dados):
+    """nome -> função que prepara a requisição e retorna (método, url, formulário)"""
+    ano, mes = dados.mes_central
+    conta_id, cartao_id = dados.contas[0], dados.cartoes[0]
+    inicio = date(dados.volume.ano_inicio, 1, 5)
+    parcelas = 12 * dados.volume.anos
+
+    def parcelada_conta():
+        return _parcela_do_meio(criar_recorrencia_conta(cliente, dados, conta_id, 'Benchmark', inicio, parcelas))
+
+    def parcelada_cartao():
+        return _parcela_do_meio(criar_recorrencia_cartao(cliente, dados, cartao_id, 'Benchmark', inicio, parcelas))
+
+    def editar_dashboard():
+        lancamento = parcelada_conta()
+        return 'post', '/dashboard/editar_lancamento', _formulario_edicao(lancamento, conta_id=str(conta_id))
+
+    def excluir_dashboard():
+        return 'post', '/dashboard/excluir_lancamento', _formulario_exclusao(parcelada_conta())
+
+    def editar_cartao():
+        lancamento = parcelada_cartao()
+        return 'post', '/cartoes/editar_lancamento', _formulario_edicao(lancamento, cartao_id=str(cartao_id))
+
+    def excluir_cartao():
+        return 'post', '/cartoes/excluir_lancamento', _formulario_exclusao(parcelada_cartao())
+
+    def deletar_lancamento():
+        return 'post', '/lancamentos/deletar', _formulario_exclusao(parcelada_conta(), 'futuros_recorrencia')
+
+    def editar_recorrencia():
+        lancamento = parcelada_conta()
+        formulario = _formulario_edicao(lancamento, conta_id=str(conta_id))
+        return 'post', f'/lancamentos/editar_recorrencia/{lancamento.recorrencia_id}', formulario
+
+    return {
+        'dashboard': lambda: ('get', f'/dashboard?ano={ano}&mes={mes}', None),
+        'extrato_cartao': lambda: ('get', f'/cartoes/extrato?cartao_id={cartao_id}&ano={ano}&mes={mes}', None),
+        'gerenciar_lancamentos': lambda: ('get', '/lancamentos', None),
+        'editar_futuros_dashboard': editar_dashboard,
+        'excluir_futuros_dashboard': excluir_dashboard,
+        'editar_futuros_cartao': editar_cartao,
+        'excluir_futuros_cartao': excluir_cartao,
+        'deletar_futuros_lancamentos': deletar_lancamento,
+        'editar_recorrencia_futuros': editar_recorrencia,
+    }
+
+
+def medir(cliente, preparar, repeticoes, contador):
+    latencias, comandos = [], []
+    metodo, url, _ = preparar()
+    if metodo == 'get':
+        cliente.get(url)  # aquecimento: compilação dos templates
+    for _ in range(repeticoes):
+        metodo, url, formulario = preparar()
+        contador['comandos'] = 0
+        inicio = time.perf_counter()
+        resposta = getattr(cliente, metodo)(url, data=formulario)
+        latencias.append((time.perf_counter() - inicio) * 1000)
+        comandos.append(contador['comandos'])
+        assert resposta.status_code < 400, (url, resposta.status_code)
+
+    return {
+        'latencia_p50_ms': round(statistics.median(latencias), 2),
+        'latencia_p95_ms': round(statistics.quantiles(latencias, n=20)[-1], 2),
+        'consultas_p50': statistics.median(comandos),
+        'consultas_max': max(comandos),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Latência e consultas SQL das rotas principais')
+    parser.add_argument('--banco', default=os.getenv('BENCHMARK_DATABASE_URI', 'sqlite://'))
+    parser.add_argument('--contas', type=int, default=3)
+    parser.add_argument('--cartoes', type=int, default=2)
+    parser.add_argument('--anos', type=int, default=2)
+    parser.add_argument('--avulsos-por-mes', type=int, default=20)
+    parser.add_argument('--recorrencias-por-conta', type=int, default=4)
+    parser.add_argument('--repeticoes', type=int, default=20)
+    parser.add_argument('--saida', help='arquivo onde gravar o JSON do resultado')
+    argumentos = parser.parse_args()
+
+    logging.getLogger('sistema_financeiro.sql').disabled = True
+    app = create_app({'SQLALCHEMY_DATABASE_URI': argumentos.banco, 'SECRET_KEY': 'benchmark'})
+    cliente = app.test_client()
+    contador = {'comandos': 0}
+
+    def _contar(conn, cursor, statement, parameters, context, executemany):
+        contador['comandos'] += 1
+
+    with app.app_context():
+        inicio = time.perf_counter()
+        dados = gerar_dados(
+            cliente, contas=argumentos.contas, cartoes=argumentos.cartoes, anos=argumentos.anos,
+            avulsos_por_mes=argumentos.avulsos_por_mes, recorrencias_por_conta=argumentos.recorrencias_por_conta
+        )
+        geracao_s = time.perf_counter() - inicio
+        lancamentos = Lancamento.query.count()
+
+        event.listen(db.engine, 'after_cursor_execute', _contar)
+        try:
+            resultados = {
+                nome: medir(cliente, preparar, argumentos.repeticoes, contador)
+                for nome, preparar in cenarios(cliente, dados).items()
+            }
+        finally:
+            event.remove(db.engine, 'after_cursor_execute', _contar)
+
+    resultado = {
+        'banco': argumentos.banco.split(':', 1)[0],
+        'volume': vars(dados.volume),
+        'lancamentos': lancamentos,
+        'geracao_s': round(geracao_s, 2),
+        'repeticoes': argumentos.repeticoes,
+        'cenarios': resultados,
+    }
+    saida = json.dumps(resultado, indent=2, ensure_ascii=False)
+    print(saida)
+    if argumentos.saida:
+        with open(argumentos.saida, 'w', encoding='utf-8') as arquivo:
+            arquivo.write(saida + '\n')
+
+
+if __name__ == '__main__':
+    main()
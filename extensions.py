@@ -0,0 +1,11 @@
+# extensions.py
+#
+# Extensões criadas sem aplicação e ligadas a ela em create_app() com
+# init_app(). Modelos, serviços e blueprints importam o 'db' daqui, e não de
+# app.py, para não haver importação circular.
+
+from flask_migrate import Migrate
+from flask_sqlalchemy import SQLAlchemy
+
+db = SQLAlchemy()
+migrate = Migrate()
@@ -0,0 +1,28 @@
+"""Adiciona indices compostos por conta/cartao e data de vencimento
+
+Revision ID: 4b7e2f9a1c3d
+Revises: dbe66e974136
+Create Date: 2025-08-02 15:41:08.226417
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '4b7e2f9a1c3d'
+down_revision = 'dbe66e974136'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('lancamentos', schema=None) as batch_op:
+        batch_op.create_index('ix_lancamentos_conta_id_data_vencimento', ['conta_id', 'data_vencimento'], unique=False)
+        batch_op.create_index('ix_lancamentos_cartao_credito_id_data_vencimento', ['cartao_credito_id', 'data_vencimento'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('lancamentos', schema=None) as batch_op:
+        batch_op.drop_index('ix_lancamentos_cartao_credito_id_data_vencimento')
+        batch_op.drop_index('ix_lancamentos_conta_id_data_vencimento')
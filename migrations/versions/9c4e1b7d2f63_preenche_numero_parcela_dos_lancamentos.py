@@ -0,0 +1,41 @@
+"""Preenche numero_parcela dos lancamentos de recorrencias
+
+Revision ID: 9c4e1b7d2f63
+Revises: 7a1d3c5e9b20
+Create Date: 2025-08-03 16:27:05.914820
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9c4e1b7d2f63'
+down_revision = '7a1d3c5e9b20'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Numera os lançamentos já existentes pela ordem de vencimento dentro da recorrência
+    op.execute("""
+        UPDATE lancamentos
+        SET numero_parcela = numerados.numero
+        FROM (
+            SELECT id, row_number() OVER (
+                PARTITION BY recorrencia_id ORDER BY data_vencimento, id
+            ) AS numero
+            FROM lancamentos
+            WHERE recorrencia_id IS NOT NULL
+        ) AS numerados
+        WHERE lancamentos.id = numerados.id
+          AND lancamentos.numero_parcela IS NULL
+    """)
+
+    with op.batch_alter_table('lancamentos', schema=None) as batch_op:
+        batch_op.create_index('ix_lancamentos_recorrencia_id_numero_parcela', ['recorrencia_id', 'numero_parcela'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('lancamentos', schema=None) as batch_op:
+        batch_op.drop_index('ix_lancamentos_recorrencia_id_numero_parcela')
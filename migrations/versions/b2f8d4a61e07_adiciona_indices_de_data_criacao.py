@@ -0,0 +1,38 @@
+"""Adiciona indices de data_criacao para a paginacao dos lancamentos
+
+Revision ID: b2f8d4a61e07
+Revises: 9c4e1b7d2f63
+Create Date: 2025-08-04 09:05:33.402117
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b2f8d4a61e07'
+down_revision = '9c4e1b7d2f63'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('lancamentos', schema=None) as batch_op:
+        batch_op.create_index('ix_lancamentos_data_criacao_id', ['data_criacao', 'id'], unique=False)
+
+    with op.batch_alter_table('recorrencias', schema=None) as batch_op:
+        batch_op.create_index('ix_recorrencias_data_criacao_id', ['data_criacao', 'id'], unique=False)
+
+    with op.batch_alter_table('transferencia_grupos', schema=None) as batch_op:
+        batch_op.create_index('ix_transferencia_grupos_data_criacao_id', ['data_criacao', 'id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('transferencia_grupos', schema=None) as batch_op:
+        batch_op.drop_index('ix_transferencia_grupos_data_criacao_id')
+
+    with op.batch_alter_table('recorrencias', schema=None) as batch_op:
+        batch_op.drop_index('ix_recorrencias_data_criacao_id')
+
+    with op.batch_alter_table('lancamentos', schema=None) as batch_op:
+        batch_op.drop_index('ix_lancamentos_data_criacao_id')
@@ -0,0 +1,63 @@
+"""Converte os valores monetarios de Float para Numeric(12,2)
+
+Revision ID: d4e7a2c9b831
+Revises: b2f8d4a61e07
+Create Date: 2025-08-06 10:12:47.519204
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = 'd4e7a2c9b831'
+down_revision = 'b2f8d4a61e07'
+branch_labels = None
+depends_on = None
+
+# tabela -> colunas monetárias (nome, nullable)
+COLUNAS = {
+    'lancamentos': [('valor', False)],
+    'recorrencias': [('valor', True)],
+    'contas': [('saldo_inicial', False)],
+    'saldos_conta': [('total_receitas', False), ('total_despesas', False)],
+}
+
+
+def upgrade():
+    for tabela, colunas in COLUNAS.items():
+        with op.batch_alter_table(tabela, schema=None) as batch_op:
+            for coluna, nullable in colunas:
+                batch_op.alter_column(coluna,
+                       existing_type=postgresql.DOUBLE_PRECISION(precision=53),
+                       type_=sa.Numeric(precision=12, scale=2),
+                       existing_nullable=nullable,
+                       postgresql_using=f'round({coluna}::numeric, 2)')
+
+    # Recalcula os totais materializados a partir dos valores já arredondados,
+    # para que saldos_conta seja exatamente a soma dos lançamentos pagos
+    op.execute("""
+        UPDATE saldos_conta SET
+            total_receitas = COALESCE(t.receitas, 0),
+            total_despesas = COALESCE(t.despesas, 0)
+        FROM (
+            SELECT conta_id,
+                   SUM(CASE WHEN tipo = 'Receita' THEN valor ELSE 0 END) AS receitas,
+                   SUM(CASE WHEN tipo = 'Despesa' THEN valor ELSE 0 END) AS despesas
+            FROM lancamentos
+            WHERE conta_id IS NOT NULL AND status = 'Pago'
+            GROUP BY conta_id
+        ) AS t
+        WHERE t.conta_id = saldos_conta.conta_id
+    """)
+
+
+def downgrade():
+    for tabela, colunas in COLUNAS.items():
+        with op.batch_alter_table(tabela, schema=None) as batch_op:
+            for coluna, nullable in colunas:
+                batch_op.alter_column(coluna,
+                       existing_type=sa.Numeric(precision=12, scale=2),
+                       type_=postgresql.DOUBLE_PRECISION(precision=53),
+                       existing_nullable=nullable)
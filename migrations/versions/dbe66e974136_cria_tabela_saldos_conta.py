@@ -0,0 +1,42 @@
+"""Cria tabela saldos_conta com os totais materializados por conta
+
+Revision ID: dbe66e974136
+Revises: c27d14e8afe9
+Create Date: 2025-08-02 10:14:27.512903
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'dbe66e974136'
+down_revision = 'c27d14e8afe9'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('saldos_conta',
+    sa.Column('conta_id', sa.Integer(), nullable=False),
+    sa.Column('total_receitas', sa.Float(), nullable=False),
+    sa.Column('total_despesas', sa.Float(), nullable=False),
+    sa.Column('data_atualizacao', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+    sa.ForeignKeyConstraint(['conta_id'], ['contas.id'], ),
+    sa.PrimaryKeyConstraint('conta_id')
+    )
+
+    # Popula a tabela com os totais atuais dos lançamentos pagos
+    op.execute("""
+        INSERT INTO saldos_conta (conta_id, total_receitas, total_despesas)
+        SELECT conta_id,
+               COALESCE(SUM(CASE WHEN tipo = 'Receita' THEN valor ELSE 0 END), 0),
+               COALESCE(SUM(CASE WHEN tipo = 'Despesa' THEN valor ELSE 0 END), 0)
+        FROM lancamentos
+        WHERE conta_id IS NOT NULL AND status = 'Pago'
+        GROUP BY conta_id
+    """)
+
+
+def downgrade():
+    op.drop_table('saldos_conta')
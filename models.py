@@ -1,9 +1,13 @@
 # models.py
 
-from app import db
+from extensions import db
 from datetime import datetime
+import sqlalchemy as sa
 from sqlalchemy.sql import func
 
+# Valores monetários: NUMERIC(12,2) no banco e Decimal no Python (ver app_services/dinheiro.py)
+Dinheiro = db.Numeric(12, 2)
+
 class Categoria(db.Model):
     __tablename__ = 'categorias'
     id = db.Column(db.Integer, primary_key=True)
@@ -24,33 +28,49 @@ class Subcategoria(db.Model):
     def __repr__(self):
         return f'<Subcategoria {self.nome}>'
 
+class RegraCategorizacao(db.Model):
+    """Lançamentos cuja descrição contém 'padrao' vão para a subcategoria (ver app_services/categorizacao.py)"""
+    __tablename__ = 'regras_categorizacao'
+    id = db.Column(db.Integer, primary_key=True)
+    padrao = db.Column(db.String(100), nullable=False)
+    subcategoria_id = db.Column(db.Integer, db.ForeignKey('subcategorias.id'), nullable=False)
+    # Entre regras que casam com a mesma descrição vence a de maior prioridade
+    prioridade = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    data_atualizacao = db.Column(db.DateTime(timezone=True), nullable=False, server_default=func.now(), onupdate=func.now())
+
+    subcategoria = db.relationship('Subcategoria', backref=db.backref('regras', lazy=True, cascade='all, delete-orphan'))
+
+    def __repr__(self):
+        return f'<RegraCategorizacao {self.padrao} -> {self.subcategoria_id}>'
+
 class Conta(db.Model):
     __tablename__ = 'contas'
     id = db.Column(db.Integer, primary_key=True)
     nome = db.Column(db.String(50), unique=True, nullable=False)
     tipo_conta = db.Column(db.String(20), nullable=False, default='Corrente')
     tipo_investimento = db.Column(db.String(50), nullable=True)
-    saldo_inicial = db.Column(db.Float, nullable=False, default=0.0)
+    saldo_inicial = db.Column(Dinheiro, nullable=False, default=0)
     logo_imagem = db.Column(db.String(100), nullable=True)
 
     @property
     def saldo_atual(self):
-        total_receitas = db.session.query(func.sum(Lancamento.valor)).filter(
-            Lancamento.conta_id == self.id,
-            Lancamento.tipo == 'Receita',
-            Lancamento.status == 'Pago'
-        ).scalar() or 0.0
+        from app_services.saldos import saldo_conta
+        return saldo_conta(self.id)
+
+    def __repr__(self):
+        return f'<Conta {self.nome}>'
 
-        total_despesas = db.session.query(func.sum(Lancamento.valor)).filter(
-            Lancamento.conta_id == self.id,
-            Lancamento.tipo == 'Despesa',
-            Lancamento.status == 'Pago'
-        ).scalar() or 0.0
+class SaldoConta(db.Model):
+    __tablename__ = 'saldos_conta'
+    conta_id = db.Column(db.Integer, db.ForeignKey('contas.id'), primary_key=True)
+    total_receitas = db.Column(Dinheiro, nullable=False, default=0)
+    total_despesas = db.Column(Dinheiro, nullable=False, default=0)
+    data_atualizacao = db.Column(db.DateTime(timezone=True), nullable=False, server_default=func.now(), onupdate=func.now())
 
-        return self.saldo_inicial + total_receitas - total_despesas
+    conta = db.relationship('Conta', backref=db.backref('saldo', lazy=True, uselist=False))
 
     def __repr__(self):
-        return f'<Conta {self.nome}>'
+        return f'<SaldoConta {self.conta_id}>'
 
 class CartaoCredito(db.Model):
     __tablename__ = 'cartoes_credito'
@@ -65,12 +85,13 @@ class CartaoCredito(db.Model):
     conta_pagamento = db.relationship('Conta', backref=db.backref('cartoes_credito', lazy=True))
 
     def total_gastos_mes(self, ano, mes):
-        total = db.session.query(func.sum(Lancamento.valor)).filter(
-            Lancamento.cartao_credito_id == self.id,
-            Lancamento.tipo == 'Despesa',
-            func.extract('year', Lancamento.data_vencimento) == ano,
-            func.extract('month', Lancamento.data_vencimento) == mes
-        ).scalar() or 0.0
+        from app_services.dinheiro import ZERO
+        total = db.session.query(func.sum(ResumoMensal.valor_total)).filter(
+            ResumoMensal.cartao_id == self.id,
+            ResumoMensal.tipo == 'Despesa',
+            ResumoMensal.ano == ano,
+            ResumoMensal.mes == mes
+        ).scalar() or ZERO
         return total
 
     def fatura_paga_mes(self, ano, mes):
@@ -107,13 +128,137 @@ class Recorrencia(db.Model):
     total_parcelas = db.Column(db.Integer, nullable=True)
     frequencia = db.Column(db.String(20), nullable=False, default='Mensal')
     data_criacao = db.Column(db.DateTime(timezone=True), nullable=False, server_default=func.now())
+
+    # Regra das recorrências virtuais: as ocorrências são calculadas sob demanda
+    # e só são gravadas em lancamentos quando pagas, editadas ou excluídas
+    virtual = db.Column(db.Boolean, nullable=False, default=False, server_default=sa.false())
+    tipo_lancamento = db.Column(db.String(15), nullable=True)
+    valor = db.Column(Dinheiro, nullable=True)
+    data_inicio = db.Column(db.Date, nullable=True)
+    conta_id = db.Column(db.Integer, db.ForeignKey('contas.id'), nullable=True)
+    cartao_credito_id = db.Column(db.Integer, db.ForeignKey('cartoes_credito.id'), nullable=True)
+    subcategoria_id = db.Column(db.Integer, db.ForeignKey('subcategorias.id'), nullable=True)
+    # Regras divididas por uma alteração de 'este e futuros' seguem com as
+    # mesmas datas e números de parcela, a partir deste número
+    primeira_parcela = db.Column(db.Integer, nullable=False, default=1, server_default='1')
+    # Vencimento da última ocorrência da regra (None se não restar nenhuma),
+    # mantido na gravação por app_services/recorrencias.py
+    data_fim = db.Column(db.Date, nullable=True)
+    # Partes criadas ao dividir a regra apontam para a primeira, a de origem;
+    # as operações de 'este e futuros' e a listagem tratam o grupo como uma só
+    recorrencia_origem_id = db.Column(db.Integer, db.ForeignKey('recorrencias.id'), nullable=True)
+
     lancamentos = db.relationship('Lancamento', backref='recorrencia', lazy=True, cascade="all, delete-orphan")
+    excecoes = db.relationship('RecorrenciaExcecao', backref='recorrencia', lazy=True, cascade="all, delete-orphan")
+    partes = db.relationship('Recorrencia', lazy=True, cascade="all, delete-orphan")
+    conta = db.relationship('Conta')
+    cartao_credito = db.relationship('CartaoCredito')
+    subcategoria = db.relationship('Subcategoria')
+
+    __table_args__ = (
+        db.Index('ix_recorrencias_data_criacao_id', 'data_criacao', 'id'),
+        db.Index('ix_recorrencias_data_fim', 'data_fim'),
+        db.Index('ix_recorrencias_recorrencia_origem_id', 'recorrencia_origem_id'),
+    )
+
+    def data_ocorrencia(self, numero):
+        from app_services.recorrencias import calcular_vencimento
+        return calcular_vencimento(self.data_inicio, self.frequencia, numero - 1)
+
+    def ocorrencias(self):
+        """Lançamentos gravados e, se a recorrência for virtual, as ocorrências calculadas"""
+        ocorrencias = list(self.lancamentos)
+        if self.virtual:
+            ocupados = {l.numero_parcela for l in self.lancamentos} | {e.numero_parcela for e in self.excecoes}
+            ocorrencias += [
+                OcorrenciaVirtual(self, numero)
+                for numero in range(self.primeira_parcela, (self.total_parcelas or 0) + 1)
+                if numero not in ocupados
+            ]
+        return sorted(ocorrencias, key=lambda o: o.data_vencimento)
+
+    @property
+    def primeira_ocorrencia(self):
+        ocorrencias = self.ocorrencias()
+        return ocorrencias[0] if ocorrencias else None
+
+    @property
+    def valor_total(self):
+        return sum(o.valor for o in self.ocorrencias())
+
+class RecorrenciaExcecao(db.Model):
+    __tablename__ = 'recorrencias_excecoes'
+    id = db.Column(db.Integer, primary_key=True)
+    recorrencia_id = db.Column(db.Integer, db.ForeignKey('recorrencias.id'), nullable=False)
+    numero_parcela = db.Column(db.Integer, nullable=False)
+
+    __table_args__ = (db.UniqueConstraint('recorrencia_id', 'numero_parcela', name='unique_excecao_recorrencia'),)
+
+class OcorrenciaVirtual:
+    """Ocorrência de uma recorrência virtual que ainda não foi gravada em lancamentos"""
+    status = 'Pendente'
+    data_pagamento = None
+    transferencia_grupo_id = None
+    virtual = True
+
+    def __init__(self, recorrencia, numero):
+        self.recorrencia = recorrencia
+        self.recorrencia_id = recorrencia.id
+        self.numero_parcela = numero
+        self.id = f'v{recorrencia.id}-{numero}'
+        self.descricao = recorrencia.descricao_base
+        self.valor = recorrencia.valor
+        self.tipo = recorrencia.tipo_lancamento
+        self.data_vencimento = recorrencia.data_ocorrencia(numero)
+        self.conta_id = recorrencia.conta_id
+        self.cartao_credito_id = recorrencia.cartao_credito_id
+        self.subcategoria_id = recorrencia.subcategoria_id
+
+    @property
+    def conta(self):
+        return self.recorrencia.conta
+
+    @property
+    def cartao_credito(self):
+        return self.recorrencia.cartao_credito
+
+    @property
+    def subcategoria(self):
+        return self.recorrencia.subcategoria
+
+    @property
+    def origem_destino(self):
+        if self.conta_id:
+            return self.conta.nome
+        elif self.cartao_credito_id:
+            return self.cartao_credito.nome
+        return "N/A"
+
+    def como_linha(self):
+        """Valores para gravar a ocorrência em lancamentos"""
+        return {
+            'descricao': self.descricao,
+            'valor': self.valor,
+            'tipo': self.tipo,
+            'status': self.status,
+            'data_vencimento': self.data_vencimento,
+            'subcategoria_id': self.subcategoria_id,
+            'conta_id': self.conta_id,
+            'cartao_credito_id': self.cartao_credito_id,
+            'recorrencia_id': self.recorrencia_id,
+            'numero_parcela': self.numero_parcela,
+        }
+
+    def __repr__(self):
+        return f'<OcorrenciaVirtual {self.id} {self.data_vencimento}>'
 
 class TransferenciaGrupo(db.Model):
     __tablename__ = 'transferencia_grupos'
     id = db.Column(db.Integer, primary_key=True)
     data_criacao = db.Column(db.DateTime(timezone=True), nullable=False, server_default=func.now())
 
+    __table_args__ = (db.Index('ix_transferencia_grupos_data_criacao_id', 'data_criacao', 'id'),)
+
 class FaturaCartao(db.Model):
     __tablename__ = 'faturas_cartao'
     id = db.Column(db.Integer, primary_key=True)
@@ -123,40 +268,108 @@ class FaturaCartao(db.Model):
     paga = db.Column(db.Boolean, nullable=False, default=False)
     data_pagamento = db.Column(db.Date, nullable=True)
     data_criacao = db.Column(db.DateTime(timezone=True), nullable=False, server_default=func.now())
+
+    # Totais dos lançamentos gravados do cartão no mês, mantidos a cada escrita
+    # por app_services/totais_faturas.py (as ocorrências virtuais são somadas na leitura)
+    valor_total = db.Column(Dinheiro, nullable=False, default=0, server_default='0')
+    qtd_lancamentos = db.Column(db.Integer, nullable=False, default=0, server_default='0')
     
     cartao = db.relationship('CartaoCredito', backref=db.backref('faturas', lazy=True))
     
     __table_args__ = (db.UniqueConstraint('cartao_id', 'ano', 'mes', name='unique_fatura_mes'),)
 
+class ResumoMensal(db.Model):
+    """Soma e quantidade dos lançamentos gravados por mês, conta/cartão, subcategoria, tipo e status (ver app_services/resumo_mensal.py)"""
+    __tablename__ = 'resumo_mensal'
+    id = db.Column(db.Integer, primary_key=True)
+    ano = db.Column(db.Integer, nullable=False)
+    mes = db.Column(db.Integer, nullable=False)
+    # Sem chaves estrangeiras: a tabela é derivada dos lançamentos e não deve
+    # impedir a exclusão de contas, cartões ou subcategorias. A ausência é
+    # gravada como 0, e não NULL, para que a chave seja única (NULL nunca
+    # conflita) e receba as variações com um único upsert
+    conta_id = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    cartao_id = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    subcategoria_id = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    tipo = db.Column(db.String(15), nullable=False)
+    status = db.Column(db.String(10), nullable=False)
+    # 'lancamento', 'transferencia' ou 'fatura' (pagamentos 'Fatura ...'), para
+    # que os relatórios de gastos possam deixar de fora os dois últimos
+    origem = db.Column(db.String(15), nullable=False)
+    valor_total = db.Column(Dinheiro, nullable=False, default=0, server_default='0')
+    qtd_lancamentos = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+
+    __table_args__ = (
+        db.Index('ix_resumo_mensal_ano_mes', 'ano', 'mes'),
+        db.UniqueConstraint('ano', 'mes', 'conta_id', 'cartao_id', 'subcategoria_id', 'tipo', 'status', 'origem',
+                            name='unique_resumo_mensal_chave'),
+    )
+
+    def __repr__(self):
+        return f'<ResumoMensal {self.mes:02d}/{self.ano} {self.tipo} {self.status}>'
+
+class VersaoMes(db.Model):
+    """Versão dos dados de cada mês, sorteada de novo a cada escrita (ver app_services/cache.py)"""
+    __tablename__ = 'versoes_mes'
+    # ano = mes = 0 é a versão geral, trocada quando muda algo que aparece em todos os meses
+    ano = db.Column(db.Integer, primary_key=True)
+    mes = db.Column(db.Integer, primary_key=True)
+    versao = db.Column(db.String(12), nullable=False)
+
+    def __repr__(self):
+        return f'<VersaoMes {self.mes:02d}/{self.ano} {self.versao}>'
+
+def _com_historico(coluna):
+    """
+    Coluna que carrega o valor gravado antes de aceitar um novo, mesmo que
+    tenha expirado: os saldos, totais de faturas e o resumo_mensal subtraem
+    esse valor anterior no flush.
+    """
+    return db.column_property(coluna, active_history=True)
+
+
 class Lancamento(db.Model):
     __tablename__ = 'lancamentos'
     id = db.Column(db.Integer, primary_key=True)
-    descricao = db.Column(db.String(100), nullable=False)
-    valor = db.Column(db.Float, nullable=False)
-    tipo = db.Column(db.String(15), nullable=False)
-    data_vencimento = db.Column(db.Date, nullable=False)
+    descricao = _com_historico(db.Column(db.String(100), nullable=False))
+    valor = _com_historico(db.Column(Dinheiro, nullable=False))
+    tipo = _com_historico(db.Column(db.String(15), nullable=False))
+    data_vencimento = _com_historico(db.Column(db.Date, nullable=False))
     data_pagamento = db.Column(db.Date, nullable=True)
-    status = db.Column(db.String(10), nullable=False, default='Pendente')
+    status = _com_historico(db.Column(db.String(10), nullable=False, default='Pendente'))
     data_criacao = db.Column(db.DateTime(timezone=True), nullable=False, server_default=func.now())
     
     recorrencia_id = db.Column(db.Integer, db.ForeignKey('recorrencias.id'), nullable=True)
-    conta_id = db.Column(db.Integer, db.ForeignKey('contas.id'), nullable=True)
-    subcategoria_id = db.Column(db.Integer, db.ForeignKey('subcategorias.id'), nullable=True) 
-    transferencia_grupo_id = db.Column(db.Integer, db.ForeignKey('transferencia_grupos.id'), nullable=True)
-    cartao_credito_id = db.Column(db.Integer, db.ForeignKey('cartoes_credito.id'), nullable=True)
+    conta_id = _com_historico(db.Column(db.Integer, db.ForeignKey('contas.id'), nullable=True))
+    subcategoria_id = _com_historico(db.Column(db.Integer, db.ForeignKey('subcategorias.id'), nullable=True))
+    transferencia_grupo_id = _com_historico(db.Column(db.Integer, db.ForeignKey('transferencia_grupos.id'), nullable=True))
+    cartao_credito_id = _com_historico(db.Column(db.Integer, db.ForeignKey('cartoes_credito.id'), nullable=True))
+    # Posição da ocorrência na recorrência (1, 2, ...)
+    numero_parcela = db.Column(db.Integer, nullable=True)
     
     conta = db.relationship('Conta', backref=db.backref('lancamentos', lazy=True))
     subcategoria = db.relationship('Subcategoria', backref=db.backref('lancamentos', lazy=True))
     transferencia_grupo = db.relationship('TransferenciaGrupo', backref=db.backref('lancamentos', lazy=True, cascade="all, delete-orphan"))
     cartao_credito = db.relationship('CartaoCredito', backref=db.backref('lancamentos', lazy=True))
 
+    __table_args__ = (
+        db.Index('ix_lancamentos_conta_id_data_vencimento', 'conta_id', 'data_vencimento'),
+        db.Index('ix_lancamentos_cartao_credito_id_data_vencimento', 'cartao_credito_id', 'data_vencimento'),
+        db.Index('ix_lancamentos_recorrencia_id_numero_parcela', 'recorrencia_id', 'numero_parcela'),
+        db.Index('ix_lancamentos_data_criacao_id', 'data_criacao', 'id'),
+    )
+
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
-        if self.conta_id and self.cartao_credito_id:
+        self.validar_vinculos(self.conta_id, self.cartao_credito_id, self.transferencia_grupo_id)
+
+    @staticmethod
+    def validar_vinculos(conta_id, cartao_credito_id, transferencia_grupo_id=None):
+        if conta_id and cartao_credito_id:
             raise ValueError("Lançamento não pode ter conta_id e cartao_credito_id ao mesmo tempo")
-        if self.transferencia_grupo_id and not self.conta_id:
+        if transferencia_grupo_id and not conta_id:
             raise ValueError("Transferências devem ter conta_id")
-        if not self.transferencia_grupo_id and not self.conta_id and not self.cartao_credito_id:
+        if not transferencia_grupo_id and not conta_id and not cartao_credito_id:
             raise ValueError("Lançamento deve ter conta_id ou cartao_credito_id")
 
     @property
@@ -206,24 +206,39 @@ const DashboardManager = {
         }
     },
 
-    // ===== AUTO SUBMIT DOS FILTROS =====
+    // ===== TROCA DE MÊS SEM RECARREGAR A PÁGINA =====
     setupAutoSubmit() {
         const mesSelect = document.getElementById('mes');
         const anoSelect = document.getElementById('ano');
+        const form = document.querySelector('form[action*="dashboard"]');
 
         if (mesSelect) {
             mesSelect.addEventListener('change', (e) => {
                 this.state.currentMonth = e.target.value;
-                this.submitFilters();
+                this.trocarMes(this.state.currentYear, this.state.currentMonth);
             });
         }
 
         if (anoSelect) {
             anoSelect.addEventListener('change', (e) => {
                 this.state.currentYear = e.target.value;
-                this.submitFilters();
+                this.trocarMes(this.state.currentYear, this.state.currentMonth);
+            });
+        }
+
+        if (form) {
+            form.addEventListener('submit', (e) => {
+                e.preventDefault();
+                this.trocarMes(this.state.currentYear, this.state.currentMonth);
             });
         }
+
+        // Voltar/avançar do navegador entre os meses já visitados
+        window.addEventListener('popstate', (e) => {
+            if (e.state && e.state.ano) {
+                this.trocarMes(e.state.ano, e.state.mes, false);
+            }
+        });
     },
 
     submitFilters() {
@@ -234,6 +249,231 @@ const DashboardManager = {
         }
     },
 
+    trocarMes(ano, mes, registrarHistorico = true) {
+        if (!ano || !mes) return;
+
+        // A resposta fica no cache do navegador e é revalidada pelo ETag
+        // (If-None-Match), então voltar a um mês sem alterações custa um 304
+        this.showLoading();
+        fetch(`/api/dashboard/${ano}/${mes}`, { headers: { 'Accept': 'application/json' } })
+            .then(response => {
+                if (!response.ok) {
+                    throw new Error(`HTTP error! status: ${response.status}`);
+                }
+                return response.json();
+            })
+            .then(dados => {
+                this.renderizarMes(dados);
+                this.setState({ currentMonth: String(dados.mes), currentYear: String(dados.ano) });
+                this.setModalValue('mes', String(dados.mes));
+                this.setModalValue('ano', String(dados.ano));
+
+                if (registrarHistorico) {
+                    history.pushState({ ano: dados.ano, mes: dados.mes }, '', `/dashboard?ano=${dados.ano}&mes=${dados.mes}`);
+                }
+                this.hideLoading();
+            })
+            .catch(error => {
+                // Sem a API, recarrega a página do mês como antes
+                console.error('Erro ao carregar o mês:', error);
+                window.location.href = `/dashboard?ano=${ano}&mes=${mes}`;
+            });
+    },
+
+    // ===== RENDERIZAÇÃO DOS DADOS DO MÊS =====
+    renderizarMes(dados) {
+        const receitas = document.getElementById('lista-receitas');
+        const despesas = document.getElementById('lista-despesas');
+        const totais = dados.totais;
+
+        if (receitas) {
+            receitas.innerHTML = dados.receitas.length
+                ? dados.receitas.map(item => this.linhaLancamento(item, 'Receita')).join('')
+                : this.linhaVazia('Nenhuma receita para este mês');
+        }
+
+        if (despesas) {
+            // Despesas e faturas dos cartões juntas, por vencimento
+            const itens = [
+                ...dados.despesas.map(item => ({ data: item.data, html: this.linhaLancamento(item, 'Despesa') })),
+                ...dados.faturas.map(item => ({ data: item.data, html: this.linhaFatura(item, dados.ano, dados.mes) }))
+            ].sort((a, b) => a.data.localeCompare(b.data));
+
+            despesas.innerHTML = itens.length
+                ? itens.map(item => item.html).join('')
+                : this.linhaVazia('Nenhuma despesa para este mês');
+        }
+
+        const resultado = totais.total_receitas_mes - totais.total_despesas_completo;
+        const container = document.querySelector('.dashboard-container');
+        const totalContas = container ? parseFloat(container.dataset.totalContas) || 0 : 0;
+        const projecao = totalContas + totais.receitas_pendentes - totais.total_despesas_pendentes;
+
+        this.setModalText('total-receitas-mes', this.formatCurrency(totais.total_receitas_mes));
+        this.setModalText('total-despesas-completo', this.formatCurrency(totais.total_despesas_completo));
+        this.setModalText('resumo-receitas', this.formatCurrency(totais.total_receitas_mes));
+        this.setModalText('resumo-despesas', this.formatCurrency(totais.total_despesas_completo));
+        this.setModalText('resumo-resultado', this.formatCurrency(resultado));
+        this.setModalText('resumo-projecao', this.formatCurrency(projecao));
+
+        const corResultado = resultado >= 0 ? '#90EE90' : '#FFB6C1';
+        const resultadoEl = document.getElementById('resumo-resultado');
+        if (resultadoEl) resultadoEl.style.color = corResultado;
+        const iconeResultado = document.getElementById('resumo-resultado-icone');
+        if (iconeResultado) {
+            iconeResultado.className = `bi bi-${resultado >= 0 ? 'graph-up' : 'graph-down'} fs-2 mb-2 d-block`;
+            iconeResultado.style.setProperty('color', corResultado, 'important');
+        }
+
+        const mesSelect = document.getElementById('mes');
+        const nomeMes = mesSelect ? mesSelect.options[dados.mes - 1].text.trim() : dados.mes;
+        this.setModalText('resumo-periodo', `${nomeMes}/${dados.ano}`);
+    },
+
+    linhaVazia(mensagem) {
+        return `
+            <tr>
+                <td colspan="5" class="text-center py-4">
+                    <div class="text-muted">
+                        <i class="bi bi-inbox fs-1 d-block mb-2"></i>
+                        <p class="mb-0">${mensagem}</p>
+                    </div>
+                </td>
+            </tr>`;
+    },
+
+    celulaData(data) {
+        const [ano, mes, dia] = data.split('-');
+        return `
+            <td class="text-center" style="width: 60px; padding: 6px 4px;">
+                <div class="d-flex flex-column">
+                    <span class="fw-medium" style="font-size: 0.85rem;">${dia}/${mes}</span>
+                    <small class="text-muted" style="font-size: 0.7rem;">${ano}</small>
+                </div>
+            </td>`;
+    },
+
+    celulaConta(nome) {
+        if (!nome) {
+            return `<td class="d-none d-lg-table-cell" style="width: 80px; padding: 6px 4px;"><small class="text-warning d-block" style="font-size: 0.75rem;">N/D</small></td>`;
+        }
+        const curto = nome.length > 8 ? `${nome.slice(0, 8)}...` : nome;
+        return `
+            <td class="d-none d-lg-table-cell" style="width: 80px; padding: 6px 4px;">
+                <small class="text-muted text-truncate d-block" style="font-size: 0.75rem;" title="${this.escapeHtml(nome)}">${this.escapeHtml(curto)}</small>
+            </td>`;
+    },
+
+    linhaLancamento(item, tipo) {
+        const receita = tipo === 'Receita';
+        const [ano, mes, dia] = item.data.split('-');
+        const icone = item.icone
+            ? `<i class="${this.escapeHtml(item.icone)} me-2" style="color: ${this.escapeHtml(item.cor)}; font-size: 1rem; flex-shrink: 0;"></i>`
+            : '<i class="bi bi-arrow-left-right me-2 text-muted" style="flex-shrink: 0; font-size: 1rem;"></i>';
+        const parcela = item.parcela
+            ? `<small class="text-muted" style="font-size: 0.75rem;">Parcela ${item.parcela[0]}/${item.parcela[1]}</small>`
+            : '';
+        const pago = item.status === 'Pago';
+        const botaoPago = pago
+            ? '<button type="submit" class="btn btn-success btn-sm" title="Marcar como Pendente" style="padding: 2px 6px;"><i class="bi bi-check-circle-fill" style="font-size: 0.8rem;"></i></button>'
+            : '<button type="submit" class="btn btn-outline-success btn-sm" title="Marcar como Realizado" style="padding: 2px 6px;"><i class="bi bi-check-circle" style="font-size: 0.8rem;"></i></button>';
+
+        const id = this.escapeHtml(String(item.id));
+        const descricao = this.escapeHtml(item.descricao);
+        const comuns = `
+            data-valor="${item.valor}"
+            data-categoria-id="${item.categoria_id ?? ''}"
+            data-subcategoria-id="${item.subcategoria_id ?? ''}"
+            data-conta-id="${item.cartao_id ? '' : (item.conta_id ?? '')}"
+            data-cartao-id="${item.cartao_id ?? ''}"
+            data-vencimento="${item.data}"`;
+
+        let acoes;
+        if (item.recorrencia_id) {
+            acoes = `
+                <button type="button" class="btn btn-outline-primary btn-sm" data-bs-toggle="modal" data-bs-target="#modalEditarRecorrencia"
+                        data-lancamento-id="${id}" data-recorrencia-id="${item.recorrencia_id}"
+                        data-descricao="${this.escapeHtml(item.descricao_base ?? '')}" ${comuns}
+                        title="Editar Recorrência" style="padding: 2px 6px;">
+                    <i class="bi bi-pencil-fill" style="font-size: 0.8rem;"></i>
+                </button>
+                <button type="button" class="btn btn-outline-danger btn-sm" data-bs-toggle="modal" data-bs-target="#modalExcluirRecorrencia"
+                        data-lancamento-id="${id}" data-recorrencia-id="${item.recorrencia_id}"
+                        data-descricao="${descricao}" data-vencimento="${dia}/${mes}/${ano}"
+                        title="Excluir Recorrência" style="padding: 2px 6px;">
+                    <i class="bi bi-trash-fill" style="font-size: 0.8rem;"></i>
+                </button>`;
+        } else {
+            acoes = `
+                <button type="button" class="btn btn-outline-primary btn-sm" data-bs-toggle="modal" data-bs-target="#modalEditarUnico"
+                        data-lancamento-id="${id}" data-descricao="${descricao}" ${comuns}
+                        title="Editar Lançamento" style="padding: 2px 6px;">
+                    <i class="bi bi-pencil-fill" style="font-size: 0.8rem;"></i>
+                </button>
+                <button type="button" class="btn btn-outline-danger btn-sm" data-bs-toggle="modal" data-bs-target="#modalExcluirUnico"
+                        data-lancamento-id="${id}" data-descricao="${descricao}"
+                        title="Excluir Lançamento" style="padding: 2px 6px;">
+                    <i class="bi bi-trash-fill" style="font-size: 0.8rem;"></i>
+                </button>`;
+        }
+
+        return `
+            <tr class="${pago ? 'table-success bg-opacity-25' : ''} ${receita ? 'receita-item' : 'despesa-item'}" style="font-size: 0.9rem;">
+                ${this.celulaData(item.data)}
+                <td style="width: 200px; padding: 6px 8px;">
+                    <div class="d-flex align-items-center">
+                        ${icone}
+                        <div class="overflow-hidden" style="min-width: 0;">
+                            <div class="fw-medium text-truncate" title="${descricao}" style="font-size: 0.9rem;">${descricao}</div>
+                            ${parcela}
+                        </div>
+                    </div>
+                </td>
+                ${this.celulaConta(item.conta)}
+                <td class="text-end" style="width: 90px; padding: 6px 4px;">
+                    <span class="fw-bold ${receita ? 'text-success' : 'text-danger'} text-nowrap" style="font-size: 0.85rem;">${receita ? '+' : '-'} ${this.formatCurrency(item.valor)}</span>
+                </td>
+                <td class="text-center" style="width: 100px; padding: 6px 4px;">
+                    <div class="btn-group btn-group-sm" role="group">
+                        <form action="/lancamentos/marcar_pago/${id}" method="POST" class="d-inline">${botaoPago}</form>
+                        ${acoes}
+                    </div>
+                </td>
+            </tr>`;
+    },
+
+    linhaFatura(item, ano, mes) {
+        const status = item.paga
+            ? '<span class="badge bg-success mb-1 text-nowrap" style="font-size: 0.7rem;"><i class="bi bi-check-circle-fill"></i> Paga</span>'
+            : '<span class="badge bg-warning mb-1 text-nowrap" style="font-size: 0.7rem;"><i class="bi bi-clock"></i> Pendente</span>';
+
+        return `
+            <tr class="${item.paga ? 'table-success bg-opacity-25' : ''} despesa-item" style="font-size: 0.9rem;">
+                ${this.celulaData(item.data)}
+                <td style="width: 200px; padding: 6px 8px;">
+                    <div class="d-flex align-items-center">
+                        <i class="bi bi-credit-card-fill me-2 text-purple" style="color: #6f42c1; font-size: 1rem; flex-shrink: 0;"></i>
+                        <div class="overflow-hidden">
+                            <div class="fw-medium text-truncate" style="font-size: 0.9rem;">${this.escapeHtml(item.descricao)}</div>
+                        </div>
+                    </div>
+                </td>
+                ${this.celulaConta(item.conta)}
+                <td class="text-end" style="width: 90px; padding: 6px 4px;">
+                    <span class="fw-bold text-danger text-nowrap" style="font-size: 0.85rem;">- ${this.formatCurrency(item.valor)}</span>
+                </td>
+                <td class="text-center" style="width: 100px; padding: 6px 4px;">
+                    <div class="d-flex flex-column align-items-center">
+                        ${status}
+                        <a href="/cartoes/extrato?cartao_id=${item.cartao_id}&ano=${ano}&mes=${mes}"
+                           class="btn btn-outline-primary btn-sm" style="padding: 2px 6px;">
+                            <i class="bi bi-file-text" style="font-size: 0.8rem;"></i>
+                        </a>
+                    </div>
+                </td>
+            </tr>`;
+    },
+
     // ===== ANIMAÇÕES =====
     setupAnimations() {
         // Animar cards de conta
@@ -310,6 +550,9 @@ const DashboardManager = {
         
         if (mesSelect) this.state.currentMonth = mesSelect.value;
         if (anoSelect) this.state.currentYear = anoSelect.value;
+
+        // Estado inicial do histórico, para o "voltar" retornar a este mês
+        history.replaceState({ ano: this.state.currentYear, mes: this.state.currentMonth }, '');
     },
 
     // ===== LOADING STATE =====
@@ -419,6 +662,12 @@ const DashboardManager = {
         }
     },
 
+    escapeHtml(texto) {
+        const div = document.createElement('div');
+        div.textContent = texto ?? '';
+        return div.innerHTML.replace(/"/g, '&quot;');
+    },
+
     formatCurrency(value) {
         return new Intl.NumberFormat('pt-BR', {
             style: 'currency',
@@ -48,6 +48,12 @@ const LancamentosManager = {
             categoriaCartaoSelect.addEventListener('change', () => this.carregarSubcategoriasCartao());
         }
 
+        // Sugestão de categoria pelas regras ao sair do campo de descrição
+        const descricaoInput = document.getElementById('descricao');
+        if (descricaoInput) {
+            descricaoInput.addEventListener('change', () => this.sugerirCategoria(descricaoInput.value));
+        }
+
         // Validação em tempo real
         this.setupRealTimeValidation();
     },
@@ -155,6 +161,26 @@ const LancamentosManager = {
         this.loadSubcategorias(categoriaId, subcategoriaSelect);
     },
 
+    // ===== SUGESTÃO DE CATEGORIA (REGRAS DE CATEGORIZAÇÃO) =====
+    sugerirCategoria(descricao) {
+        const cartao = this.state.tipoAtual === 'CartaoCredito';
+        const categoriaSelect = document.getElementById(cartao ? 'categoria_cartao' : 'categoria');
+        const subcategoriaSelect = document.getElementById(cartao ? 'subcategoria_cartao' : 'subcategoria');
+
+        // Não sobrescreve uma categoria já escolhida pelo usuário
+        if (!descricao?.trim() || !categoriaSelect || !subcategoriaSelect || categoriaSelect.value) return;
+
+        fetch(`/api/categorizar?descricao=${encodeURIComponent(descricao)}`)
+            .then(response => response.ok ? response.json() : null)
+            .then(data => {
+                if (!data?.categoria_id || categoriaSelect.value) return;
+                categoriaSelect.value = data.categoria_id;
+                return this.loadSubcategorias(data.categoria_id, subcategoriaSelect)
+                    .then(() => { subcategoriaSelect.value = data.subcategoria_id; });
+            })
+            .catch(error => console.error('Erro ao sugerir categoria:', error));
+    },
+
     loadSubcategorias(categoriaId, subcategoriaSelect) {
         // Estado de loading
         subcategoriaSelect.innerHTML = '<option value="">Carregando...</option>';
@@ -162,7 +188,7 @@ const LancamentosManager = {
         this.addLoadingClass(subcategoriaSelect);
         
         if (categoriaId) {
-            fetch(`/api/subcategorias/${categoriaId}`)
+            return fetch(`/api/subcategorias/${categoriaId}`)
                 .then(response => {
                     if (!response.ok) {
                         throw new Error(`HTTP error! status: ${response.status}`);
@@ -193,6 +219,7 @@ const LancamentosManager = {
             subcategoriaSelect.innerHTML = '<option value="">Selecione uma categoria primeiro</option>';
             subcategoriaSelect.disabled = false;
             this.removeLoadingClass(subcategoriaSelect);
+            return Promise.resolve();
         }
     },
 